@@ -84,6 +84,8 @@ class ControlPanel:
 
         # Parameter Import
         params = json_import(["bifurcation params",
+                              "basin params",
+                              "map params",
                               "parameters",
                               "coupling",
                               "SL set",
@@ -3,7 +3,7 @@
 """
 
 Created on: 2024-11-11
-Updated on: 2025-12-26
+Updated on: 2026-03-18
 
 @author: SLab
 
@@ -11,14 +11,80 @@ Contents:
 
     Time waveform
 
+        Created once per set of axes (ResultPanel), configure() and plot() per result:
+        the Line2D artists are kept and updated with set_data, the caller draws once.
+
+        Only what the axes can show is drawn: per pixel column of ax1 the min and max of
+        the samples inside it (minmax_envelope), so a spike is never dropped and a line has
+        at most 2 points per pixel whatever eT, decimation or the number of neurons.
+        Zoom / pan of the toolbar (xlim_changed) recomputes the envelopes of the new range.
+
 """
 
+import numpy as np
+
+
+def minmax_envelope(t, y, t_lo, t_hi, n_px):
+
+    """
+    Min / max of y per pixel column of [t_lo, t_hi]
+
+    t: (samples,) increasing, y: (samples,) or (n, samples), memmaps are read only in range
+    n_px: pixel columns
+
+    Return:
+        t_env (2*columns,), y_env (..., 2*columns): min then max at the first t of each column
+        (the visible samples as they are if there are no more than 2*n_px of them)
+    """
+
+    # visible samples, and one more on each side so the lines reach the edges
+    i0 = max(np.searchsorted(t, t_lo, side="left") - 1, 0)
+    i1 = min(np.searchsorted(t, t_hi, side="right") + 1, t.shape[0])
+
+    t_vis = np.asarray(t[i0:i1])
+    y_vis = np.asarray(y[..., i0:i1])
+
+    if t_vis.size <= 2 * n_px:
+        return t_vis, y_vis
+
+    # first sample of each column
+    edges = np.linspace(t_vis[0], t_vis[-1], n_px + 1)[:-1]
+    starts = np.unique(np.searchsorted(t_vis, edges, side="left"))
+
+    y_env = np.empty(y_vis.shape[:-1] + (2 * starts.size,), dtype=y_vis.dtype)
+    y_env[..., 0::2] = np.minimum.reduceat(y_vis, starts, axis=-1)
+    y_env[..., 1::2] = np.maximum.reduceat(y_vis, starts, axis=-1)
+
+    return np.repeat(t_vis[starts], 2), y_env
+
+
 class GraphicTimeWaveform:
 
-    def __init__(self, params, model, ax1, ax2, ax3):
+    def __init__(self, ax1, ax2, ax3):
+
+        self.ax1 = ax1
+        self.ax2 = ax2
+        self.ax3 = ax3
+
+        # Line2D per axis (ax1: one per neuron of a network)
+        self.lines = {ax1: [], ax2: [], ax3: []}
+
+        # full histories, None until plot()
+        self.hist = None
+        self.autoscale_y = False
+
+        # ax2, ax3 share x with ax1: one callback for the three
+        ax1.callbacks.connect("xlim_changed", lambda ax: self.refresh())
+
+
+    def configure(self, params, model):
 
-        # clear plt
-        ax1.clear(); ax2.clear(); ax3.clear()
+        """ labels and limits of model (no clear: the artists are reused) """
+
+        ax1, ax2, ax3 = self.ax1, self.ax2, self.ax3
+
+        # nothing to refresh on set_xlim until plot()
+        self.hist = None
 
         # For ODE
         if model in ["ode"]:
@@ -38,9 +104,14 @@ class GraphicTimeWaveform:
             """ setting config of plt3 """
 
             # settings
-            ax2.set_xlim(params["sT"], params["eT"])
-            ax2.set_xlabel(r"$\mathrm{Time} \;\; t$")
-            ax2.set_ylabel(r"$z$")
+            ax3.set_xlim(params["sT"], params["eT"])
+            ax3.set_xlabel(r"$\mathrm{Time} \;\; t$")
+            ax3.set_ylabel(r"$z$")
+
+            # y range from the data (relim in refresh)
+            self.autoscale_y = True
+            for ax in (ax1, ax2, ax3):
+                ax.set_autoscaley_on(True)
 
         # For SynCA or ErCA
         elif model in ["esl"]:
@@ -75,14 +146,52 @@ class GraphicTimeWaveform:
             ax3.set_xlabel(r"$\mathrm{Time} \;\; t$")
             ax3.set_ylabel(r"$Z$")
 
-        self.ax1 = ax1
-        self.ax2 = ax2
-        self.ax3 = ax3
+            self.autoscale_y = False
 
 
     def plot(self, T_hist, X_hist, Y_hist, Z_hist):
 
-        self.ax1.plot(T_hist, X_hist, 'k', linewidth = 0.5)
-        self.ax2.plot(T_hist, Y_hist, 'k', linewidth = 0.5)
-        self.ax3.plot(T_hist, Z_hist, 'k', linewidth = 0.5)
+        """ network: X_hist (n, samples), one line per neuron, Y_hist = Z_hist = None """
+
+        self.hist = {self.ax1: np.atleast_2d(X_hist),
+                     self.ax2: None if Y_hist is None else np.atleast_2d(Y_hist),
+                     self.ax3: None if Z_hist is None else np.atleast_2d(Z_hist)}
+        self.t_hist = T_hist
+
+        # as many artists as series, the surplus ones removed
+        for ax, hist in self.hist.items():
+
+            lines = self.lines[ax]
+            n = 0 if hist is None else hist.shape[0]
+
+            while len(lines) < n:
+                lines.extend(ax.plot([], [], 'k', linewidth = 0.5))
+            while len(lines) > n:
+                lines.pop().remove()
+
+        self.refresh()
+
+
+    def refresh(self):
+
+        """ envelopes of the current x range into the artists (drawn by the caller / the toolbar, once) """
+
+        if self.hist is None:
+            return
+
+        t_lo, t_hi = self.ax1.get_xlim()
+        n_px = max(int(self.ax1.get_window_extent().width), 1)
+
+        for ax, hist in self.hist.items():
+
+            if hist is None:
+                continue
+
+            t_env, y_env = minmax_envelope(self.t_hist, hist, t_lo, t_hi, n_px)
+
+            for line, y in zip(self.lines[ax], y_env):
+                line.set_data(t_env, y)
 
+            if self.autoscale_y:
+                ax.relim()
+                ax.autoscale_view(scalex=False)
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+Created on: 2026-03-22
+
+@author: shirafujilab
+
+Contents:
+
+    Adaptive quadtree sampling of a 2-D grid of sweep points (rows, columns)
+
+        The axes are anything the caller maps the indices to: X0 x Y0 of a bifurcation point,
+        x x y of a basin, I_ext x g_s of a parameter map.
+
+        1. the nodes every `coarse` points (and the last row / column) are evaluated
+        2. per level, a cell whose 4 corners disagree
+                - in class (labels), or
+                - in a value by more than tol * (range of all values on the coarse nodes;
+                  the values share their units, e.g. x min / max: tol of the amplitude)
+           is split in 4 (2 along an axis of 1 point) and its new corners are evaluated,
+           a cell whose corners agree is filled from its nearest corner, not evaluated
+        3. until the cells are 1 point wide
+
+        All new nodes of a level go to one evaluate() call (one prange batch of trajectories).
+        Regions thinner than `coarse` between two agreeing nodes are not seen: coarse sets the
+        smallest feature found, the grid the resolution of the boundaries.
+
+Usage:
+
+    def evaluate(ii, jj):
+        ... trajectories of the points (ii, jj) ...
+        return labels (n,) int, values (n, k) float   (k may be 0)
+
+    labels, values, source = refine((ny, nx), evaluate, coarse=8, tol=0.05)
+    computed = source == np.arange(ny * nx).reshape(ny, nx)
+    extra = extra_of_the_evaluated_points.reshape(ny * nx, -1)[source]    (anything else per point)
+
+"""
+
+# import standard library
+import numpy as np
+
+
+def refine(shape, evaluate, coarse=8, tol=0.05):
+
+    """
+    Return:
+        labels (ny, nx) int64, values (ny, nx, k) float64,
+        source (ny, nx) int64: flat index of the evaluated point each point was filled from (itself if evaluated)
+    """
+
+    ny, nx = shape
+    coarse = max(int(coarse), 1)
+
+    labels = np.zeros(shape, dtype=np.int64)
+    values = None
+    computed = np.zeros(shape, dtype=bool)
+    source = np.arange(ny * nx).reshape(shape)
+
+    def run(ii, jj):
+
+        nonlocal values
+
+        lab, val = evaluate(ii, jj)
+        val = np.asarray(val, dtype=np.float64).reshape(ii.size, -1)
+
+        if values is None:
+            values = np.full(shape + (val.shape[1],), np.nan)
+
+        labels[ii, jj] = lab
+        values[ii, jj] = val
+        computed[ii, jj] = True
+
+    """ coarse nodes """
+
+    rows = np.union1d(np.arange(0, ny, coarse), [ny - 1])
+    cols = np.union1d(np.arange(0, nx, coarse), [nx - 1])
+
+    ii, jj = np.meshgrid(rows, cols, indexing="ij")
+    run(ii.ravel(), jj.ravel())
+
+    # one range for all values (same units: x min / max -> the amplitude), nan: no spike
+    flat = values.ravel()
+    scale = np.nan_to_num(tol * (np.fmax.reduce(flat) - np.fmin.reduce(flat))) if flat.size else 0.0
+
+    # cells: i0, j0, i1, j1 (corners included), of zero height / width along an axis of 1 point
+    r0, r1 = (rows[:-1], rows[1:]) if rows.size > 1 else (rows, rows)
+    c0, c1 = (cols[:-1], cols[1:]) if cols.size > 1 else (cols, cols)
+
+    i0, j0 = np.meshgrid(r0, c0, indexing="ij")
+    i1, j1 = np.meshgrid(r1, c1, indexing="ij")
+    cells = np.column_stack((i0.ravel(), j0.ravel(), i1.ravel(), j1.ravel()))
+
+    """ levels """
+
+    while cells.size:
+
+        split = _disagree(cells, labels, values, scale)
+
+        _fill(cells[~split], labels, values, computed, source)
+
+        # cells with points left inside
+        cells = cells[split & (((cells[:, 2] - cells[:, 0]) > 1) | ((cells[:, 3] - cells[:, 1]) > 1))]
+
+        if not cells.size:
+            break
+
+        cells = _split(cells)
+
+        # new corners, each once
+        corners = np.concatenate([cells[:, [0, 1]], cells[:, [0, 3]], cells[:, [2, 1]], cells[:, [2, 3]]])
+        corners = np.unique(corners, axis=0)
+        corners = corners[~computed[corners[:, 0], corners[:, 1]]]
+
+        if corners.size:
+            run(corners[:, 0], corners[:, 1])
+
+    return labels, values, source
+
+
+def _disagree(cells, labels, values, scale):
+
+    """ per cell: corners differ in class or beyond scale in a value """
+
+    i0, j0, i1, j1 = cells.T
+
+    lab = np.stack((labels[i0, j0], labels[i0, j1], labels[i1, j0], labels[i1, j1]), axis=1)
+    split = np.any(lab != lab[:, :1], axis=1)
+
+    if values.shape[2]:
+
+        val = np.stack((values[i0, j0], values[i0, j1], values[i1, j0], values[i1, j1]), axis=1)
+
+        # a nan at some corners only (no spike there) disagrees as well
+        nan = np.isnan(val)
+        split |= np.any(np.any(nan, axis=1) & ~np.all(nan, axis=1), axis=1)
+
+        spread = np.where(nan, -np.inf, val).max(axis=1) - np.where(nan, np.inf, val).min(axis=1)
+        split |= np.any(spread > scale, axis=1)
+
+    return split
+
+
+def _split(cells):
+
+    """ cells -> their 4 (or 2) children, halved along the axes wider than 1 point """
+
+    i0, j0, i1, j1 = cells.T
+
+    split_i = i1 - i0 > 1
+    split_j = j1 - j0 > 1
+
+    mi = np.where(split_i, (i0 + i1) // 2, i1)
+    mj = np.where(split_j, (j0 + j1) // 2, j1)
+
+    children = np.concatenate([np.column_stack((i0, j0, mi, mj)),
+                               np.column_stack((i0, mj, mi, j1)),
+                               np.column_stack((mi, j0, i1, mj)),
+                               np.column_stack((mi, mj, i1, j1))])
+
+    # second halves only along the axes that were halved
+    keep = np.concatenate([np.ones_like(split_i), split_j, split_i, split_i & split_j])
+
+    return children[keep]
+
+
+def _fill(cells, labels, values, computed, source):
+
+    """ points of agreeing cells not evaluated: class and values of the nearest corner """
+
+    for i0, j0, i1, j1 in cells:
+
+        mi, mj = (i0 + i1) // 2 + 1, (j0 + j1) // 2 + 1
+
+        for rs, ci in ((slice(i0, mi), i0), (slice(mi, i1 + 1), i1)):
+            for cs, cj in ((slice(j0, mj), j0), (slice(mj, j1 + 1), j1)):
+
+                todo = ~computed[rs, cs]
+
+                labels[rs, cs][todo] = labels[ci, cj]
+                values[rs, cs][todo] = values[ci, cj]
+                source[rs, cs][todo] = source[ci, cj]
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+Created on: 2026-03-24
+
+@author: shirafujilab
+
+Contents:
+
+    Order and lengths of the points of a bifurcation sweep (BifECA, BifODE)
+
+        continuation false: every point from the initial conditions, transient sT, eT steps in all
+        continuation true:
+            forward:  bif_start .. bif_end, backward: back down to bif_start (bif_end not repeated)
+            the first point from the initial conditions with the full transient sT,
+            every other point from the final states of the point before it (same initial condition)
+            with the shorter transient cont_sT (at most sT); the window observed is eT - sT as before
+
+        A state carried along a branch stays on its attractor while it exists: where the forward
+        and backward branches differ, the sweep has crossed a hysteresis (bistable) range.
+
+Usage:
+
+    for branch, idx, total_step, index_start in sweep(params, values.size):
+        ... branch: None, "forward" or "backward"; a state from the point before it unless first ...
+
+"""
+
+# import standard library
+import numpy as np
+
+
+def sweep(params, n_points):
+
+    """
+    Return:
+        [(branch, index of the point, total_step, index_start)] in the order to run
+    """
+
+    sT, eT, h = params["sT"], params["eT"], np.float32(params["h"])
+
+    full = (int(eT/h)+1, int(sT/h))
+
+    if not params.get("continuation", False):
+        return [(None, idx, *full) for idx in range(n_points)]
+
+    # shorter transient from the state of a neighbouring point, same window observed
+    cont_sT = min(params.get("cont_sT", sT), sT)
+    short = (int((cont_sT + eT - sT)/h)+1, int(cont_sT/h))
+
+    forward = [("forward", idx, *(full if idx == 0 else short)) for idx in range(n_points)]
+    backward = [("backward", idx, *short) for idx in range(n_points - 2, -1, -1)]
+
+    return forward + backward
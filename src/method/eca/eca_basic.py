@@ -11,14 +11,18 @@ Created on: 2026-02-26
 
 import numpy as np
 import math
-import matplotlib.pyplot as plt
-import numba
-numba.set_num_threads(15)
 from numba import njit, prange
 
 import os
 import datetime, time
 
+# import my library
+from src.method.eca.lut_cache import cached_lut
+from src.method.eca.phase_clock import make_clock, initial_phase, clock_step, phase_step, clock_is_int, check_cycle_detect
+from src.utils.history_writer import HistoryWriter, history_path, chunk_ranges, chunk_rows
+from src.method.observables import (new_observation, observe, summarize, skip_periods, OBS_HITS,
+                                    new_monitor, monitor, stop_report, observe_block)
+
 class TimeEvolEcaSingle:
 
     def __init__(self, params, filename):
@@ -27,6 +31,12 @@ class TimeEvolEcaSingle:
         self.params = params
         self.filename = filename
 
+        # None or progress(done, total), called between chunks (method_selects.run_method)
+        self.progress = None
+
+        # auto_stop: observables.stop_report() of the last run
+        self.stop = {}
+
         # Ensure output directory exists
         os.makedirs(os.path.dirname(self.filename), exist_ok=True)
 
@@ -42,12 +52,15 @@ class TimeEvolEcaSingle:
         # variables
         init_X, init_Y, init_Z = np.int16(params["init_X"]), np.int16(params["init_Y"]), np.int16(params["init_Z"])
         init_P, init_Q, init_R = np.int16(params["init_P"]), np.int16(params["init_Q"]), np.int16(params["init_R"])
-        init_phX, init_phY, init_phZ = np.float32(params["init_phX"]), np.float32(params["init_phY"]), np.float32(params["init_phZ"])
 
         # esl parameters
         N1, N2, N3, M, s1, s2, s3 = params["N1"], params["N2"], params["N3"], params["M"], params["s1"], params["s2"], params["s3"]
         Tc, Tx, Wx, Ty, Wy, Tz, Wz = params["Tc"], params["Tx"], params["Wx"], params["Ty"], params["Wy"], params["Tz"], params["Wz"]
 
+        # phase clocks: float, or integer accumulators (int_phase, phase_bits)
+        clk = _clock(params)
+        init_phX, init_phY, init_phZ = initial_phase(params["init_phX"], clk), initial_phase(params["init_phY"], clk), initial_phase(params["init_phZ"], clk)
+
         """ sim config """
 
         # time
@@ -56,7 +69,8 @@ class TimeEvolEcaSingle:
         # store step
         total_step = int(eT/h)+1
         index_start = int(sT/h)
-        store_step = (total_step - index_start) // 100 + 1 if total_step > index_start else 0
+        decimation = params.get("decimation", 100)
+        store_step = (total_step - index_start) // decimation + 1 if total_step > index_start else 0
 
         """ for models """
 
@@ -79,18 +93,89 @@ class TimeEvolEcaSingle:
         print(N1, N2, N3, M, s1, s2, s3, Tx, Wx, Ty, Wy, Tz, Wz,
                                         a, b, c, d, r, s, x_1, I_ext)
 
-        # make lut
-        Fin, Gin, Hin = _make_lut_numba(N1, N2, N3, M, s1, s2, s3, Tx, Wx, Ty, Wy, Tz, Wz,
-                                        a, b, c, d, r, s, x_1, I_ext)
+        # set calode (auto_stop: the stream monitors the chunks, the other kernels give the same history)
+        if params.get("stream", False) or params.get("auto_stop", False):
 
-        # set calode
-        t_hist, I_hist, X_hist, Y_hist, Z_hist = calc_time_evolution_eca(init_X, init_Y, init_Z,
-                                                                         init_P, init_Q, init_R,
-                                                                         init_phX, init_phY, init_phZ,
-                                                                         M, N1, N2, N3,
-                                                                         Fin, Gin, Hin, I_ext,
-                                                                         Tc, Tx, Wx, Ty, Wy, Tz, Wz,
-                                                                         total_step, index_start, store_step)
+            # make lut (or reuse it from the cache)
+            Fin, Gin, Hin = cached_lut(N1, N2, N3, M, s1, s2, s3, Tx, Wx, Ty, Wy, Tz, Wz,
+                                       a, b, c, d, r, s, x_1, I_ext)
+
+            # chunk by chunk into <save_path>.npy, columns (t, X, Y, Z)
+            hist = self._run_stream(Fin, Gin, Hin, Tc, clk,
+                                    M, N1, N2, N3, s1, s2, s3, total_step, index_start, decimation)[:max(store_step - 1, 0)]
+
+            t1 = time.perf_counter()
+            print("end: ", datetime.datetime.now())
+            print("bench mark: ", t1 - t0)
+
+            # memory-mapped columns
+            return hist[:, 0], np.broadcast_to(I_ext, hist.shape[:1]), hist[:, 1], hist[:, 2], hist[:, 3]
+
+        elif _cycle_detect(params, clk, total_step - index_start, decimation):
+
+            # make lut (or reuse it from the cache)
+            Fin, Gin, Hin = cached_lut(N1, N2, N3, M, s1, s2, s3, Tx, Wx, Ty, Wy, Tz, Wz,
+                                       a, b, c, d, r, s, x_1, I_ext)
+
+            # stop once the full state repeats, the rest of the history is copied from the cycle
+            t_hist, I_hist, X_hist, Y_hist, Z_hist, period, stop_tick = calc_time_evolution_eca_cycle(init_X, init_Y, init_Z,
+                                                                                                      init_P, init_Q, init_R,
+                                                                                                      init_phX, init_phY, init_phZ,
+                                                                                                      M, N1, N2, N3,
+                                                                                                      Fin, Gin, Hin, I_ext,
+                                                                                                      Tc, clk,
+                                                                                                      total_step, index_start, store_step, decimation)
+
+            print("period: ", period, " ticks, stopped at ", stop_tick, " / ", total_step) if period > 0 else print("period: not found")
+
+        elif params.get("compact_lut", False):
+
+            # per-axis components of Fin instead of the N1*N2*N3 cube
+            ax3, bx2, yv, zv, Gin, Hin = _make_lut_compact(N1, N2, N3, M, s1, s2, s3, Tx, Wx, Ty, Wy, Tz, Wz,
+                                                           a, b, c, d, r, s, x_1)
+
+            t_hist, I_hist, X_hist, Y_hist, Z_hist = calc_time_evolution_eca_compact(init_X, init_Y, init_Z,
+                                                                                     init_P, init_Q, init_R,
+                                                                                     init_phX, init_phY, init_phZ,
+                                                                                     M, N1, N2, N3,
+                                                                                     ax3, bx2, yv, zv, Gin, Hin, I_ext,
+                                                                                     Tc, clk, Wx/Tx,
+                                                                                     total_step, index_start, store_step, decimation)
+
+        elif params.get("event_clock", False):
+
+            # make lut (or reuse it from the cache)
+            Fin, Gin, Hin = cached_lut(N1, N2, N3, M, s1, s2, s3, Tx, Wx, Ty, Wy, Tz, Wz,
+                                       a, b, c, d, r, s, x_1, I_ext)
+
+            # firing ticks of Cx, Cy, Cz do not depend on the state: schedule once, then jump between them
+            ev_tick, ev_flag, t_sched = _make_clock_schedule(Tc, clk,
+                                                             init_phX, init_phY, init_phZ,
+                                                             total_step, index_start, store_step, decimation,
+                                                             clock_is_int(clk))
+
+            print("events: ", ev_tick.size, " / ", total_step)
+
+            t_hist, I_hist, X_hist, Y_hist, Z_hist = calc_time_evolution_eca_event(init_X, init_Y, init_Z,
+                                                                                   init_P, init_Q, init_R,
+                                                                                   M, N1, N2, N3,
+                                                                                   Fin, Gin, Hin, I_ext,
+                                                                                   ev_tick, ev_flag, t_sched,
+                                                                                   total_step, index_start, store_step, decimation)
+
+        else:
+
+            # make lut (or reuse it from the cache)
+            Fin, Gin, Hin = cached_lut(N1, N2, N3, M, s1, s2, s3, Tx, Wx, Ty, Wy, Tz, Wz,
+                                       a, b, c, d, r, s, x_1, I_ext)
+
+            t_hist, I_hist, X_hist, Y_hist, Z_hist = calc_time_evolution_eca(init_X, init_Y, init_Z,
+                                                                             init_P, init_Q, init_R,
+                                                                             init_phX, init_phY, init_phZ,
+                                                                             M, N1, N2, N3,
+                                                                             Fin, Gin, Hin, I_ext,
+                                                                             Tc, clk,
+                                                                             total_step, index_start, store_step, decimation)
 
         bench_eT = datetime.datetime.now()
         t1 = time.perf_counter()
@@ -102,18 +187,299 @@ class TimeEvolEcaSingle:
         
         return t_hist[:-1], I_hist[:-1], X_hist[:-1], Y_hist[:-1], Z_hist[:-1]
 
+    def _run_stream(self, Fin, Gin, Hin, Tc, clk,
+                    M, N1, N2, N3, s1, s2, s3, total_step, index_start, decimation):
+
+        """
+        auto_stop: the stored ticks of every chunk are observed (observables.observe_block),
+        the history ends on the tick the monitor stops on, no chunk is run after it
+        (the rest of the chunk it stops in is computed, not written). self.stop: stop_report()
+        """
+
+        params = self.params
+
+        # state carried between chunks
+        reg, ph = _initial_state(params, clk)
+
+        mon = new_monitor(params)
+        obs, hits = new_observation(params.get("max_hits", 256), burst_ratio=params.get("burst_ratio", 3.0))
+        spike_th, sec_var, sec_level = params.get("spike_th", 0.0), params.get("poincare_var", 0), params.get("poincare_level", 1.0)
+
+        writer = HistoryWriter(history_path(self.filename), 4)
+        print("stream: ", writer.path)
+
+        try:
+            for i_begin, i_end in chunk_ranges(total_step, params.get("chunk_step", 10**6)):
+
+                k_begin, rows = chunk_rows(i_begin, i_end, index_start, decimation)
+                block = np.zeros((rows, 4))
+
+                calc_time_evolution_eca_chunk(reg, ph, M, N1, N2, N3, Fin, Gin, Hin,
+                                              Tc, clk,
+                                              i_begin, i_end, index_start, k_begin, block, decimation)
+
+                stopped = False
+
+                if mon is not None:
+
+                    # scaling to ode
+                    scaled = block / np.array([1.0, s1, s2, s3]) - np.array([0.0, 2.0, 12.0, 0.0])
+
+                    rows, stopped = observe_block(obs, hits, mon, scaled, index_start + k_begin * decimation, decimation,
+                                                  spike_th, sec_var, sec_level)
+                    block = block[:rows]
+
+                writer.append(block)
+
+                if self.progress is not None:
+                    self.progress(total_step if stopped else i_end, total_step)
+
+                if stopped:
+                    break
+        finally:
+            writer.close()
+
+        self.stop = stop_report(mon, np.float32(params["h"]))
+
+        if mon is not None:
+            print("auto_stop: ", self.stop["stop_reason"], " conv_T: ", self.stop["conv_T"], " stop_T: ", self.stop["stop_T"])
+
+        return writer.load()
+
+    def reduce(self):
+
+        """ Observables after sT (observables.summarize) without storing a history, auto_stop: stop_report() as well """
+
+        params = self.params
+
+        # esl parameters
+        N1, N2, N3, M, s1, s2, s3 = params["N1"], params["N2"], params["N3"], params["M"], params["s1"], params["s2"], params["s3"]
+        Tc, Tx, Wx, Ty, Wy, Tz, Wz = params["Tc"], params["Tx"], params["Wx"], params["Ty"], params["Wy"], params["Tz"], params["Wz"]
+
+        # time
+        sT, eT, h = params["sT"], params["eT"], np.float32(params["h"])
+
+        total_step = int(eT/h)+1
+        index_start = int(sT/h)
+        decimation = params.get("decimation", 100)
+
+        # parameters
+        a, b, c, d, r, s = np.float32(params['a']), np.float32(params['b']), np.float32(params['c']), np.float32(params['d']), np.float32(params['r']), np.float32(params['s'])
+        I_ext = np.float32(params["I_ext"])
+
+        # x_1
+        p = (d - b) / a
+        q = c / a
+
+        coef = [1, p, 0, -q]   # x^3 + p x^2 - q = 0
+        x_1 = np.roots(coef)[0]
+
+        # make lut (or reuse it from the cache)
+        Fin, Gin, Hin = cached_lut(N1, N2, N3, M, s1, s2, s3, Tx, Wx, Ty, Wy, Tz, Wz,
+                                   a, b, c, d, r, s, x_1, I_ext)
+
+        clk = _clock(params)
+        reg, ph = _initial_state(params, clk)
+        obs, hits = new_observation(params.get("max_hits", 256), burst_ratio=params.get("burst_ratio", 3.0))
+        mon = new_monitor(params)
+
+        period = calc_reduction_eca(reg, ph, M, N1, N2, N3, Fin, Gin, Hin,
+                                    Tc, clk, s1, s2, s3,
+                                    0, total_step, index_start, decimation,
+                                    params.get("spike_th", 0.0), params.get("poincare_var", 0), params.get("poincare_level", 1.0),
+                                    obs, hits, _cycle_detect(params, clk, total_step - index_start, decimation), mon)
+
+        summary = summarize(obs, hits)
+        summary["period"] = period
+        summary.update(stop_report(mon, h))
+
+        return summary
+
+
+def _clock(params):
+
+    """ phase_clock.make_clock from params """
+
+    return make_clock(params["Tc"], params["Tx"], params["Wx"], params["Ty"], params["Wy"], params["Tz"], params["Wz"],
+                      params.get("int_phase", False), params.get("phase_bits", 32))
+
+
+def _cycle_detect(params, clk, window, decimation):
+
+    """
+    cycle_detect of params for a run observing window ticks (eT - sT)
+
+        False with auto_stop (the monitor stops the run instead),
+        phase_clock.check_cycle_detect raises if no cycle can be found in the window
+    """
+
+    if not params.get("cycle_detect", False) or params.get("auto_stop", False):
+        return False
+
+    check_cycle_detect(clk, window, decimation)
+
+    return True
+
+
+def _initial_state(params, clk):
 
-@njit(parallel=True)
+    """
+    reg: int64 X, Y, Z, P, Q, R, ph: float64 phX, phY, phZ, T (as calc_time_evolution_eca_chunk)
+
+        integer phases (clk of int_phase) are held exactly in float64 (phase_bits <= 52, make_clock)
+    """
+
+    reg = np.array([params["init_X"], params["init_Y"], params["init_Z"],
+                    params["init_P"], params["init_Q"], params["init_R"]], dtype=np.int64)
+    ph = np.array([initial_phase(params["init_phX"], clk), initial_phase(params["init_phY"], clk),
+                   initial_phase(params["init_phZ"], clk), 0.0])
+
+    return reg, ph
+
+
+class TimeEvolEcaBatch:
+
+    """
+    Many trajectories in one prange kernel
+
+        init_X, init_Y, init_Z: 1d arrays (batch,), None: X, Y = 0, bif_ic_stride, ... (as BifECA)
+                                and init_Z of params ("time evolution (batch)" of the GUI)
+        I_ext: None (params["I_ext"] for all), or 1d array (batch,)
+
+        The other initial registers are taken from params.
+    """
+
+    def __init__(self, params, filename):
+
+        # get params, filename
+        self.params = params
+        self.filename = filename
+
+        # None or progress(done, total) (method_selects.run_method), one prange call: not reported
+        self.progress = None
+
+        # Ensure output directory exists
+        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+
+        # Confirm: output filename
+        print(filename)
+
+    def run(self, init_X=None, init_Y=None, init_Z=None, I_ext=None):
+
+        params = self.params
+
+        """ For ESL """
+
+        # initial conditions on the grid of the bifurcation
+        if init_X is None:
+            stride = params.get("bif_ic_stride", 16)
+            init_Y, init_X = (v.ravel() for v in np.meshgrid(np.arange(0, params["N2"], stride),
+                                                             np.arange(0, params["N1"], stride), indexing="ij"))
+            init_Z = np.full(init_X.size, params["init_Z"])
+
+        # variables (structure of arrays)
+        init_X = np.asarray(init_X, dtype=np.int16)
+        init_Y = np.asarray(init_Y, dtype=np.int16)
+        init_Z = np.asarray(init_Z, dtype=np.int16)
+        batch = init_X.size
+
+        init_P = np.full(batch, params["init_P"], dtype=np.int16)
+        init_Q = np.full(batch, params["init_Q"], dtype=np.int16)
+        init_R = np.full(batch, params["init_R"], dtype=np.int16)
+
+        # esl parameters
+        N1, N2, N3, M, s1, s2, s3 = params["N1"], params["N2"], params["N3"], params["M"], params["s1"], params["s2"], params["s3"]
+        Tc, Tx, Wx, Ty, Wy, Tz, Wz = params["Tc"], params["Tx"], params["Wx"], params["Ty"], params["Wy"], params["Tz"], params["Wz"]
+
+        # phase clocks
+        clk = _clock(params)
+        init_phX = np.full(batch, initial_phase(params["init_phX"], clk))
+        init_phY = np.full(batch, initial_phase(params["init_phY"], clk))
+        init_phZ = np.full(batch, initial_phase(params["init_phZ"], clk))
+
+        """ sim config """
+
+        # time
+        sT, eT, h = params["sT"], params["eT"], np.float32(params["h"])
+
+        # store step
+        total_step = int(eT/h)+1
+        index_start = int(sT/h)
+        decimation = params.get("decimation", 100)
+        store_step = (total_step - index_start) // decimation + 1 if total_step > index_start else 0
+
+        """ for models """
+
+        # parameters
+        a, b, c, d, r, s = np.float32(params['a']), np.float32(params['b']), np.float32(params['c']), np.float32(params['d']), np.float32(params['r']), np.float32(params['s'])
+
+        # I_ext: one Fin per distinct value, Gin and Hin are shared
+        if I_ext is None:
+            I_ext = np.full(batch, params["I_ext"], dtype=np.float32)
+        I_ext = np.asarray(I_ext, dtype=np.float32)
+        I_values, lut_idx = np.unique(I_ext, return_inverse=True)
+
+        # x_1
+        p = (d - b) / a
+        q = c / a
+
+        coef = [1, p, 0, -q]   # x^3 + p x^2 - q = 0
+        x_1 = np.roots(coef)[0]
+
+        """ run simulation """
+        bench_sT = datetime.datetime.now()
+        t0 = time.perf_counter()
+        print("\n start: ", bench_sT, " batch: ", batch, " luts: ", I_values.size)
+
+        # make lut
+        Fin, Gin, Hin = make_lut_stack(N1, N2, N3, M, s1, s2, s3, Tx, Wx, Ty, Wy, Tz, Wz,
+                                       a, b, c, d, r, s, x_1, I_values)
+
+        # set calode
+        t_hist, X_hist, Y_hist, Z_hist = calc_time_evolution_eca_batch(init_X, init_Y, init_Z,
+                                                                       init_P, init_Q, init_R,
+                                                                       init_phX, init_phY, init_phZ,
+                                                                       M, N1, N2, N3,
+                                                                       Fin, Gin, Hin, lut_idx.astype(np.int64),
+                                                                       Tc, clk,
+                                                                       total_step, index_start, store_step, decimation)
+
+        bench_eT = datetime.datetime.now()
+        t1 = time.perf_counter()
+        print("end: ", bench_eT)
+        print("bench mark: ", t1 - t0)
+
+        return t_hist[:-1], I_ext, X_hist[:, :-1], Y_hist[:, :-1], Z_hist[:, :-1]
+
+
+def make_lut_stack(N1, N2, N3, M, s1, s2, s3, Tx, Wx, Ty, Wy, Tz, Wz,
+                   a, b, c, d, r, s, x_1, I_values):
+
+    """
+    Fin for every I_ext value, shape (n_I, N1, N2, N3); Gin, Hin do not depend on I_ext
+
+        Gin, Hin and the components of Fin are built once (_make_lut_compact), every Fin is
+        filled from them (_update_fin), as the sweeps of eca_bif; nothing goes to lut_cache.
+    """
+
+    ax3, bx2, yv, zv, Gin, Hin = _make_lut_compact(N1, N2, N3, M, s1, s2, s3, Tx, Wx, Ty, Wy, Tz, Wz,
+                                                   a, b, c, d, r, s, x_1)
+
+    Fin = np.empty((len(I_values), N1, N2, N3), dtype=np.int16)
+
+    for idx, I_ext in enumerate(I_values):
+        _update_fin(Fin[idx], ax3, bx2, yv, zv, np.float32(I_ext), M, Wx/Tx)
+
+    return Fin, Gin, Hin
+
+
+@njit(parallel=True, cache=True)
 def _make_lut_numba(N1, N2, N3, M, s1, s2, s3, Tx, Wx, Ty, Wy, Tz, Wz,
                     a, b, c, d, r, s, x_1, I_ext):
 
     Fin = np.zeros((N1,N2,N3), dtype=np.int16)
-    Gin = np.zeros((N1,N2), dtype=np.int16)
-    Hin = np.zeros((N1,N3), dtype=np.int16)
 
     delta_X = Wx/Tx
-    delta_Y = Wy/Ty
-    delta_Z = Wz/Tz
 
     # inputs to F: (X, Y, Z)
     for idx in prange(N1*N2*N3):
@@ -133,6 +499,23 @@ def _make_lut_numba(N1, N2, N3, M, s1, s2, s3, Tx, Wx, Ty, Wy, Tz, Wz,
         elif F >= 0 and F >= 0.0001: Fin[i, j, k] = math.ceil(1/(F/delta_X))
         else: Fin[i, j, k] = math.floor(1/(F/delta_X))
 
+    # inputs to G: (X, Y), inputs to H: (X, Z)
+    Gin, Hin = _make_gh_lut_numba(N1, N2, N3, M, s1, s2, s3, Tx, Wx, Ty, Wy, Tz, Wz,
+                                  a, b, c, d, r, s, x_1)
+
+    return Fin, Gin, Hin
+
+
+@njit(parallel=True, cache=True)
+def _make_gh_lut_numba(N1, N2, N3, M, s1, s2, s3, Tx, Wx, Ty, Wy, Tz, Wz,
+                       a, b, c, d, r, s, x_1):
+
+    Gin = np.zeros((N1,N2), dtype=np.int16)
+    Hin = np.zeros((N1,N3), dtype=np.int16)
+
+    delta_Y = Wy/Ty
+    delta_Z = Wz/Tz
+
     # inputs to G: (X, Y)
     for idx in prange(N1*N2):
 
@@ -165,19 +548,90 @@ def _make_lut_numba(N1, N2, N3, M, s1, s2, s3, Tx, Wx, Ty, Wy, Tz, Wz,
         elif H >= 0 and H >= 0.0001: Hin[i, k] =  math.ceil(1/(H/delta_Z))
         else: Hin[i, k] =  math.floor(1/(H/delta_Z))
 
-    return Fin, Gin, Hin
+    return Gin, Hin
+
+
+@njit(cache=True)
+def _make_lut_compact(N1, N2, N3, M, s1, s2, s3, Tx, Wx, Ty, Wy, Tz, Wz,
+                      a, b, c, d, r, s, x_1):
+
+    """
+    Compact form of Fin: per-axis components of F, O(N) memory
+
+        F = y - a*x**3 + b*x**2 - z + I_ext
+          = yv[j] - ax3[i] + bx2[i] - zv[k] + I_ext   (same operands, same order)
+
+    _fin_compact() rebuilds Fin[i, j, k] from them bit for bit.
+    Gin and Hin are dense as before.
+    """
+
+    ax3 = np.empty(N1)
+    bx2 = np.empty(N1)
+    yv = np.empty(N2)
+    zv = np.empty(N3)
+
+    for i in range(N1):
+        x = (i/s1) - 2
+        ax3[i] = a*x**3
+        bx2[i] = b*x**2
+
+    for j in range(N2):
+        yv[j] = (j/s2) - 12
+
+    for k in range(N3):
+        zv[k] = (k/s3)
+
+    Gin, Hin = _make_gh_lut_numba(N1, N2, N3, M, s1, s2, s3, Tx, Wx, Ty, Wy, Tz, Wz,
+                                  a, b, c, d, r, s, x_1)
+
+    return ax3, bx2, yv, zv, Gin, Hin
+
+
+@njit(cache=True)
+def _fin_compact(i, j, k, ax3, bx2, yv, zv, I_ext, M, delta_X):
+
+    """ Fin[i, j, k] of _make_lut_numba, thresholded reciprocal on the fly """
 
+    F = yv[j] - ax3[i] + bx2[i] - zv[k] + I_ext
 
+    if F >= 0   and F <  0.0001: return np.int16(M-1)
+    elif F < 0  and F > -0.0001: return np.int16(-(M-1))
+    elif F >= 0 and F >= 0.0001: return np.int16(math.ceil(1/(F/delta_X)))
+    else: return np.int16(math.floor(1/(F/delta_X)))
 
 
-@njit
+@njit(parallel=True, cache=True)
+def _update_fin(Fin, ax3, bx2, yv, zv, I_ext, M, delta_X):
+
+    """
+    Refill Fin in place for another I_ext (sweeps)
+
+        Only Fin depends on I_ext: Gin, Hin and the components of _make_lut_compact are
+        built once, every entry is rewritten from them without allocating a new table.
+    """
+
+    N1, N2, N3 = Fin.shape
+
+    for idx in prange(N1*N2*N3):
+
+        i = idx // (N2 * N3)
+        j = (idx %  (N2 * N3)) // N3
+        k = idx % N3
+
+        Fin[i, j, k] = _fin_compact(i, j, k, ax3, bx2, yv, zv, I_ext, M, delta_X)
+
+
+
+
+
+@njit(cache=True)
 def calc_time_evolution_eca(init_X, init_Y, init_Z,
                             init_P, init_Q, init_R,
                             init_phX, init_phY, init_phZ,
                             M, N1, N2, N3,
                             Fin, Gin, Hin, I_ext,
-                            Tc, Tx, Wx, Ty, Wy, Tz, Wz,
-                            total_step, index_start, store_step):
+                            Tc, clk,
+                            total_step, index_start, store_step, decimation=100):
 
     # variables
     x_next = x_previous = init_X
@@ -207,7 +661,7 @@ def calc_time_evolution_eca(init_X, init_Y, init_Z,
     for i in range(total_step):
 
         # time evolution
-        T, phx_next, phy_next, phz_next, Cx, Cy, Cz = time_evolution(Tc, Tx, Wx, Ty, Wy, Tz, Wz, T, phx_previous, phy_previous, phz_previous)
+        T, phx_next, phy_next, phz_next, Cx, Cy, Cz = clock_step(T, Tc, phx_previous, phy_previous, phz_previous, clk)
 
         # calculate
         Fx = Fin[x_previous, y_previous, z_previous]
@@ -289,9 +743,9 @@ def calc_time_evolution_eca(init_X, init_Y, init_Z,
         # store registers
         if i >= index_start:
 
-            if (idx % 100) == 0:
+            if (idx % decimation) == 0:
 
-                idx_insert = int(idx/100)
+                idx_insert = idx//decimation
 
                 t_hist[idx_insert] = T
 
@@ -309,9 +763,11 @@ def calc_time_evolution_eca(init_X, init_Y, init_Z,
 
 
 
-@njit
+@njit(cache=True)
 def time_evolution(Tc, Tx, Wx, Ty, Wy, Tz, Wz, T, phx_previous, phy_previous, phz_previous):
 
+    """ float clocks from (Tx, Wx, ...), the kernels use phase_clock.clock_step (same result) """
+
     T = T + Tc
 
     Cx = 1 if phx_previous >= (1-Wx/Tx) else 0
@@ -329,11 +785,682 @@ def time_evolution(Tc, Tx, Wx, Ty, Wy, Tz, Wz, T, phx_previous, phy_previous, ph
     return T, phx_next, phy_next, phz_next, Cx, Cy, Cz
 
 
+@njit(cache=True)
+def _register_update(C, F, v_previous, a_previous, N, M):
+
+    """ One ESL register (state v, auxiliary a), same rule as calc_time_evolution_eca """
+
+    if C == 1:
+
+        # cal auxiliary variables
+        if (a_previous < abs(F)) and (a_previous < M - 1):
+            return v_previous, a_previous + 1
+
+        # state transition
+        if (F >= 0) and (v_previous < N-1):
+            return v_previous + 1, 0
+        elif (F < 0) and (v_previous > 0):
+            return v_previous - 1, 0
+        else:
+            return v_previous, 0
+
+    return v_previous, a_previous
+
+
+@njit(parallel=True, cache=True)
+def calc_time_evolution_eca_batch(init_X, init_Y, init_Z,
+                                  init_P, init_Q, init_R,
+                                  init_phX, init_phY, init_phZ,
+                                  M, N1, N2, N3,
+                                  Fin, Gin, Hin, lut_idx,
+                                  Tc, clk,
+                                  total_step, index_start, store_step, decimation=100):
+
+    """
+    Batched calc_time_evolution_eca
+
+        init_*: 1d arrays (batch,)
+        Fin: (n_I, N1, N2, N3), trajectory b reads Fin[lut_idx[b]]
+        Gin, Hin: shared
+
+    Return:
+        t_hist (store_step,), x_hist, y_hist, z_hist (batch, store_step)
+    """
+
+    batch = init_X.shape[0]
+
+    # store return arrays
+    t_hist = np.zeros(store_step)
+    x_hist = np.zeros((batch, store_step), dtype=np.int16)
+    y_hist = np.zeros((batch, store_step), dtype=np.int16)
+    z_hist = np.zeros((batch, store_step), dtype=np.int16)
+
+    # time (shared by every trajectory)
+    T = 0.0
+    for i in range(total_step):
+        T = T + Tc
+        if (i >= index_start) and ((i - index_start) % decimation == 0):
+            t_hist[(i - index_start)//decimation] = T
+
+    for b in prange(batch):
+
+        # variables
+        x = np.int64(init_X[b])
+        y = np.int64(init_Y[b])
+        z = np.int64(init_Z[b])
+        p = np.int64(init_P[b])
+        q = np.int64(init_Q[b])
+        r = np.int64(init_R[b])
+        phx = init_phX[b]
+        phy = init_phY[b]
+        phz = init_phZ[b]
+
+        F = Fin[lut_idx[b]]
+
+        for i in range(total_step):
+
+            # time evolution
+            _, phx, phy, phz, Cx, Cy, Cz = clock_step(0.0, Tc, phx, phy, phz, clk)
+
+            # calculate
+            Fx = F[x, y, z]
+            Fy = Gin[x, y]
+            Fz = Hin[x, z]
+
+            x, p = _register_update(Cx, Fx, x, p, N1, M)
+            y, q = _register_update(Cy, Fy, y, q, N2, M)
+            z, r = _register_update(Cz, Fz, z, r, N3, M)
+
+            # store registers
+            if (i >= index_start) and ((i - index_start) % decimation == 0):
+
+                idx_insert = (i - index_start)//decimation
+
+                x_hist[b, idx_insert] = x
+                y_hist[b, idx_insert] = y
+                z_hist[b, idx_insert] = z
+
+    return t_hist, x_hist, y_hist, z_hist
+
+
+@njit(cache=True)
+def _make_clock_schedule(Tc, clk,
+                         init_phX, init_phY, init_phZ,
+                         total_step, index_start, store_step, decimation=100, jump=False):
+
+    """
+    Firing ticks of the three clocks
+
+        The phases never see X, Y, Z, so the ticks on which Cx, Cy, Cz fire are fixed
+        by (Tc, clk, init_ph) alone. Only the events are stored, no per-tick array.
+
+        jump (integer clocks, int_phase): per clock, the next firing tick is computed
+            (_next_fire), the three are merged; T is summed tick by tick as in the step loop.
+        float clocks (_step_schedule): ph + k*inc is not the sum of k additions, so the same
+            clock_step as in the step loop is replayed tick by tick to stay bit-identical to it.
+
+    Return:
+        ev_tick: ticks with at least one clock firing
+        ev_flag: bit 0 Cx, bit 1 Cy, bit 2 Cz
+        t_hist: T at the stored ticks
+    """
+
+    if not jump:
+        return _step_schedule(Tc, clk, init_phX, init_phY, init_phZ,
+                              total_step, index_start, store_step, decimation)
+
+    inc_x, inc_y, inc_z, th_x, th_y, th_z, wrap = clk
+
+    ev_tick = np.empty(1024, dtype=np.int64)
+    ev_flag = np.empty(1024, dtype=np.uint8)
+    n_ev = 0
+
+    t_hist = np.zeros(store_step)
+
+    T = 0.0
+    k, i_store = 0, index_start
+
+    # next firing tick and the phase at it, per clock
+    nx, phx = _next_fire(0, init_phX, inc_x, th_x, wrap, total_step)
+    ny, phy = _next_fire(0, init_phY, inc_y, th_y, wrap, total_step)
+    nz, phz = _next_fire(0, init_phZ, inc_z, th_z, wrap, total_step)
+
+    while True:
+
+        i = min(nx, ny, nz)
+        if i >= total_step:
+            break
+
+        flag = 0
+
+        if nx == i:
+            flag |= 1
+            _, phx = phase_step(phx, inc_x, th_x, wrap)
+            nx, phx = _next_fire(i + 1, phx, inc_x, th_x, wrap, total_step)
+
+        if ny == i:
+            flag |= 2
+            _, phy = phase_step(phy, inc_y, th_y, wrap)
+            ny, phy = _next_fire(i + 1, phy, inc_y, th_y, wrap, total_step)
+
+        if nz == i:
+            flag |= 4
+            _, phz = phase_step(phz, inc_z, th_z, wrap)
+            nz, phz = _next_fire(i + 1, phz, inc_z, th_z, wrap, total_step)
+
+        if n_ev == ev_tick.size:
+            ev_tick, ev_flag = _grow_events(ev_tick, ev_flag)
+        ev_tick[n_ev] = i
+        ev_flag[n_ev] = flag
+        n_ev += 1
+
+    # time
+    for i in range(total_step):
+        T = T + Tc
+        if i == i_store:
+            t_hist[k] = T
+            k += 1
+            i_store += decimation
+
+    return ev_tick[:n_ev].copy(), ev_flag[:n_ev].copy(), t_hist
+
+
+@njit(cache=True)
+def _step_schedule(Tc, clk, phx, phy, phz, total_step, index_start, store_step, decimation):
+
+    """ _make_clock_schedule for float clocks: clock_step replayed tick by tick """
+
+    ev_tick = np.empty(1024, dtype=np.int64)
+    ev_flag = np.empty(1024, dtype=np.uint8)
+    n_ev = 0
+
+    t_hist = np.zeros(store_step)
+
+    T = 0.0
+    k, i_store = 0, index_start
+
+    i = 0
+
+    while i < total_step:
+
+        if n_ev == ev_tick.size:
+            ev_tick, ev_flag = _grow_events(ev_tick, ev_flag)
+
+        # up to the next time the event arrays are full
+        n_cap = ev_tick.size
+
+        while i < total_step and n_ev < n_cap:
+
+            T, phx, phy, phz, Cx, Cy, Cz = clock_step(T, Tc, phx, phy, phz, clk)
+
+            if Cx or Cy or Cz:
+                ev_tick[n_ev] = i
+                ev_flag[n_ev] = Cx | (Cy << 1) | (Cz << 2)
+                n_ev += 1
+
+            if i == i_store:
+                t_hist[k] = T
+                k += 1
+                i_store += decimation
+
+            i += 1
+
+    return ev_tick[:n_ev].copy(), ev_flag[:n_ev].copy(), t_hist
+
+
+@njit(cache=True)
+def _grow_events(ev_tick, ev_flag):
+
+    """ event arrays doubled when full """
+
+    n = ev_tick.size
+
+    return (np.concatenate((ev_tick, np.empty(n, dtype=np.int64))),
+            np.concatenate((ev_flag, np.empty(n, dtype=np.uint8))))
+
+
+@njit(cache=True)
+def _next_fire(i, ph, inc, th, wrap, end):
+
+    """
+    First tick >= i on which the clock fires (ph >= th at the start of the tick), and ph there
+
+        ph is the phase at the start of tick i; end: no search beyond it (returned as is)
+
+        integer phases (k ticks add exactly k*inc): wrap by wrap, the ticks to the next wrap
+        are q or q + 1 (q = wrap // inc) once the phase is below inc, so no division per wrap
+    """
+
+    if ph >= th:
+        return i, ph
+
+    q = int(wrap // inc)
+    r = wrap - q*inc
+
+    # ticks to the first wrap
+    kw = int((wrap - ph + inc - 1) // inc)
+
+    while i < end:
+
+        # highest phase before the wrap
+        if ph + (kw - 1)*inc >= th:
+            k = int((th - ph + inc - 1) // inc)
+            return i + k, ph + k*inc
+
+        i += kw
+        ph = ph + kw*inc - wrap
+
+        kw = q if ph >= r else q + 1
+
+    return i, ph
+
+
+@njit(cache=True)
+def calc_time_evolution_eca_event(init_X, init_Y, init_Z,
+                                  init_P, init_Q, init_R,
+                                  M, N1, N2, N3,
+                                  Fin, Gin, Hin, I_ext,
+                                  ev_tick, ev_flag, t_sched,
+                                  total_step, index_start, store_step, decimation=100):
+
+    """
+    Event-driven calc_time_evolution_eca
+
+        Between two firing ticks no register can change, so only the ticks of
+        _make_clock_schedule are evaluated and the stored samples are filled from
+        the state reached at the last event before them.
+    """
+
+    # variables
+    x = np.int64(init_X)
+    y = np.int64(init_Y)
+    z = np.int64(init_Z)
+    p = np.int64(init_P)
+    q = np.int64(init_Q)
+    r = np.int64(init_R)
+
+    # store return arrays
+    t_hist = t_sched.copy()
+    I_hist = np.zeros(store_step, dtype=np.int16)
+    x_hist = np.zeros(store_step, dtype=np.int16)
+    y_hist = np.zeros(store_step, dtype=np.int16)
+    z_hist = np.zeros(store_step, dtype=np.int16)
+
+    n_ev = ev_tick.size
+    e = 0
+
+    for idx_insert in range(store_step):
+
+        # stored tick
+        i_store = index_start + decimation*idx_insert
+        if i_store >= total_step:
+            break
+
+        # jump through the events up to (and including) the stored tick
+        while (e < n_ev) and (ev_tick[e] <= i_store):
+
+            flag = ev_flag[e]
+
+            # calculate
+            Fx = Fin[x, y, z]
+            Fy = Gin[x, y]
+            Fz = Hin[x, z]
+
+            x, p = _register_update(flag & 1, Fx, x, p, N1, M)
+            y, q = _register_update((flag >> 1) & 1, Fy, y, q, N2, M)
+            z, r = _register_update((flag >> 2) & 1, Fz, z, r, N3, M)
+
+            e += 1
+
+        # store registers
+        I_hist[idx_insert] = I_ext
+        x_hist[idx_insert] = x
+        y_hist[idx_insert] = y
+        z_hist[idx_insert] = z
+
+    return t_hist, I_hist, x_hist, y_hist, z_hist
+
+
+@njit(cache=True)
+def calc_time_evolution_eca_compact(init_X, init_Y, init_Z,
+                                    init_P, init_Q, init_R,
+                                    init_phX, init_phY, init_phZ,
+                                    M, N1, N2, N3,
+                                    ax3, bx2, yv, zv, Gin, Hin, I_ext,
+                                    Tc, clk, delta_X,
+                                    total_step, index_start, store_step, decimation=100):
+
+    """ calc_time_evolution_eca reading Fin from the compact LUT (_make_lut_compact) """
+
+    # variables
+    x = np.int64(init_X)
+    y = np.int64(init_Y)
+    z = np.int64(init_Z)
+    p = np.int64(init_P)
+    q = np.int64(init_Q)
+    r = np.int64(init_R)
+    phx = init_phX
+    phy = init_phY
+    phz = init_phZ
+
+    T = 0.0
+
+    # store return arrays
+    t_hist = np.zeros(store_step)
+    I_hist = np.zeros(store_step, dtype=np.int16)
+    x_hist = np.zeros(store_step, dtype=np.int16)
+    y_hist = np.zeros(store_step, dtype=np.int16)
+    z_hist = np.zeros(store_step, dtype=np.int16)
+
+    for i in range(total_step):
+
+        # time evolution
+        T, phx, phy, phz, Cx, Cy, Cz = clock_step(T, Tc, phx, phy, phz, clk)
+
+        # calculate (Fx only when the X clock fires)
+        Fx = _fin_compact(x, y, z, ax3, bx2, yv, zv, I_ext, M, delta_X) if Cx == 1 else np.int16(0)
+        Fy = Gin[x, y]
+        Fz = Hin[x, z]
+
+        x, p = _register_update(Cx, Fx, x, p, N1, M)
+        y, q = _register_update(Cy, Fy, y, q, N2, M)
+        z, r = _register_update(Cz, Fz, z, r, N3, M)
+
+        # store registers
+        if (i >= index_start) and ((i - index_start) % decimation == 0):
+
+            idx_insert = (i - index_start)//decimation
+
+            t_hist[idx_insert] = T
+            I_hist[idx_insert] = I_ext
+            x_hist[idx_insert] = x
+            y_hist[idx_insert] = y
+            z_hist[idx_insert] = z
+
+    return t_hist, I_hist, x_hist, y_hist, z_hist
+
+
+@njit(cache=True)
+def calc_time_evolution_eca_chunk(reg, ph, M, N1, N2, N3, Fin, Gin, Hin,
+                                  Tc, clk,
+                                  i_begin, i_end, index_start, k_begin, block, decimation=100):
+
+    """
+    Ticks [i_begin, i_end) of calc_time_evolution_eca, resumable
+
+        reg: int64 (6,) X, Y, Z, P, Q, R   (read, then written back)
+        ph: float64 (4,) phX, phY, phZ, T  (read, then written back)
+        block: (rows, 4) t, X, Y, Z of the stored ticks, row = sample - k_begin
+    """
+
+    # variables
+    x, y, z, p, q, r = reg[0], reg[1], reg[2], reg[3], reg[4], reg[5]
+    phx, phy, phz, T = ph[0], ph[1], ph[2], ph[3]
+
+    for i in range(i_begin, i_end):
+
+        # time evolution
+        T, phx, phy, phz, Cx, Cy, Cz = clock_step(T, Tc, phx, phy, phz, clk)
+
+        # calculate
+        Fx = Fin[x, y, z]
+        Fy = Gin[x, y]
+        Fz = Hin[x, z]
+
+        x, p = _register_update(Cx, Fx, x, p, N1, M)
+        y, q = _register_update(Cy, Fy, y, q, N2, M)
+        z, r = _register_update(Cz, Fz, z, r, N3, M)
+
+        # store registers
+        if (i >= index_start) and ((i - index_start) % decimation == 0):
+
+            row = (i - index_start)//decimation - k_begin
+
+            block[row, 0] = T
+            block[row, 1] = x
+            block[row, 2] = y
+            block[row, 3] = z
+
+    reg[0], reg[1], reg[2], reg[3], reg[4], reg[5] = x, y, z, p, q, r
+    ph[0], ph[1], ph[2], ph[3] = phx, phy, phz, T
+
+
+@njit(cache=True)
+def calc_reduction_eca(reg, ph, M, N1, N2, N3, Fin, Gin, Hin,
+                       Tc, clk, s1, s2, s3,
+                       i_begin, i_end, index_start, decimation,
+                       spike_th, sec_var, sec_level, obs, hits, cycle_detect=False, mon=None):
+
+    """
+    calc_time_evolution_eca_chunk with observables.observe() instead of a history
+
+        reg, ph: state, read and written back (the final state after the call)
+        obs, hits: observables.new_observation(), every stored tick is observed in model units
+        mon: observables.new_monitor() (auto_stop): stops once the attractor is reached and recorded,
+             cycle_detect is not used then
+
+    cycle_detect: Brent's algorithm on the full state at the observed ticks (_brent_check).
+        Once the state repeats, one more period is observed, then as many whole periods
+        as fit are accounted for by observables.skip_periods() instead of being run.
+        T is still summed tick by tick. Only integer clocks whose period fits in the run
+        can repeat (_cycle_detect).
+
+    Return:
+        period in ticks (0: not found)
+    """
+
+    # variables
+    x, y, z, p, q, r = reg[0], reg[1], reg[2], reg[3], reg[4], reg[5]
+    phx, phy, phz, T = ph[0], ph[1], ph[2], ph[3]
+
+    # cycle detection
+    tort = np.zeros(9)
+    brent = np.zeros(3, dtype=np.int64)
+    period = 0
+    i_measured = -1
+    obs_period = obs.copy()
+
+    i = i_begin
+
+    while i < i_end:
+
+        # time evolution
+        T, phx, phy, phz, Cx, Cy, Cz = clock_step(T, Tc, phx, phy, phz, clk)
+
+        # calculate
+        Fx = Fin[x, y, z]
+        Fy = Gin[x, y]
+        Fz = Hin[x, z]
+
+        x, p = _register_update(Cx, Fx, x, p, N1, M)
+        y, q = _register_update(Cy, Fy, y, q, N2, M)
+        z, r = _register_update(Cz, Fz, z, r, N3, M)
+
+        # observe (scaling to ode)
+        if (i >= index_start) and ((i - index_start) % decimation == 0):
+
+            observe(obs, hits, T, x/s1 - 2, y/s2 - 12, z/s3, spike_th, sec_var, sec_level)
+
+            if mon is not None:
+
+                if monitor(mon, obs, hits, i, T, x/s1 - 2, y/s2 - 12, z/s3):
+                    break
+
+            elif cycle_detect and period == 0:
+
+                lam = _brent_check(tort, brent, x, y, z, p, q, r, phx, phy, phz)
+
+                if lam > 0:
+                    period = lam * decimation
+                    i_measured = i + period
+                    obs_period[:] = obs
+
+            elif i == i_measured:
+
+                # whole periods left after this tick: the state comes back unchanged
+                m = (i_end - 1 - i) // period
+
+                if (m > 0) and (obs[OBS_HITS] - obs_period[OBS_HITS] <= hits.shape[0]):
+
+                    T_skip = T
+                    for _ in range(m * period):
+                        T = T + Tc
+
+                    skip_periods(obs, hits, obs_period, m, T - T_skip)
+                    i += m * period
+
+        i += 1
+
+    reg[0], reg[1], reg[2], reg[3], reg[4], reg[5] = x, y, z, p, q, r
+    ph[0], ph[1], ph[2], ph[3] = phx, phy, phz, T
+
+    return period
+
+
+@njit(cache=True)
+def _brent_check(tort, brent, x, y, z, p, q, r, phx, phy, phz):
+
+    """
+    One step of Brent's cycle detection on the full state (X, Y, Z, P, Q, R, phX, phY, phZ)
+
+        tort: (9,) state kept by the tortoise
+        brent: int64 [power, lam, started]
+        The state is compared exactly, so a hit is a true cycle of the finite-state machine.
+
+    Return:
+        cycle length in checks, 0 while none is found
+    """
+
+    if brent[2] == 0:
+        brent[0], brent[1], brent[2] = 1, 0, 1
+
+    else:
+        brent[1] += 1
+
+        if (tort[0] == x and tort[1] == y and tort[2] == z and
+            tort[3] == p and tort[4] == q and tort[5] == r and
+            tort[6] == phx and tort[7] == phy and tort[8] == phz):
+            return brent[1]
+
+        if brent[1] < brent[0]:
+            return 0
+
+        # tortoise jumps to the hare
+        brent[0] *= 2
+        brent[1] = 0
+
+    tort[0], tort[1], tort[2], tort[3], tort[4], tort[5] = x, y, z, p, q, r
+    tort[6], tort[7], tort[8] = phx, phy, phz
+
+    return 0
+
+
+@njit(cache=True)
+def calc_time_evolution_eca_cycle(init_X, init_Y, init_Z,
+                                  init_P, init_Q, init_R,
+                                  init_phX, init_phY, init_phZ,
+                                  M, N1, N2, N3,
+                                  Fin, Gin, Hin, I_ext,
+                                  Tc, clk,
+                                  total_step, index_start, store_step, decimation=100):
+
+    """
+    calc_time_evolution_eca with early termination on an exact cycle
+
+        The full state is checked with _brent_check at the stored ticks. When it repeats
+        after lam samples, sample k = sample k - lam for the rest of the run and the model
+        is not evaluated any more. T is still summed tick by tick, so t_hist is the same.
+
+        The phases are part of the state: no cycle is shorter than
+        lcm(phase_clock.clock_period(clk), decimation) ticks, and float clocks never repeat,
+        so the caller checks it fits in the run first (_cycle_detect).
+
+    Return:
+        t_hist, I_hist, x_hist, y_hist, z_hist, period in ticks (0: not found), stop tick
+    """
+
+    # variables
+    x = np.int64(init_X)
+    y = np.int64(init_Y)
+    z = np.int64(init_Z)
+    p = np.int64(init_P)
+    q = np.int64(init_Q)
+    r = np.int64(init_R)
+    phx = init_phX
+    phy = init_phY
+    phz = init_phZ
+
+    T = 0.0
+
+    # store return arrays
+    t_hist = np.zeros(store_step)
+    I_hist = np.zeros(store_step, dtype=np.int16)
+    x_hist = np.zeros(store_step, dtype=np.int16)
+    y_hist = np.zeros(store_step, dtype=np.int16)
+    z_hist = np.zeros(store_step, dtype=np.int16)
+
+    # cycle detection
+    tort = np.zeros(9)
+    brent = np.zeros(3, dtype=np.int64)
+    lam = 0
+    stop_tick = total_step
+
+    for i in range(total_step):
+
+        # time evolution
+        T, phx, phy, phz, Cx, Cy, Cz = clock_step(T, Tc, phx, phy, phz, clk)
+
+        # calculate
+        Fx = Fin[x, y, z]
+        Fy = Gin[x, y]
+        Fz = Hin[x, z]
+
+        x, p = _register_update(Cx, Fx, x, p, N1, M)
+        y, q = _register_update(Cy, Fy, y, q, N2, M)
+        z, r = _register_update(Cz, Fz, z, r, N3, M)
+
+        # store registers
+        if (i >= index_start) and ((i - index_start) % decimation == 0):
+
+            idx_insert = (i - index_start)//decimation
+
+            t_hist[idx_insert] = T
+            I_hist[idx_insert] = I_ext
+            x_hist[idx_insert] = x
+            y_hist[idx_insert] = y
+            z_hist[idx_insert] = z
+
+            lam = _brent_check(tort, brent, x, y, z, p, q, r, phx, phy, phz)
+
+            if lam > 0:
+                stop_tick = i
+                break
+
+    # rest of the run from the cycle
+    for i in range(stop_tick + 1, total_step):
+
+        T = T + Tc
+
+        if (i >= index_start) and ((i - index_start) % decimation == 0):
+
+            idx_insert = (i - index_start)//decimation
+
+            t_hist[idx_insert] = T
+            I_hist[idx_insert] = I_ext
+            x_hist[idx_insert] = x_hist[idx_insert - lam]
+            y_hist[idx_insert] = y_hist[idx_insert - lam]
+            z_hist[idx_insert] = z_hist[idx_insert - lam]
+
+    return t_hist, I_hist, x_hist, y_hist, z_hist, lam * decimation, stop_tick
+
+
 
 
 """ test """
 
 def plot_time_series(t_hist, I_hist, x_hist, y_hist, z_hist):
+
+    import matplotlib.pyplot as plt
     
     # scaling to ode
     x = (x_hist/16) - 2
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+Created on: 2026-03-21
+
+@author: shirafujilab
+
+Contents: attraction basin of the ESL HR neuron
+
+    BasinECA(params, filename).run():
+
+        initial conditions: X = 0, basin_stride, ... < N1  x  Y = 0, basin_stride, ... < N2
+                            (basin_stride 1: every register value), Z, P, Q, R, ph from params
+        per initial condition: observables after sT (calc_bifurcation of eca_bif, prange),
+                               classified into an attractor class (observables.classify_batch)
+
+        basin_tile initial conditions are run at a time (memory of obs / hits, progress).
+        adaptive: only the initial conditions near the boundaries of the classes / of x min, max,
+                  the rest filled from them (adaptive_grid.refine, adaptive_coarse, adaptive_tol)
+        auto_stop: every trajectory stops once its attractor is recorded (observables.monitor)
+
+Return:
+
+    x_axis (X values), y_axis (Y values), labels int8 (Y, X), legend {label: name}
+
+    observables.save_basin(): labels .npy next to DataLibrarian.save_path,
+                              legend and count per class in the csv at DataLibrarian.save_path
+
+"""
+
+# import standard library
+import numpy as np
+import os
+
+import datetime, time
+
+# import my library
+from src.method.eca.eca_basic import _make_lut_compact, _update_fin, _clock, _cycle_detect
+from src.method.eca.eca_bif import calc_bifurcation
+from src.method.eca.phase_clock import initial_phase
+from src.method.observables import new_observation, new_monitor, classify_batch, basin_legend, save_basin, OBS_MIN, OBS_MAX
+from src.method.adaptive_grid import refine
+from src.utils.history_writer import chunk_ranges
+
+
+class BasinECA:
+
+    def __init__(self, params, filename):
+
+        # get params
+        self.params = params
+
+        self.filename = filename
+        print(self.filename)
+
+        # None or progress(done, total), called between tiles (method_selects.run_method)
+        self.progress = None
+
+        # Ensure output directory exists
+        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+
+
+    def axes(self):
+
+        """ X, Y values of the initial conditions """
+
+        stride = int(self.params.get("basin_stride", 1))
+
+        return np.arange(0, self.params["N1"], stride), np.arange(0, self.params["N2"], stride)
+
+
+    def run(self):
+
+        """ Initialization """
+
+        # get params
+        params = self.params
+
+        # esl parameters
+        N1, N2, N3, M, s1, s2, s3 = params["N1"], params["N2"], params["N3"], params["M"], params["s1"], params["s2"], params["s3"]
+        Tc, Tx, Wx, Ty, Wy, Tz, Wz = params["Tc"], params["Tx"], params["Wx"], params["Ty"], params["Wy"], params["Tz"], params["Wz"]
+
+        # variables
+        x_axis, y_axis = self.axes()
+        conds_size = x_axis.size * y_axis.size
+
+        print("initial conditions: ", conds_size)
+
+        # time
+        sT, eT, h = params["sT"], params["eT"], np.float32(params["h"])
+
+        total_step = int(eT/h)+1
+        index_start = int(sT/h)
+        decimation = params.get("decimation", 100)
+
+        # parameters
+        a, b, c, d, r, s = np.float32(params['a']), np.float32(params['b']), np.float32(params['c']), np.float32(params['d']), np.float32(params['r']), np.float32(params['s'])
+        I_ext = np.float32(params["I_ext"])
+
+        # x_1
+        p = (d - b) / a
+        q = c / a
+
+        coef = [1, p, 0, -q]   # x^3 + p x^2 - q = 0
+        x_1 = np.roots(coef)[0]
+
+        # observables, classes
+        spike_th, sec_var, sec_level = params.get("spike_th", 0.0), params.get("poincare_var", 0), params.get("poincare_level", 1.0)
+        max_period = int(params.get("basin_max_period", 8))
+        tol, burst_ratio = params.get("basin_tol", 0.01), params.get("burst_ratio", 3.0)
+        legend = basin_legend(max_period)
+
+        # lut
+        ax3, bx2, yv, zv, Gin, Hin = _make_lut_compact(N1, N2, N3, M, s1, s2, s3, Tx, Wx, Ty, Wy, Tz, Wz,
+                                                       a, b, c, d, r, s, x_1)
+        Fin = np.empty((N1, N2, N3), dtype=np.int16)
+        _update_fin(Fin, ax3, bx2, yv, zv, I_ext, M, Wx/Tx)
+
+        # phase clocks
+        clk = _clock(params)
+        cycle_detect = _cycle_detect(params, clk, total_step - index_start, decimation)
+
+        # trajectories run so far
+        done = [0]
+
+        def evaluate(ii, jj):
+
+            """ trajectories from X0 = x_axis[jj], Y0 = y_axis[ii], basin_tile at a time -> classes, x min / max """
+
+            X0, Y0 = x_axis[jj], y_axis[ii]
+
+            labels = np.empty(ii.size, dtype=np.int8)
+            values = np.empty((ii.size, 2))
+
+            for c_begin, c_end in chunk_ranges(ii.size, params.get("basin_tile", 4096)):
+
+                n = c_end - c_begin
+
+                # state per initial condition: X, Y, Z, P, Q, R / phX, phY, phZ, T
+                reg = np.zeros((n, 6), dtype=np.int64)
+                reg[:, 0], reg[:, 1] = X0[c_begin:c_end], Y0[c_begin:c_end]
+                reg[:, 2:] = params["init_Z"], params["init_P"], params["init_Q"], params["init_R"]
+
+                ph = np.zeros((n, 4))
+                ph[:, :3] = initial_phase(params["init_phX"], clk), initial_phase(params["init_phY"], clk), initial_phase(params["init_phZ"], clk)
+
+                obs, hits = new_observation(params.get("max_hits", 256), n, burst_ratio)
+
+                calc_bifurcation(reg, ph, M, N1, N2, N3, Fin, Gin, Hin,
+                                 Tc, clk, s1, s2, s3,
+                                 total_step, index_start, decimation,
+                                 spike_th, sec_var, sec_level, obs, hits,
+                                 cycle_detect, new_monitor(params, n))
+
+                classify_batch(obs, hits, labels[c_begin:c_end], max_period, tol, burst_ratio)
+                values[c_begin:c_end] = obs[:, [OBS_MIN, OBS_MAX]]
+
+                done[0] += n
+                print("proccess: -*-*-*-*- ", round((done[0] / conds_size*100),  2), "% -*-*-*-*- ")
+
+                if self.progress is not None:
+                    self.progress(done[0] * total_step, conds_size * total_step)
+
+            return labels, values
+
+
+        """ run simulation """
+        bench_sT = datetime.datetime.now()
+        t0 = time.perf_counter()
+        print("\n start: ", bench_sT)
+
+        # every initial condition, or the boundaries of the classes only (adaptive_grid)
+        if params.get("adaptive", False):
+            labels, _, source = refine((y_axis.size, x_axis.size), evaluate, params.get("adaptive_coarse", 8), params.get("adaptive_tol", 0.05))
+            print("run: ", np.unique(source).size, "of", conds_size)
+        else:
+            ii, jj = np.indices((y_axis.size, x_axis.size))
+            labels, _ = evaluate(ii.ravel(), jj.ravel())
+
+        bench_eT = datetime.datetime.now()
+        t1 = time.perf_counter()
+        print("end: ", bench_eT)
+        print("bench mark: ", t1 - t0)
+
+
+        """ Store results """
+
+        labels = labels.reshape(y_axis.size, x_axis.size).astype(np.int8)
+        save_basin(self.filename, labels, legend)
+
+        return x_axis, y_axis, labels, legend
+
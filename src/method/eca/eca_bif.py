@@ -1,41 +1,64 @@
 # -*- coding: utf-8 -*-
 """
 Created on: 2024-10-22
-Updated on: 2024-11-12
+Updated on: 2026-03-24
 
 @author: shirafujilab
 
-Contents: bifurcation for S
-    X: 0, 2, 4, ..., 63
-    Y: 0, 2, 4, ..., 63
+Contents: bifurcation of the ESL HR neuron
 
-    Fixed: Q, P, Q, phX, phY
+    BifECA (single):
+        bif_param: I_ext, bif_start .. bif_end (bif_num points)
+        initial conditions: X, Y = 0, bif_ic_stride, 2*bif_ic_stride, ... (Z, P, Q, R, ph from params)
+        per point and initial condition: observables after sT (src/method/observables.py),
+                                         attractor class (label, observables.classify_batch)
+        adaptive: only the initial conditions near the boundaries of the classes / of x min, max
+                  (adaptive_grid.refine, adaptive_coarse, adaptive_tol), the csv has the rows run
+        continuation: forward then backward, every point from the final states of the point before it,
+                      transient cont_sT (continuation.sweep), "branch" column in the csv
+        auto_stop: every trajectory stops once its attractor is recorded (observables.monitor),
+                   stop_reason, conv_T, stop_T, stop_tick columns in the csv
 
+    BifEcaNetwork (network):
+        bif_param: I_ext or g_s, default 9-neuron network of eca_net
+        per point and neuron: min / max of x after sT
 
-Benchmark:
+    Only Fin depends on I_ext: Gin, Hin are built once and Fin is refilled in place
+    (_update_fin) for every point.
 
-    size of X, Y = 64*64 -> 14 minutes
-    size of X, Y = 32*64 -> 3.5 minutes
-    
-    size of X, Y = 32*32 -> 50 sec
-    size of X, Y = 32*32 -> 24 sec (lut access)
+Return:
+
+    csv at DataLibrarian.save_path
 
 """
 
 # import standard library
 import numpy as np
-import pandas as pd
 import os
 
-import numba
-numba.set_num_threads(15)
 from numba import njit, prange
 
 import datetime, time
 
 # import my library
-from src.method.eca.eca_basic import  calc_time_evolution_eca, _make_lut_numba
-from src.graphics.graphic_lut import _make_rotated_coordinate
+from src.method.eca.eca_basic import _make_lut_compact, _update_fin, calc_reduction_eca, _clock, _cycle_detect
+from src.method.eca.phase_clock import initial_phase
+from src.method.eca.eca_net import (INIT_X, C_IJ, TH, M_I, coupling_to_csr,
+                                    _network_state, _network_steps_parallel, _network_steps_serial)
+from src.method.observables import new_observation, new_monitor, stop_report, summarize, classify_batch, OBS_MIN, OBS_MAX
+from src.method.adaptive_grid import refine
+from src.method.continuation import sweep
+from src.utils.history_writer import chunk_ranges, chunk_rows
+
+
+def bif_values(params):
+
+    """ bif_param and its sweep points """
+
+    bif_param = params.get("bif_param", "I_ext")
+    values = np.linspace(params["bif_start"], params["bif_end"], int(params["bif_num"])).astype(np.float32)
+
+    return bif_param, values
 
 
 class BifECA:
@@ -48,6 +71,9 @@ class BifECA:
         self.filename = filename
         print(self.filename)
 
+        # None or progress(done, total), called between points (method_selects.run_method)
+        self.progress = None
+
         # Ensure output directory exists
         os.makedirs(os.path.dirname(self.filename), exist_ok=True)
 
@@ -59,211 +85,339 @@ class BifECA:
         # get params
         params = self.params
 
-        # variables
-        x = np.arange(0, params["N"], 2, dtype=np.int16)
-        y = np.arange(0, params["N"], 2, dtype=np.int16)
+        bif_param, values = bif_values(params)
 
-        # meshgrid
-        xx_mesh, yy_mesh = np.meshgrid(x, y)
+        if bif_param != "I_ext":
+            raise ValueError(f"bif_param {bif_param!r}: a single neuron can only sweep I_ext "
+                             "(g_s couples neurons, use bifurcation (network))")
 
-        # flatten
-        xx, yy = xx_mesh.flatten(), yy_mesh.flatten()
-        conds_size = xx.size
+        # esl parameters
+        N1, N2, N3, M, s1, s2, s3 = params["N1"], params["N2"], params["N3"], params["M"], params["s1"], params["s2"], params["s3"]
+        Tc, Tx, Wx, Ty, Wy, Tz, Wz = params["Tc"], params["Tx"], params["Wx"], params["Ty"], params["Wy"], params["Tz"], params["Wz"]
+
+        # initial conditions: grid of X0, Y0
+        stride = params.get("bif_ic_stride", 16)
+        x_ic, y_ic = np.arange(0, N1, stride), np.arange(0, N2, stride)
+        conds_size = x_ic.size * y_ic.size
 
         print("per a parameter: ", conds_size)
 
+        if params.get("continuation", False) and params.get("adaptive", False):
+            raise ValueError("continuation carries the state of every initial condition: adaptive off")
+
+        # points: branch, index, steps, transient (continuation.sweep)
+        points = sweep(params, values.size)
+        total = sum(point[2] for point in points) * conds_size
+        done = 0
+
+        h = np.float32(params["h"])
+        decimation = params.get("decimation", 100)
+
         # parameters
-        sT, eT = params["sT"], params["eT"]
-        tau1, b1, WE11, WE12, WI11, WI12 = params['tau1'], params['b1'], params['WE11'], params['WE12'], params['WI11'], params['WI12']
-        tau2, b2, WE21, WE22, WI21, WI22 = params['tau2'], params['b2'], params['WE21'], params['WE22'], params['WI21'], params['WI22']
-        N, M, s1, s2, Tc, Tx, Wx, Ty, Wy = params["N"], params["M"], params["s1"], params["s2"], params["Tc"], params["Tx"], params["Wx"], params["Ty"], params["Wy"]
+        a, b, c, d, r, s = np.float32(params['a']), np.float32(params['b']), np.float32(params['c']), np.float32(params['d']), np.float32(params['r']), np.float32(params['s'])
 
-        # store step
-        total_step = int(eT/Tc)+1
-        index_start = int(sT/Tc)
-        store_step = (total_step - index_start) // 100 + 1 if total_step > index_start else 0
+        # x_1
+        p = (d - b) / a
+        q = c / a
+
+        coef = [1, p, 0, -q]   # x^3 + p x^2 - q = 0
+        x_1 = np.roots(coef)[0]
+
+        # observables, classes
+        spike_th, sec_var, sec_level = params.get("spike_th", 0.0), params.get("poincare_var", 0), params.get("poincare_level", 1.0)
+        max_period = int(params.get("basin_max_period", 8))
+        tol, burst_ratio = params.get("basin_tol", 0.01), params.get("burst_ratio", 3.0)
 
 
         """ bifurcation """
 
-        # Condtions of S
-        bif_S = np.arange(0.20, 0.70, 0.005)
-        num_S = bif_S.size
+        # built once: components of Fin, Gin, Hin
+        ax3, bx2, yv, zv, Gin, Hin = _make_lut_compact(N1, N2, N3, M, s1, s2, s3, Tx, Wx, Ty, Wy, Tz, Wz,
+                                                       a, b, c, d, r, s, x_1)
+        Fin = np.empty((N1, N2, N3), dtype=np.int16)
+        delta_X = Wx/Tx
 
-        Q = params["Q"]
+        # phase clocks
+        clk = _clock(params)
+        cycle_detect = _cycle_detect(params, clk, int(params["eT"]/h)+1 - int(params["sT"]/h), decimation)
 
-        # store hist
-        Q_hist = np.zeros((num_S, conds_size))
-        S_hist = np.zeros((num_S, conds_size))
-        max_hist = np.zeros((num_S, conds_size), dtype=np.int16)
-        min_hist = np.zeros((num_S, conds_size), dtype=np.int16)
+        rows = []
+
+        # final states of the point before (continuation)
+        state = None
 
         """ run simulation """
         bench_sT = datetime.datetime.now()
+        t0 = time.perf_counter()
         print("\n start: ", bench_sT)
 
-        for idx in range(num_S):
+        for count, (branch, idx, total_step, index_start) in enumerate(points):
 
-            Fin, Gin = _make_lut_numba(N, M, s1, s2, Tx, Wx, Ty, Wy,
-                                       tau1, b1, bif_S[idx], WE11, WE12, WI11, WI12,
-                                       tau2, b2, WE21, WE22, WI21, WI22)
+            I_ext = values[idx]
+            _update_fin(Fin, ax3, bx2, yv, zv, I_ext, M, delta_X)
 
-            x_max, x_min = self.calc_bifurcation(xx, yy, 0, 0, 0, 0,
-                                                 N, M, Tc, Tx, Wx, Ty, Wy,
-                                                 total_step, index_start, store_step, Fin, Gin)
+            def evaluate(ii, jj):
 
-            Q_hist[idx, :] = Q
-            S_hist[idx, :] = bif_S[idx]
-            max_hist[idx, :] = x_max
-            min_hist[idx, :] = x_min
+                """ trajectories from X0 = x_ic[jj], Y0 = y_ic[ii] -> classes, x min / max; rows of the csv """
 
-            print("proccess: -*-*-*-*- ", round((idx/ num_S*100),  2), "% -*-*-*-*- ")
+                nonlocal state
 
-        bench_eT = datetime.datetime.now()
+                n = ii.size
+
+                if state is None:
+
+                    # state per initial condition: X, Y, Z, P, Q, R / phX, phY, phZ, T
+                    reg = np.zeros((n, 6), dtype=np.int64)
+                    reg[:, 0], reg[:, 1] = x_ic[jj], y_ic[ii]
+                    reg[:, 2:] = params["init_Z"], params["init_P"], params["init_Q"], params["init_R"]
+
+                    ph = np.zeros((n, 4))
+                    ph[:, :3] = initial_phase(params["init_phX"], clk), initial_phase(params["init_phY"], clk), initial_phase(params["init_phZ"], clk)
+
+                else:
+                    reg, ph = state
+
+                obs, hits = new_observation(params.get("max_hits", 256), n, burst_ratio)
+                mon = new_monitor(params, n)
+
+                periods = calc_bifurcation(reg, ph, M, N1, N2, N3, Fin, Gin, Hin,
+                                           Tc, clk, s1, s2, s3,
+                                           total_step, index_start, decimation,
+                                           spike_th, sec_var, sec_level, obs, hits,
+                                           cycle_detect, mon)
+
+                labels = np.empty(n, dtype=np.int8)
+                classify_batch(obs, hits, labels, max_period, tol, burst_ratio)
+
+                for cond in range(n):
+
+                    summary = summarize(obs[cond], hits[cond])
+
+                    row = {bif_param: I_ext, "X0": x_ic[jj[cond]], "Y0": y_ic[ii[cond]],
+                           "x_min": summary["min"][0], "x_max": summary["max"][0],
+                           "spikes": summary["spikes"],
+                           "isi_mean": summary["isi_mean"], "isi_std": summary["isi_std"],
+                           "hits": summary["hits"], "period": periods[cond], "label": labels[cond]}
+
+                    if branch is not None:
+                        row["branch"] = branch
+
+                    # auto_stop: when and why it stopped
+                    row.update(stop_report(None if mon is None else mon[cond], h))
+
+                    rows.append(row)
+
+                # the next point goes on from here
+                if branch is not None:
+                    state = reg, ph
+
+                return labels, obs[:, [OBS_MIN, OBS_MAX]]
+
+            # every initial condition, or the boundaries of the classes only (adaptive_grid)
+            if params.get("adaptive", False):
+                refine((y_ic.size, x_ic.size), evaluate, params.get("adaptive_coarse", 8), params.get("adaptive_tol", 0.05))
+            else:
+                ii, jj = np.indices((y_ic.size, x_ic.size))
+                evaluate(ii.ravel(), jj.ravel())
 
+            print("proccess: -*-*-*-*- ", round(((count + 1)/ len(points)*100),  2), "% -*-*-*-*- ", branch or "")
+
+            # steps of all initial conditions
+            done += conds_size * total_step
+            if self.progress is not None:
+                self.progress(done, total)
+
+        bench_eT = datetime.datetime.now()
+        t1 = time.perf_counter()
         print("end: ", bench_eT)
-        print("bench mark: ", bench_eT - bench_sT)
+        print("bench mark: ", t1 - t0)
 
 
         """ Store results as a DataFrame """
 
-        df = pd.DataFrame({
-            "Q": Q_hist.flatten(),
-            "S": S_hist.flatten(),
-            "max_val": max_hist.flatten(),
-            "min_val": min_hist.flatten()
-        })
+        import pandas as pd
+
+        self.df = pd.DataFrame(rows)
+        save_csv(self.df, self.filename)
+
+        return self.df
+
+
+class BifEcaNetwork:
+
+    def __init__(self, params, filename):
+
+        # get params
+        self.params = params
 
-        df = df[["Q", "S", "max_val", "min_val"]]
+        self.filename = filename
+        print(self.filename)
 
-        """ Save to CSV """
-        try:
-            df.to_csv(self.filename, index=False)
-            print(f"Results saved to {self.filename}")
-        except Exception as e:
-            print(f"Error saving results to {self.filename}: {e}")
+        # None or progress(done, total), called between points and chunks (method_selects.run_method)
+        self.progress = None
 
+        # Ensure output directory exists
+        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
 
 
-    def run_rotated(self):
+    def run(self, init_X=None):
 
         """ Initialization """
 
         # get params
         params = self.params
 
+        bif_param, values = bif_values(params)
+
+        if bif_param not in ["I_ext", "g_s"]:
+            raise ValueError(f"bif_param {bif_param!r} is not available for a network (I_ext, g_s)")
+
         # variables
-        x = np.arange(0, params["N"], 2, dtype=np.int16)
-        y = np.arange(0, params["N"], 2, dtype=np.int16)
+        init_X = np.array(INIT_X if init_X is None else init_X, dtype=np.int16)
+        init_YZ = np.zeros_like(init_X)
+        n = init_X.size
 
-        # meshgrid
-        xx_mesh, yy_mesh = np.meshgrid(x, y)
+        # esl parameters
+        N1, N2, N3, M, s1, s2, s3 = params["N1"], params["N2"], params["N3"], params["M"], params["s1"], params["s2"], params["s3"]
+        Tc, Tx, Wx, Ty, Wy, Tz, Wz = params["Tc"], params["Tx"], params["Wx"], params["Ty"], params["Wy"], params["Tz"], params["Wz"]
 
-        # flatten
-        xx, yy = xx_mesh.flatten(), yy_mesh.flatten()
-        conds_size = xx.size
+        # phase clocks (zero initial phases, as eca_net)
+        clk = _clock(params)
+        init_ph = np.full(init_X.shape, initial_phase(0.0, clk))
 
-        print("per a parameter: ", conds_size)
+        # time
+        sT, eT, h = params["sT"], params["eT"], np.float32(params["h"])
+
+        total_step = int(eT/h)+1
+        index_start = int(sT/h)
+        decimation = params.get("decimation", 100)
 
         # parameters
-        sT, eT = params["sT"], params["eT"]
-        tau1, b1, WE11, WE12, WI11, WI12 = params['tau1'], params['b1'], params['WE11'], params['WE12'], params['WI11'], params['WI12']
-        tau2, b2, WE21, WE22, WI21, WI22 = params['tau2'], params['b2'], params['WE21'], params['WE22'], params['WI21'], params['WI22']
-        N, M, s1, s2, Tc, Tx, Wx, Ty, Wy = params["N"], params["M"], params["s1"], params["s2"], params["Tc"], params["Tx"], params["Wx"],params["Ty"], params["Wy"]
-        deg = params["deg"]
+        a, b, c, d, r, s = np.float32(params['a']), np.float32(params['b']), np.float32(params['c']), np.float32(params['d']), np.float32(params['r']), np.float32(params['s'])
 
-        # store step
-        total_step = int(eT/Tc)+1
-        index_start = int(sT/Tc)
-        store_step = (total_step - index_start) // 100 + 1 if total_step > index_start else 0
+        # x_1
+        p = (d - b) / a
+        q = c / a
+
+        coef = [1, p, 0, -q]   # x^3 + p x^2 - q = 0
+        x_1 = np.roots(coef)[0]
+
+        # coupling
+        V_s = np.float32(params["V_s"])
+        out_indptr, out_indices, out_weights = coupling_to_csr(C_IJ)
+
+        # threads only pay off for large networks
+        kernel = _network_steps_parallel if n >= params.get("parallel_min_neurons", 2048) else _network_steps_serial
 
 
         """ bifurcation """
 
-        # Condtions of S
-        bif_S = np.arange(0.20, 0.70, 0.005)
-        num_S = bif_S.size
+        # built once: components of Fin, Gin, Hin
+        ax3, bx2, yv, zv, Gin, Hin = _make_lut_compact(N1, N2, N3, M, s1, s2, s3, Tx, Wx, Ty, Wy, Tz, Wz,
+                                                       a, b, c, d, r, s, x_1)
+        Fin = np.empty((N1, N2, N3), dtype=np.int16)
+        delta_X = Wx/Tx
 
-        Q = params["Q"]
+        if bif_param == "g_s":
+            _update_fin(Fin, ax3, bx2, yv, zv, np.float32(params["I_ext"]), M, delta_X)
 
-        # store hist
-        Q_hist = np.zeros((num_S, conds_size))
-        S_hist = np.zeros((num_S, conds_size))
-        max_hist = np.zeros((num_S, conds_size), dtype=np.int16)
-        min_hist = np.zeros((num_S, conds_size), dtype=np.int16)
+        rows = []
 
         """ run simulation """
         bench_sT = datetime.datetime.now()
+        t0 = time.perf_counter()
         print("\n start: ", bench_sT)
 
-        rotated_x, rotated_y =_make_rotated_coordinate(N, deg) # (size, degree)
+        for idx, value in enumerate(values):
 
-        for idx in range(num_S):
+            if bif_param == "I_ext":
+                _update_fin(Fin, ax3, bx2, yv, zv, value, M, delta_X)
+                g_s = np.float32(params["g_s"])
+            else:
+                g_s = value
 
-            Fin, Gin = _make_rotated_lut_numba(N, M, s1, s2, Tx, Wx, Ty, Wy,
-                                       tau1, b1, bif_S[idx], WE11, WE12, WI11, WI12,
-                                       tau2, b2, WE21, WE22, WI21, WI22,
-                                       rotated_x,  rotated_y, deg)
+            state = _network_state(init_X, init_YZ, init_YZ, init_YZ, init_YZ, init_YZ,
+                                   init_ph, init_ph, init_ph,
+                                   TH, out_indptr, out_indices, out_weights)
+            cur, T = 0, 0.0
 
-            x_max, x_min = self.calc_bifurcation(xx, yy, 0, 0, 0, 0,
-                                                 N, M, Tc, Tx, Wx, Ty,Wy,
-                                                 total_step, index_start, store_step, Fin, Gin)
+            x_min = np.full(n, np.iinfo(np.int16).max)
+            x_max = np.full(n, np.iinfo(np.int16).min)
 
-            Q_hist[idx, :] = Q
-            S_hist[idx, :] = bif_S[idx]
-            max_hist[idx, :] = x_max
-            min_hist[idx, :] = x_min
+            # chunks of the history, reduced to min / max right away
+            for i_begin, i_end in chunk_ranges(total_step, params.get("chunk_step", 10**6)):
 
-            print("proccess: -*-*-*-*- ", round((idx/ num_S*100),  2), "% -*-*-*-*- ")
+                k_begin, n_rows = chunk_rows(i_begin, i_end, index_start, decimation)
+                t_block = np.zeros(n_rows)
+                x_block = np.zeros((n, n_rows), dtype=np.int16)
 
-        bench_eT = datetime.datetime.now()
+                cur, T = kernel(*state, cur, T,
+                                M, N1, N2, N3, Fin, Gin, Hin,
+                                Tc, Tx, Wx, clk,
+                                M_I, s1, g_s, V_s, TH, out_indptr, out_indices, out_weights,
+                                i_begin, i_end, index_start, k_begin, t_block, x_block, decimation)
 
+                if n_rows > 0:
+                    x_min = np.minimum(x_min, x_block.min(axis=1))
+                    x_max = np.maximum(x_max, x_block.max(axis=1))
+
+                if self.progress is not None:
+                    self.progress(idx * total_step + i_end, values.size * total_step)
+
+            for j in range(n):
+                rows.append({bif_param: value, "neuron": j,
+                             "x_min": x_min[j]/s1 - 2, "x_max": x_max[j]/s1 - 2})
+
+            print("proccess: -*-*-*-*- ", round(((idx + 1)/ values.size*100),  2), "% -*-*-*-*- ")
+
+        bench_eT = datetime.datetime.now()
+        t1 = time.perf_counter()
         print("end: ", bench_eT)
-        print("bench mark: ", bench_eT - bench_sT)
+        print("bench mark: ", t1 - t0)
 
 
         """ Store results as a DataFrame """
 
-        df = pd.DataFrame({
-            "Q": Q_hist.flatten(),
-            "S": S_hist.flatten(),
-            "max_val": max_hist.flatten(),
-            "min_val": min_hist.flatten()
-        })
+        import pandas as pd
+
+        self.df = pd.DataFrame(rows)
+        save_csv(self.df, self.filename)
+
+        return self.df
 
-        df = df[["Q", "S", "max_val", "min_val"]]
 
-        """ Save to CSV """
-        try:
-            df.to_csv(self.filename, index=False)
-            print(f"Results saved to {self.filename}")
-        except Exception as e:
-            print(f"Error saving results to {self.filename}: {e}")
+@njit(parallel=True, cache=True)
+def calc_bifurcation(reg, ph, M, N1, N2, N3, Fin, Gin, Hin,
+                     Tc, clk, s1, s2, s3,
+                     total_step, index_start, decimation,
+                     spike_th, sec_var, sec_level, obs, hits, cycle_detect, mon=None):
 
+    """ calc_reduction_eca for every initial condition (row of reg, ph, obs, hits, mon), returns the periods """
 
+    periods = np.zeros(reg.shape[0], dtype=np.int64)
 
-    @staticmethod
-    @njit(parallel=True)
-    def calc_bifurcation(xx, yy, pp, qq, phxx, phyy,
-                         N, M, Tc, Tx, Wx, Ty, Wy,
-                         total_step, index_start, store_step, Fin, Gin):
+    for cond in prange(reg.shape[0]):
 
-        # conditinos number (x, y)
-        total_conds = xx.size
+        if mon is None:
+            periods[cond] = calc_reduction_eca(reg[cond], ph[cond], M, N1, N2, N3, Fin, Gin, Hin,
+                                               Tc, clk, s1, s2, s3,
+                                               0, total_step, index_start, decimation,
+                                               spike_th, sec_var, sec_level, obs[cond], hits[cond], cycle_detect)
+        else:
+            periods[cond] = calc_reduction_eca(reg[cond], ph[cond], M, N1, N2, N3, Fin, Gin, Hin,
+                                               Tc, clk, s1, s2, s3,
+                                               0, total_step, index_start, decimation,
+                                               spike_th, sec_var, sec_level, obs[cond], hits[cond], cycle_detect, mon[cond])
 
-        # return
-        x_max_hist = np.empty(total_conds, dtype=np.int16)
-        x_min_hist = np.empty(total_conds, dtype=np.int16)
+    return periods
 
-        # loop
-        for idx in prange(total_conds):
 
-            _, x_hist, _ = calc_time_evolution_eca(xx[idx], yy[idx], pp, qq, phxx, phyy,
-                                                    N, M, Tc, Tx, Wx, Ty, Wy,
-                                                    total_step, index_start, store_step, Fin, Gin)
+def save_csv(df, filename):
 
-            # prepare max, min
-            x_max_hist[idx] = np.max(x_hist)
-            x_min_hist[idx] = np.min(x_hist)
+    """ Save to CSV """
 
-        return x_max_hist, x_min_hist
\ No newline at end of file
+    try:
+        df.to_csv(filename, index=False)
+        print(f"Results saved to {filename}")
+    except Exception as e:
+        print(f"Error saving results to {filename}: {e}")
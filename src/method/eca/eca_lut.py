@@ -1,53 +1,250 @@
+# -*- coding: utf-8 -*-
+"""
+Created on: 2025-12-26
+Updated on: 2026-03-20
 
+@author: shirafujilab
 
+Contents: "Output LUT", Fin / Gin / Hin of the ESL HR neuron for the RTL
+
+    LutExport(params, filename).run():
+
+        <stem>_Fin.<fmt>, <stem>_Gin.<fmt>, <stem>_Hin.<fmt>, <stem>_manifest.json
+        (stem: DataLibrarian.save_path without .csv)
+
+        fmt (lut_format):
+            mem: $readmemh, one hex word per line, // header
+            coe: Xilinx, memory_initialization_radix=16, comma-separated vector
+
+        words: two's complement of lut_word_bits bits (0: the fewest holding +-(M-1)),
+               values clipped to +-(M-1) as the P, Q, R counters saturate there anyway
+        address: row-major, Fin (X*N2 + Y)*N3 + Z, Gin X*N2 + Y, Hin X*N3 + Z
+
+        The hex text is built with numpy, lut_chunk words at a time (no Python loop per entry,
+        no full text in memory), the sha256 of each file is updated on the way.
+
+    manifest: lut_key of lut_cache (the parameter hash), parameters, and per table the
+    file, shape, word width, address order, number of clipped entries and sha256.
+
+"""
+
+# import standard library
+import os
+import json
+import hashlib
+import datetime, time
 
 import numpy as np
-from src.method.eca.eca_basic import _make_lut_numba
-from src.graphics.graphic_lut import _make_rotated_coordinate
 
+# import my library
+from src.method.eca.lut_cache import cached_lut, lut_key, LUT_NAMES
+
+
+HEX_DIGITS = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)
+
+LUT_FORMATS = ("mem", "coe")
+
+ADDRESS = {"Fin": "(X*N2 + Y)*N3 + Z", "Gin": "X*N2 + Y", "Hin": "X*N3 + Z"}
+
+
+class LutExport:
+
+    def __init__(self, params, filename):
+
+        # get params, filename
+        self.params = params
+        self.filename = filename
+
+        # None or progress(done, total), called between chunks (method_selects.run_method)
+        self.progress = None
+
+        # Ensure output directory exists
+        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+
+        # Confirm: output filename
+        print(filename)
+
+    def run(self):
+
+        """ write the tables and the manifest, returns the manifest """
+
+        params = self.params
+
+        # esl parameters
+        N1, N2, N3, M, s1, s2, s3 = params["N1"], params["N2"], params["N3"], params["M"], params["s1"], params["s2"], params["s3"]
+        Tx, Wx, Ty, Wy, Tz, Wz = params["Tx"], params["Wx"], params["Ty"], params["Wy"], params["Tz"], params["Wz"]
+
+        # output
+        fmt = params.get("lut_format", "mem")
+        if fmt not in LUT_FORMATS:
+            raise ValueError(f"lut_format {fmt!r}: {', '.join(LUT_FORMATS)}")
+
+        word_bits = word_width(M, params.get("lut_word_bits", 0))
+        chunk = int(params.get("lut_chunk", 2**20))
+
+        # parameters
+        a, b, c, d, r, s = np.float32(params['a']), np.float32(params['b']), np.float32(params['c']), np.float32(params['d']), np.float32(params['r']), np.float32(params['s'])
+        I_ext = np.float32(params["I_ext"])
+
+        # x_1
+        p = (d - b) / a
+        q = c / a
+
+        coef = [1, p, 0, -q]   # x^3 + p x^2 - q = 0
+        x_1 = np.roots(coef)[0]
+
+        """ export """
+        bench_sT = datetime.datetime.now()
+        t0 = time.perf_counter()
+        print("\n start: ", bench_sT)
+
+        # make lut (or reuse it from the cache)
+        luts = cached_lut(N1, N2, N3, M, s1, s2, s3, Tx, Wx, Ty, Wy, Tz, Wz,
+                          a, b, c, d, r, s, x_1, I_ext)
+
+        key = lut_key(N1, N2, N3, M, s1, s2, s3, Tx, Wx, Ty, Wy, Tz, Wz,
+                      a, b, c, d, r, s, x_1, I_ext)
+
+        stem = os.path.splitext(self.filename)[0]
+        total = sum(lut.size for lut in luts)
+        done = 0
+
+        tables = {}
+
+        for name, lut in zip(LUT_NAMES, luts):
+
+            path = f"{stem}_{name}.{fmt}"
+            header = [f"{name} {'x'.join(str(n) for n in lut.shape)}, {word_bits}-bit two's complement, address {ADDRESS[name]}",
+                      f"lut_key {key}"]
+
+            def report(n, done=done):
+                if self.progress is not None:
+                    self.progress(done + n, total)
+
+            digest, clipped = write_lut(path, lut, M, word_bits, fmt, header, chunk, report)
+            done += lut.size
+
+            tables[name] = {"file": os.path.basename(path), "shape": list(lut.shape),
+                            "word_bits": word_bits, "signed": True, "address": ADDRESS[name],
+                            "clipped": clipped, "sha256": digest}
+
+            print(name, ": ", path)
+
+        self.manifest = {"lut_key": key,
+                         "created": bench_sT.isoformat(timespec="seconds"),
+                         "format": fmt,
+                         "params": {k: float(v) for k, v in zip(("N1", "N2", "N3", "M", "s1", "s2", "s3",
+                                                                  "Tx", "Wx", "Ty", "Wy", "Tz", "Wz",
+                                                                  "a", "b", "c", "d", "r", "s", "x_1", "I_ext"),
+                                                                 (N1, N2, N3, M, s1, s2, s3, Tx, Wx, Ty, Wy, Tz, Wz,
+                                                                  a, b, c, d, r, s, x_1, I_ext))},
+                         "tables": tables}
+
+        with open(f"{stem}_manifest.json", "w") as f:
+            json.dump(self.manifest, f, indent=4)
+
+        bench_eT = datetime.datetime.now()
+        t1 = time.perf_counter()
+        print("end: ", bench_eT)
+        print("bench mark: ", t1 - t0)
+
+        return self.manifest
+
+
+def word_width(M, word_bits=0):
+
+    """ bits of the words: word_bits, or the fewest holding -(M-1) .. M-1 in two's complement """
+
+    need = int(M - 1).bit_length() + 1
+
+    if not word_bits:
+        return need
+
+    word_bits = int(word_bits)
+    if not need <= word_bits <= 64:
+        raise ValueError(f"lut_word_bits {word_bits}: +-(M-1) = {M-1} needs {need} .. 64")
+
+    return word_bits
+
+
+def hex_words(values, word_bits, sep=b""):
+
+    """ int array -> ascii: one zero-padded lower-case hex word + sep + newline per value """
+
+    digits = -(-word_bits // 4)
+    words = values.astype(np.int64).ravel() & ((1 << word_bits) - 1)
+
+    width = digits + len(sep) + 1
+    text = np.empty((words.size, width), dtype=np.uint8)
+
+    # most significant nibble first
+    shifts = 4 * np.arange(digits - 1, -1, -1, dtype=np.int64)
+    text[:, :digits] = HEX_DIGITS[(words[:, None] >> shifts) & 0xF]
+
+    for idx, char in enumerate(sep):
+        text[:, digits + idx] = char
+    text[:, -1] = ord("\n")
+
+    return text
+
+
+def write_lut(path, lut, M, word_bits, fmt, header, chunk=2**20, report=None):
+
+    """
+    lut (any shape, row-major) -> path, chunk words at a time
 
-def make_lut_for_verilog(params, filename, mode):
+    Return:
+        sha256 of the file, number of entries clipped to +-(M-1)
+    """
 
-    """ configuration"""
+    flat = lut.reshape(-1)
+    digest = hashlib.sha256()
+    clipped = 0
 
-    # inits
-    x = np.arange(0, params["N"], 1, dtype=np.int16)
-    y = np.arange(0, params["N"], 1, dtype=np.int16)
+    # write then rename, as lut_cache
+    tmp_path = f"{path}.{os.getpid()}.tmp"
 
-    # meshgrid -> 1d
-    xx_mesh, yy_mesh = np.meshgrid(x, y, indexing = "ij")
-    xx, yy = xx_mesh.flatten(), yy_mesh.flatten()
+    with open(tmp_path, "wb") as f:
 
-    # parameters
-    sT, eT = 300, 500
-    tau1, b1, S, WE11, WE12, WI11, WI12 = params['tau1'], params['b1'], params['S'], params['WE11'], params['WE12'], params['WI11'], params['WI12']
-    tau2, b2, WE21, WE22, WI21, WI22 = params['tau2'], params['b2'], params['WE21'], params['WE22'], params['WI21'], params['WI22']
-    N, M, s1, s2, gamma_X, gamma_Y, Tc, Tx, Ty = params["N"], params["M"], params["s1"], params["s2"], params["gamma_X"], params["gamma_Y"], params["Tc"], params["Tx"], params["Ty"]
-    deg = params["deg"]
+        def put(data):
+            digest.update(data)
+            f.write(data)
 
-    rotated_x, rotated_y =_make_rotated_coordinate(N, deg) # (size, degree)
+        if fmt == "mem":
+            put("".join(f"// {line}\n" for line in header).encode("ascii"))
+        else:
+            put("".join(f"; {line}\n" for line in header).encode("ascii"))
+            put(b"memory_initialization_radix=16;\nmemory_initialization_vector=\n")
 
+        for begin in range(0, flat.size, max(int(chunk), 1)):
 
+            block = np.asarray(flat[begin:begin + chunk])
+            values = np.clip(block, -(M - 1), M - 1)
+            clipped += int(np.count_nonzero(values != block))
 
-    F, G, H = _make_lut_numba(N, M, s1, s2, gamma_X, gamma_Y, Tc, Tx, Ty,
-                               tau1, b1, S, WE11, WE12, WI11, WI12,
-                               tau2, b2, WE21, WE22, WI21, WI22)
+            if fmt == "mem":
+                text = hex_words(values, word_bits)
+            else:
+                # "," after every word, ";" after the last one
+                text = hex_words(values, word_bits, b",")
+                if begin + block.size == flat.size:
+                    text[-1, -2] = ord(";")
 
+            put(text.tobytes())
 
-    F = np.clip(F, -params["M"]+1, params["M"]-1)
-    G = np.clip(G, -params["M"]+1, params["M"]-1)
+            if report is not None:
+                report(begin + block.size)
 
-    print(F, G)
+    os.replace(tmp_path, path)
 
-    with open(filename, "w") as f:
+    return digest.hexdigest(), clipped
 
-        for idx in range(N*N):
 
-            x = idx // N
-            y = idx % N
+def read_mem(path, word_bits):
 
-            print(f"Fmatrix[{x}][{y}]={F[x,y]};", file = f)
-            print(f"Gmatrix[{x}][{y}]={G[x,y]};", file = f)
+    """ $readmemh file -> signed int64 array (flat), for checks """
 
+    words = [int(line, 16) for line in open(path) if line.strip() and not line.startswith("//")]
+    values = np.array(words, dtype=np.int64)
 
-    print(filename)
+    return np.where(values >= 1 << (word_bits - 1), values - (1 << word_bits), values)
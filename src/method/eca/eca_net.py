@@ -10,15 +10,36 @@ Created on: 2026-03-03
 
 
 import numpy as np
-import math
-import matplotlib.pyplot as plt
-import numba
-numba.set_num_threads(15)
 from numba import njit, prange
 
 import os
+import types
 import datetime, time
 
+# import my library
+from src.method.eca.lut_cache import cached_lut
+from src.method.eca.phase_clock import make_clock, initial_phase, phase_step
+from src.method.eca.eca_basic import _register_update
+from src.utils.history_writer import HistoryWriter, history_path, chunk_ranges, chunk_rows
+
+# 9-neuron default network: initial X, coupling c_ij (post, pre)
+INIT_X = np.array([0, 6, 12, 18, 24, 36, 42, 48, 24], dtype=np.int16)
+
+C_IJ = np.array([[0, 1, 1, 1, 0, 0, 0, 0, 0],
+                 [0, 0, 0, 0, 1, 1, 1, 0, 0],
+                 [1, 0, 0, 0, 0, 0, 0, 1, 1],
+                 [0, 1, 0, 0, 1, 0, 0, 1, 0],
+                 [0, 0, 1, 0, 0, 1, 0, 0, 1],
+                 [1, 0, 0, 1, 0, 0, 1, 0, 0],
+                 [0, 0, 1, 0, 0, 1, 0, 0, 1],
+                 [0, 1, 0, 0, 1, 0, 1, 0, 0],
+                 [1, 0, 0, 1, 0, 0, 0, 1, 0]], dtype=np.float32)
+
+# synapse threshold on X, range of the synaptic counter
+TH = np.int16(40)
+M_I = 2**6
+
+
 class TimeEvolEcaNetwork:
 
     def __init__(self, params, filename):
@@ -27,28 +48,41 @@ class TimeEvolEcaNetwork:
         self.params = params
         self.filename = filename
 
+        # None or progress(done, total), called between chunks (method_selects.run_method)
+        self.progress = None
+
         # Ensure output directory exists
         os.makedirs(os.path.dirname(self.filename), exist_ok=True)
 
         # Confirm: output filename
         print(filename)
 
-    def run(self):
+    def run(self, init_X=None, edges=None):
+
+        """
+        init_X: None (9-neuron default) or 1d array (n,)
+        edges: None (c_ij below) or (pre, post, weight) arrays for large networks
+        """
 
         params = self.params
 
         """ For ESL """
 
         # variables
-        init_X = np.array([0, 6, 12, 18, 24, 36, 42, 48, 24], dtype=np.int16)
+        if init_X is None:
+            init_X = INIT_X
+        init_X = np.array(init_X, dtype=np.int16)
         init_Y, init_Z = np.zeros_like(init_X), np.zeros_like(init_X)
         init_P, init_Q, init_R = np.zeros_like(init_X), np.zeros_like(init_X), np.zeros_like(init_X)
-        init_phX, init_phY, init_phZ = np.zeros(init_X.shape, np.float32), np.zeros(init_X.shape, np.float32), np.zeros(init_X.shape, np.float32)
 
         # esl parameters
         N1, N2, N3, M, s1, s2, s3 = params["N1"], params["N2"], params["N3"], params["M"], params["s1"], params["s2"], params["s3"]
         Tc, Tx, Wx, Ty, Wy, Tz, Wz = params["Tc"], params["Tx"], params["Wx"], params["Ty"], params["Wy"], params["Tz"], params["Wz"]
-        M_I = 2**6
+
+        # phase clocks: float32 phases, or int64 accumulators (int_phase, phase_bits)
+        clk = make_clock(Tc, Tx, Wx, Ty, Wy, Tz, Wz, params.get("int_phase", False), params.get("phase_bits", 32))
+        init_phX = np.full(init_X.shape, initial_phase(0.0, clk))
+        init_phY, init_phZ = init_phX.copy(), init_phX.copy()
 
         """ sim config """
 
@@ -58,7 +92,8 @@ class TimeEvolEcaNetwork:
         # store step
         total_step = int(eT/h)+1
         index_start = int(sT/h)
-        store_step = (total_step - index_start) // 100 + 1 if total_step > index_start else 0
+        decimation = params.get("decimation", 100)
+        store_step = (total_step - index_start) // decimation + 1 if total_step > index_start else 0
 
         """ for models """
 
@@ -76,24 +111,22 @@ class TimeEvolEcaNetwork:
         # coupling parameters V_s, Theta, g_s, gamma, c_ij
         Theta = np.float32(params["Theta"])     # 0, 1 determined by this value　⇒ np.int16(Theta * s1)
 
-        Th = np.int16(40) #np.int16((Theta)*(N1/s1)) -2       # exceeding over 24, connecting synapse (this function denote 1)
+        Th = TH #np.int16((Theta)*(N1/s1)) -2       # exceeding over 24, connecting synapse (this function denote 1)
         V_s = np.float32(params["V_s"])         # default value (2)
         g_s = np.float32(params["g_s"])         # 0.429
         gamma = np.float32(params["gamma"])
 
-        c_ij = np.array([[0, 1, 1, 1, 0, 0, 0, 0, 0],
-                         [0, 0, 0, 0, 1, 1, 1, 0, 0],
-                         [1, 0, 0, 0, 0, 0, 0, 1, 1],
-                         [0, 1, 0, 0, 1, 0, 0, 1, 0],
-                         [0, 0, 1, 0, 0, 1, 0, 0, 1],
-                         [1, 0, 0, 1, 0, 0, 1, 0, 0],
-                         [0, 0, 1, 0, 0, 1, 0, 0, 1],
-                         [0, 1, 0, 0, 1, 0, 1, 0, 0],
-                         [1, 0, 0, 1, 0, 0, 0, 1, 0]], dtype=np.float32)
-
-        n = c_ij.shape[0]
+        c_ij = C_IJ
+
+        n = init_X.size
         k = np.sum(c_ij[0])
 
+        # outgoing CSR (scales with the number of synapses, not n**2)
+        if edges is None:
+            out_indptr, out_indices, out_weights = coupling_to_csr(c_ij)
+        else:
+            out_indptr, out_indices, out_weights = edges_to_csr(*edges, init_X.size)
+
         """ run simulation """
         bench_sT = datetime.datetime.now()
         t0 = time.perf_counter()
@@ -102,20 +135,37 @@ class TimeEvolEcaNetwork:
         print(N1, N2, N3, M, s1, s2, s3, Tx, Wx, Ty, Wy, Tz, Wz,
                                         a, b, c, d, r, s, x_1, I_ext)
 
-        # make lut
-        Fin, Gin, Hin = _make_lut_numba(N1, N2, N3, M, s1, s2, s3, Tx, Wx, Ty, Wy, Tz, Wz,
-                                        a, b, c, d, r, s, x_1, I_ext)
+        # make lut (or reuse it from the cache)
+        Fin, Gin, Hin = cached_lut(N1, N2, N3, M, s1, s2, s3, Tx, Wx, Ty, Wy, Tz, Wz,
+                                   a, b, c, d, r, s, x_1, I_ext)
 
+        # threads only pay off for large networks
+        parallel = n >= params.get("parallel_min_neurons", 2048)
 
         # set calode
-        t_hist, X_hist = calc_time_evolution_eca(init_X, init_Y, init_Z,
-                                                 init_P, init_Q, init_R,
-                                                 init_phX, init_phY, init_phZ,
-                                                 M, N1, N2, N3,
-                                                 Fin, Gin, Hin,
-                                                 Tc, Tx, Wx, Ty, Wy, Tz, Wz,
-                                                 M_I, s1, g_s, V_s, Th, c_ij,         # network parameters
-                                                 total_step, index_start, store_step)
+        if params.get("stream", False):
+
+            # chunk by chunk into <save_path>.npy, columns (t, x_0, ..., x_n-1)
+            hist = self._run_stream(init_X, init_Y, init_Z, init_P, init_Q, init_R,
+                                    init_phX, init_phY, init_phZ,
+                                    M, N1, N2, N3, Fin, Gin, Hin,
+                                    Tc, Tx, Wx, clk,
+                                    M_I, s1, g_s, V_s, Th, out_indptr, out_indices, out_weights,
+                                    total_step, index_start, parallel, decimation)
+
+            # memory-mapped views
+            t_hist, X_hist = hist[:, 0], hist[:, 1:].T
+
+        else:
+            t_hist, X_hist = calc_time_evolution_eca(init_X, init_Y, init_Z,
+                                                     init_P, init_Q, init_R,
+                                                     init_phX, init_phY, init_phZ,
+                                                     M, N1, N2, N3,
+                                                     Fin, Gin, Hin,
+                                                     Tc, Tx, Wx, clk,
+                                                     M_I, s1, g_s, V_s, Th,               # network parameters
+                                                     out_indptr, out_indices, out_weights,
+                                                     total_step, index_start, store_step, parallel, decimation)
 
         bench_eT = datetime.datetime.now()
         t1 = time.perf_counter()
@@ -127,73 +177,50 @@ class TimeEvolEcaNetwork:
 
         return t_hist, X_hist
 
+    def _run_stream(self, init_X, init_Y, init_Z, init_P, init_Q, init_R,
+                    init_phX, init_phY, init_phZ,
+                    M, N1, N2, N3, Fin, Gin, Hin,
+                    Tc, Tx, Wx, clk,
+                    M_I, s1, g_s, V_s, Th, out_indptr, out_indices, out_weights,
+                    total_step, index_start, parallel, decimation):
 
-@njit(parallel=True)
-def _make_lut_numba(N1, N2, N3, M, s1, s2, s3, Tx, Wx, Ty, Wy, Tz, Wz,
-                    a, b, c, d, r, s, x_1, I_ext):
-
-    Fin = np.zeros((N1,N2,N3), dtype=np.int16)
-    Gin = np.zeros((N1,N2), dtype=np.int16)
-    Hin = np.zeros((N1,N3), dtype=np.int16)
+        n = init_X.shape[0]
 
-    delta_X = Wx/Tx
-    delta_Y = Wy/Ty
-    delta_Z = Wz/Tz
-
-    # inputs to F: (X, Y, Z)
-    for idx in prange(N1*N2*N3):
-
-        i = idx // (N2 * N3)
-        j = (idx %  (N2 * N3)) // N3
-        k = idx % N3
-
-        x = (i/s1) - 2
-        y = (j/s2) - 12
-        z = (k/s3)
-
-        F = y  -  a*x**3 + b*x**2 - z + I_ext
+        # state carried between chunks
+        state = _network_state(init_X, init_Y, init_Z, init_P, init_Q, init_R,
+                               init_phX, init_phY, init_phZ,
+                               Th, out_indptr, out_indices, out_weights)
+        cur, T = 0, 0.0
 
-        if F >= 0   and F <  0.0001: Fin[i, j, k] = M-1
-        elif F < 0  and F > -0.0001: Fin[i, j, k] = -(M-1)
-        elif F >= 0 and F >= 0.0001: Fin[i, j, k] = math.ceil(1/(F/delta_X))
-        else: Fin[i, j, k] = math.floor(1/(F/delta_X))
+        kernel = _network_steps_parallel if parallel else _network_steps_serial
 
-    # inputs to G: (X, Y)
-    for idx in prange(N1*N2):
+        writer = HistoryWriter(history_path(self.filename), n + 1)
+        print("stream: ", writer.path)
 
-        i = idx//N2
-        j = idx%N2
+        try:
+            for i_begin, i_end in chunk_ranges(total_step, self.params.get("chunk_step", 10**6)):
 
-        x = (i/s1) - 2
-        y = (j/s2) - 12
+                k_begin, rows = chunk_rows(i_begin, i_end, index_start, decimation)
+                t_block = np.zeros(rows)
+                x_block = np.zeros((n, rows), dtype=np.int16)
 
-        G = c - d*x**2 - y
+                cur, T = kernel(*state, cur, T,
+                                M, N1, N2, N3, Fin, Gin, Hin,
+                                Tc, Tx, Wx, clk,
+                                M_I, s1, g_s, V_s, Th, out_indptr, out_indices, out_weights,
+                                i_begin, i_end, index_start, k_begin, t_block, x_block, decimation)
 
-        if G >= 0   and G <  0.0001: Gin[i, j] = M-1
-        elif G < 0  and G > -0.0001: Gin[i, j] = -(M-1)
-        elif G >= 0 and G >= 0.0001: Gin[i, j] = math.ceil(1/(G/delta_Y))
-        else: Gin[i, j] = math.floor(1/(G/delta_Y))
+                writer.append(np.column_stack((t_block, x_block.T)))
 
-    # inputs to H are (X, Z)
-    for idx in prange(N1*N3):
+                if self.progress is not None:
+                    self.progress(i_end, total_step)
+        finally:
+            writer.close()
 
-        i = idx//N3
-        k = idx%N3
+        return writer.load()
 
-        x = (i/s1) - 2
-        z = (k/s3)
 
-        H = r*(s*(x - x_1) - z)
-
-        if H >= 0   and H <  0.0001: Hin[i, k] = M-1
-        elif H < 0  and H > -0.0001: Hin[i, k] = -(M-1)
-        elif H >= 0 and H >= 0.0001: Hin[i, k] =  math.ceil(1/(H/delta_Z))
-        else: Hin[i, k] =  math.floor(1/(H/delta_Z))
-
-    return Fin, Gin, Hin
-
-
-@njit
+@njit(cache=True)
 def _I_lut(n, M_I, x_previous, s1,
            Tx, Wx,
            g_s, V_s, syn):
@@ -218,197 +245,285 @@ def _I_lut(n, M_I, x_previous, s1,
     return Iin
 
 
-@njit
-def calc_time_evolution_eca(init_X, init_Y, init_Z,
-                            init_P, init_Q, init_R,
-                            init_phX, init_phY, init_phZ,
-                            M, N1, N2, N3,
-                            Fin, Gin, Hin,
-                            Tc, Tx, Wx, Ty, Wy, Tz, Wz,
+def coupling_to_csr(c_ij):
+
+    """
+    Dense c_ij (post, pre) -> outgoing CSR (pre -> post)
+
+        post of neuron i: out_indices[out_indptr[i]:out_indptr[i+1]]
+        weights:          out_weights[out_indptr[i]:out_indptr[i+1]]
+    """
+
+    post, pre = np.nonzero(c_ij)
+
+    return edges_to_csr(pre, post, c_ij[post, pre], c_ij.shape[0])
+
+
+def edges_to_csr(pre, post, weight, n):
+
+    """ Edge list (pre[e] -> post[e], weight[e]) -> outgoing CSR, sorted by pre """
+
+    pre = np.asarray(pre, dtype=np.int64)
+    post = np.asarray(post, dtype=np.int64)
+    weight = np.asarray(weight, dtype=np.float64)
+
+    order = np.argsort(pre, kind="stable")
 
-                            M_I, s1, g_s, V_s, Th, c_ij,
+    out_indptr = np.zeros(n+1, dtype=np.int64)
+    np.cumsum(np.bincount(pre, minlength=n), out=out_indptr[1:])
 
-                            total_step, index_start, store_step):
+    return out_indptr, post[order], weight[order]
 
-    # variables
-    x_next = x_previous = init_X
-    y_next = y_previous = init_Y
-    z_next = z_previous = init_Z
-    p_next = p_previous = init_P
-    q_next = q_previous = init_Q
-    r_next = r_previous = init_R
-    phx_next = phx_previous = init_phX
-    phy_next = phy_previous = init_phY
-    phz_next = phz_previous = init_phZ
+
+@njit(cache=True)
+def _init_synapse(x, Th, out_indptr, out_indices, out_weights, gamma, syn):
+
+    """ gamma[i] = (x[i] > Th), syn[j] = sum of weights from the neurons over threshold """
+
+    n = x.shape[0]
+
+    syn[:] = 0.0
+
+    for i in range(n):
+
+        gamma[i] = 1 if x[i] > Th else 0
+
+        if gamma[i] == 1:
+            for e in range(out_indptr[i], out_indptr[i+1]):
+                syn[out_indices[e]] += out_weights[e]
+
+
+def _network_state(init_X, init_Y, init_Z,
+                   init_P, init_Q, init_R,
+                   init_phX, init_phY, init_phZ,
+                   Th, out_indptr, out_indices, out_weights):
+
+    """
+    State carried by _network_steps between calls
+
+        registers and phases double buffered, shape (2, n): row cur is the current tick
+        gamma, syn: synapse state (_init_synapse)
+        crossed, n_crossed: per-block lists of neurons crossing Th
+    """
 
     n = init_X.shape[0]
 
-    Cx = 0
-    Cy = 0
-    Cz = 0
-    T = 0
+    bufs = []
+    for init in (init_X, init_Y, init_Z, init_P, init_Q, init_R, init_phX, init_phY, init_phZ):
+        buf = np.empty((2, n), dtype=init.dtype)
+        buf[0] = init
+        bufs.append(buf)
 
-    # store return arrays
-    t_hist = np.zeros(store_step)
-    x_hist = np.zeros((n, store_step), dtype=np.int16)
+    # synapse: over-threshold flags, summed input
+    gamma = np.zeros(n, dtype=np.uint8)
+    syn = np.zeros(n)
 
-    I_previous = I_next = np.zeros(n, dtype=np.int16)
+    _init_synapse(init_X, Th, out_indptr, out_indices, out_weights, gamma, syn)
 
-    idx = 0
+    # neurons crossing Th, listed per block
+    n_blocks = min(n, 256)
+    crossed = np.zeros(n, dtype=np.int64)
+    n_crossed = np.zeros(n_blocks, dtype=np.int64)
 
-    for i in range(total_step):
+    return (*bufs, gamma, syn, crossed, n_crossed)
 
-        # count the numer of synapse over threshold
-        Gamma = np.where(x_previous > Th, np.float32(1), np.float32(0))
-        syn = c_ij @ Gamma
 
-        for j in range(n):
+def _network_steps(x_buf, y_buf, z_buf, p_buf, q_buf, r_buf, phx_buf, phy_buf, phz_buf,
+                   gamma, syn, crossed, n_crossed,
+                   cur, T,
+                   M, N1, N2, N3,
+                   Fin, Gin, Hin,
+                   Tc, Tx, Wx, clk,
 
-            # time evolution
-            T, phx_next[j], phy_next[j], phz_next[j], Cx, Cy, Cz = time_evolution(Tc, Tx, Wx, Ty, Wy, Tz, Wz, T, phx_previous[j], phy_previous[j], phz_previous[j])
+                   M_I, s1, g_s, V_s, Th, out_indptr, out_indices, out_weights,
 
-            # calculate
-            Fx = Fin[x_previous[j], y_previous[j], z_previous[j]]
-            Fy = Gin[x_previous[j], y_previous[j]]
-            Fz = Hin[x_previous[j], z_previous[j]]
+                   i_begin, i_end, index_start, k_begin, t_hist, x_hist, decimation=100,
+                   y_hist=None, z_hist=None):
 
-            absFx = abs(Fx)
-            absFy = abs(Fy)
-            absFz = abs(Fz)
+    """
+    Ticks [i_begin, i_end) of the network, resumable (state from _network_state)
 
-            # cal auxiliary variables
-            if Cx == 1:
+    Coupling as outgoing CSR (coupling_to_csr / edges_to_csr)
 
-                # Synapse Input
-                FI = _I_lut(n, M_I, x_previous[j], s1, Tx, Wx, g_s, V_s, syn[j])
-                absFI = abs(FI)
+        syn[j] = sum_i c_ij[j, i] * (x[i] > Th) is kept up to date incrementally:
+        only a neuron whose X crossed Th during the tick scatters +-weight to its
+        targets, after all neurons of the tick have read the old syn.
 
-                #if (I_previous[j] < absFI) and (I_previous[j] < M_I - 1):
-                #    I_next[j] = I_previous[j] + np.int16(1)
-                #else:
-                #    I_next[j] = 0
+    Per-neuron update
 
-                #    if (FI >0):
-                #        p_update = np.int16(1)
-                #    elif (FI < 0):
-                #        p_update = - np.int16(1)
+        Every neuron reads row cur of the buffers and writes row 1-cur (swapped after
+        the tick), so the neurons are independent and run under prange. Neurons are
+        split into blocks, each block lists its own crossings, and the (rare) scatter
+        is done serially. T advances once per tick.
 
-                if (p_previous[j] < absFx) and (p_previous[j] < M - 1):
-                    p_next[j] = p_previous[j] + np.int16(1) + FI
-                else:
-                    p_next[j] = 0 + FI
+    Return:
+        cur, T for the next call; t_hist[k - k_begin], x_hist[:, k - k_begin] hold sample k
+        (y_hist, z_hist as x_hist, if given)
+    """
 
-                    # state transition of x
-                    if (Fx >=0) and (x_previous[j] < N1-1):
-                        x_next[j] = x_previous[j] + np.int16(1)
-                    elif (Fx < 0) and (x_previous[j] > 0):
-                        x_next[j] = x_previous[j] - np.int16(1)
-                    else:
-                        x_next[j] = x_previous[j]
+    n = x_buf.shape[1]
+    n_blocks = n_crossed.shape[0]
 
+    # clocks (phase_clock), Tx, Wx only for the synapse input
+    inc_x, inc_y, inc_z, thr_x, thr_y, thr_z, wrap = clk
 
-            else:
-                x_next[j] = x_previous[j]
-                p_next[j] = p_previous[j]
-                I_next[j] = I_previous[j]
+    for i in range(i_begin, i_end):
 
+        T = T + Tc
 
-            # cal auxiliary variables
-            if Cy == 1:
-                if (q_previous[j] < absFy) and (q_previous[j] < M - 1):
-                    q_next[j] = q_previous[j] + np.int16(1)
-                else:
-                    q_next[j] = 0
+        # variables (double buffered)
+        x_prev, x_next = x_buf[cur], x_buf[1-cur]
+        y_prev, y_next = y_buf[cur], y_buf[1-cur]
+        z_prev, z_next = z_buf[cur], z_buf[1-cur]
+        p_prev, p_next = p_buf[cur], p_buf[1-cur]
+        q_prev, q_next = q_buf[cur], q_buf[1-cur]
+        r_prev, r_next = r_buf[cur], r_buf[1-cur]
+        phx_prev, phx_next = phx_buf[cur], phx_buf[1-cur]
+        phy_prev, phy_next = phy_buf[cur], phy_buf[1-cur]
+        phz_prev, phz_next = phz_buf[cur], phz_buf[1-cur]
 
-                    # state transition of y
-                    if (Fy >=0) and (y_previous[j] < N2-1):
-                        y_next[j] = y_previous[j] + np.int16(1)
-                    elif (Fy < 0) and (y_previous[j] > 0):
-                        y_next[j] = y_previous[j] - np.int16(1)
-                    else:
-                        y_next[j] = y_previous[j]
-            else:
-                y_next[j] = y_previous[j]
-                q_next[j] = q_previous[j]
+        for blk in prange(n_blocks):
 
+            j_start = blk * n // n_blocks
+            j_end = (blk + 1) * n // n_blocks
+            count = 0
 
-            # cal auxiliary variables
-            if Cz == 1:
-                if (r_previous[j] < absFz) and (r_previous[j] < M - 1):
-                    r_next[j] = r_previous[j] + np.int16(1)
-                else:
-                    r_next[j] = 0
+            for j in range(j_start, j_end):
+
+                # time evolution
+                Cx, phx_next[j] = phase_step(phx_prev[j], inc_x, thr_x, wrap)
+                Cy, phy_next[j] = phase_step(phy_prev[j], inc_y, thr_y, wrap)
+                Cz, phz_next[j] = phase_step(phz_prev[j], inc_z, thr_z, wrap)
+
+                # calculate
+                Fx = Fin[x_prev[j], y_prev[j], z_prev[j]]
+                Fy = Gin[x_prev[j], y_prev[j]]
+                Fz = Hin[x_prev[j], z_prev[j]]
 
-                    # state transition of y
-                    if (Fz >=0) and (z_previous[j] < N3-1):
-                        z_next[j] = z_previous[j] + np.int16(1)
-                    elif (Fz < 0) and (z_previous[j] > 0):
-                        z_next[j] = z_previous[j] - np.int16(1)
+                # cal auxiliary variables
+                if Cx == 1:
+
+                    # Synapse Input
+                    FI = _I_lut(n, M_I, x_prev[j], s1, Tx, Wx, g_s, V_s, syn[j])
+
+                    if (p_prev[j] < abs(Fx)) and (p_prev[j] < M - 1):
+                        p_next[j] = p_prev[j] + np.int16(1) + FI
+                        x_next[j] = x_prev[j]
                     else:
-                        z_next[j] = z_previous[j]
-            else:
-                z_next[j] = z_previous[j]
-                r_next[j] = r_previous[j]
+                        p_next[j] = 0 + FI
+
+                        # state transition of x
+                        if (Fx >=0) and (x_prev[j] < N1-1):
+                            x_next[j] = x_prev[j] + np.int16(1)
+                        elif (Fx < 0) and (x_prev[j] > 0):
+                            x_next[j] = x_prev[j] - np.int16(1)
+                        else:
+                            x_next[j] = x_prev[j]
+
+                        # crossing of Th
+                        if (1 if x_next[j] > Th else 0) != gamma[j]:
+                            crossed[j_start + count] = j
+                            count += 1
+                else:
+                    x_next[j] = x_prev[j]
+                    p_next[j] = p_prev[j]
+
+                y_next[j], q_next[j] = _register_update(Cy, Fy, y_prev[j], q_prev[j], N2, M)
+                z_next[j], r_next[j] = _register_update(Cz, Fz, z_prev[j], r_prev[j], N3, M)
+
+            n_crossed[blk] = count
+
+
+        """ synapse update: only the neurons crossing Th """
+
+        for blk in range(n_blocks):
 
+            j_start = blk * n // n_blocks
 
-        # update variables
-        x_previous = x_next
-        y_previous = y_next
-        z_previous = z_next
-        p_previous = p_next
-        q_previous = q_next
-        r_previous = r_next
-        phx_previous = phx_next
-        phy_previous = phy_next
-        phz_previous = phz_next
+            for m in range(n_crossed[blk]):
+
+                j = crossed[j_start + m]
+                gamma[j] = 1 - gamma[j]
+                sign = 1.0 if gamma[j] == 1 else -1.0
+
+                for e in range(out_indptr[j], out_indptr[j+1]):
+                    syn[out_indices[e]] += sign * out_weights[e]
 
 
         """ Update """
 
+        cur = 1 - cur
+
         # store registers
-        if i >= index_start:
+        if (i >= index_start) and ((i - index_start) % decimation == 0):
 
-            if (idx % 100) == 0:
+            idx_insert = (i - index_start)//decimation - k_begin
 
-                idx_insert = int(idx/100)
+            t_hist[idx_insert] = T
+            x_hist[:, idx_insert] = x_buf[cur]
 
-                t_hist[idx_insert] = T
-                x_hist[:, idx_insert] = x_previous
+            if y_hist is not None:
+                y_hist[:, idx_insert] = y_buf[cur]
+                z_hist[:, idx_insert] = z_buf[cur]
 
-            idx += 1
 
+    return cur, T
 
-    return t_hist, x_hist
 
+def _twin(fn, name):
+
+    """ copy of fn under its own name: the on-disk cache keeps one entry per qualified name """
+
+    twin = types.FunctionType(fn.__code__, fn.__globals__, name, fn.__defaults__, fn.__closure__)
+    twin.__qualname__ = name
 
+    return twin
 
 
-@njit
-def time_evolution(Tc, Tx, Wx, Ty, Wy, Tz, Wz, T, phx_previous, phy_previous, phz_previous):
+# same kernel twice: prange over neuron blocks, and a plain loop for small networks
+# where the per-tick thread launch costs more than the update itself
+_network_steps_parallel = njit(parallel=True, cache=True)(_twin(_network_steps, "_network_steps_parallel"))
+_network_steps_serial = njit(cache=True)(_twin(_network_steps, "_network_steps_serial"))
 
-    T = T + Tc
 
-    Cx = 1 if phx_previous >= (1-Wx/Tx) else 0
-    Cy = 1 if phy_previous >= (1-Wy/Ty) else 0
-    Cz = 1 if phz_previous >= (1-Wz/Tz) else 0
+def calc_time_evolution_eca(init_X, init_Y, init_Z,
+                            init_P, init_Q, init_R,
+                            init_phX, init_phY, init_phZ,
+                            M, N1, N2, N3,
+                            Fin, Gin, Hin,
+                            Tc, Tx, Wx, clk,
+
+                            M_I, s1, g_s, V_s, Th, out_indptr, out_indices, out_weights,
 
-    phx_next = phx_previous + Tc/Tx
-    phy_next = phy_previous + Tc/Ty
-    phz_next = phz_previous + Tc/Tz
+                            total_step, index_start, store_step, parallel=True, decimation=100):
 
-    phx_next = phx_next - math.floor(phx_next)
-    phy_next = phy_next - math.floor(phy_next)
-    phz_next = phz_next - math.floor(phz_next)
+    """ Whole run in one call of _network_steps """
 
-    return T, phx_next, phy_next, phz_next, Cx, Cy, Cz
+    state = _network_state(init_X, init_Y, init_Z, init_P, init_Q, init_R,
+                           init_phX, init_phY, init_phZ,
+                           Th, out_indptr, out_indices, out_weights)
 
+    # store return arrays
+    t_hist = np.zeros(store_step)
+    x_hist = np.zeros((init_X.shape[0], store_step), dtype=np.int16)
+
+    kernel = _network_steps_parallel if parallel else _network_steps_serial
 
+    kernel(*state, 0, 0.0,
+           M, N1, N2, N3, Fin, Gin, Hin,
+           Tc, Tx, Wx, clk,
+           M_I, s1, g_s, V_s, Th, out_indptr, out_indices, out_weights,
+           0, total_step, index_start, 0, t_hist, x_hist, decimation)
+
+    return t_hist, x_hist
 
 
 """ test """
 
 def plot_time_series(t_hist, x_hist):
 
+    import matplotlib.pyplot as plt
+
     n  = x_hist.shape[0]
 
     fig, ax = plt.subplots(figsize=(10, 7))
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+Created on: 2026-03-10
+
+@author: shirafujilab
+
+Contents:
+
+    Content-addressed cache for (Fin, Gin, Hin)
+
+        key: sha1 of (N1..N3, M, s1..s3, Tx, Wx, Ty, Wy, Tz, Wz, a, b, c, d, r, s, x_1, I_ext)
+
+        1. in-process LRU (MEMORY_ENTRIES tables)
+        2. data/lut_cache/<key>_Fin.npy, _Gin.npy, _Hin.npy (memory-mapped on load)
+           the least recently used keys are removed while the directory exceeds DISK_QUOTA
+
+Usage:
+
+    Fin, Gin, Hin = cached_lut(N1, N2, N3, M, s1, s2, s3, Tx, Wx, Ty, Wy, Tz, Wz,
+                               a, b, c, d, r, s, x_1, I_ext)
+
+"""
+
+# import standard library
+import os
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+
+# bump when _make_lut_numba changes its output
+LUT_VERSION = 1
+
+MEMORY_ENTRIES = 8
+DISK_QUOTA = 2 * 1024**3        # bytes
+
+LUT_NAMES = ("Fin", "Gin", "Hin")
+
+_memory = OrderedDict()
+
+
+def lut_cache_dir():
+
+    # root/data/lut_cache
+    cur_dir = os.path.dirname(os.path.abspath(__file__))
+    root_dir = os.path.abspath(os.path.join(cur_dir, "..", "..", ".."))
+
+    return os.path.join(root_dir, "data", "lut_cache")
+
+
+def lut_key(N1, N2, N3, M, s1, s2, s3, Tx, Wx, Ty, Wy, Tz, Wz,
+            a, b, c, d, r, s, x_1, I_ext, mode="dense"):
+
+    """ sha1 over the exact values (float32 inputs are widened, not rounded) """
+
+    values = (N1, N2, N3, M, s1, s2, s3, Tx, Wx, Ty, Wy, Tz, Wz,
+              a, b, c, d, r, s, x_1, I_ext)
+
+    text = f"v{LUT_VERSION}|{mode}|" + "|".join(repr(float(v)) for v in values)
+
+    return hashlib.sha1(text.encode("ascii")).hexdigest()
+
+
+def cached_lut(N1, N2, N3, M, s1, s2, s3, Tx, Wx, Ty, Wy, Tz, Wz,
+               a, b, c, d, r, s, x_1, I_ext, cache_dir=None):
+
+    key = lut_key(N1, N2, N3, M, s1, s2, s3, Tx, Wx, Ty, Wy, Tz, Wz,
+                  a, b, c, d, r, s, x_1, I_ext)
+
+    """ 1. in-process """
+
+    if key in _memory:
+        _memory.move_to_end(key)
+        return _memory[key]
+
+    """ 2. on disk """
+
+    cache_dir = lut_cache_dir() if cache_dir is None else cache_dir
+    paths = [os.path.join(cache_dir, f"{key}_{name}.npy") for name in LUT_NAMES]
+
+    luts = None
+
+    if all(os.path.exists(path) for path in paths):
+        try:
+            luts = tuple(np.load(path, mmap_mode="r") for path in paths)
+
+            # mark as recently used
+            for path in paths:
+                os.utime(path)
+
+        except (OSError, ValueError) as e:
+            print(f"LUT cache: broken entry {key} ({e}), rebuilding")
+            luts = None
+
+    """ 3. build """
+
+    if luts is None:
+
+        # eca_basic imports this module
+        from src.method.eca.eca_basic import _make_lut_numba
+
+        luts = _make_lut_numba(N1, N2, N3, M, s1, s2, s3, Tx, Wx, Ty, Wy, Tz, Wz,
+                               a, b, c, d, r, s, x_1, I_ext)
+
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+
+            for path, lut in zip(paths, luts):
+
+                # write then rename, a reader never sees a half-written file
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    np.save(f, lut)
+                os.replace(tmp_path, path)
+
+            evict_disk(cache_dir, DISK_QUOTA, keep=key)
+
+        except OSError as e:
+            print(f"LUT cache: could not store {key} ({e})")
+
+        # shared between runs, and read-only like the memory-mapped ones (one kernel type)
+        for lut in luts:
+            lut.flags.writeable = False
+
+    # store
+    _memory[key] = luts
+    while len(_memory) > MEMORY_ENTRIES:
+        _memory.popitem(last=False)
+
+    return luts
+
+
+def evict_disk(cache_dir, quota, keep=None):
+
+    """ remove the least recently used keys until the directory fits in quota (bytes) """
+
+    if not os.path.isdir(cache_dir):
+        return
+
+    # key -> [bytes, last use]
+    entries = {}
+
+    for name in os.listdir(cache_dir):
+
+        if not name.endswith(".npy"):
+            continue
+
+        path = os.path.join(cache_dir, name)
+        key = name.split("_")[0]
+        stat = os.stat(path)
+
+        entry = entries.setdefault(key, [0, 0.0])
+        entry[0] += stat.st_size
+        entry[1] = max(entry[1], stat.st_mtime)
+
+    total = sum(entry[0] for entry in entries.values())
+
+    for key, (size, _) in sorted(entries.items(), key=lambda item: item[1][1]):
+
+        if total <= quota:
+            break
+        if key == keep:
+            continue
+
+        _memory.pop(key, None)
+
+        try:
+            for lut_name in LUT_NAMES:
+                path = os.path.join(cache_dir, f"{key}_{lut_name}.npy")
+                if os.path.exists(path):
+                    os.remove(path)
+        except OSError:
+            # still mapped by another process (Windows), try again next time
+            continue
+
+        total -= size
+
+
+def clear_memory():
+
+    _memory.clear()
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+Created on: 2026-03-15
+
+@author: shirafujilab
+
+Contents:
+
+    Phase clocks Cx, Cy, Cz of the ESL neuron
+
+        clk = (inc_x, inc_y, inc_z, th_x, th_y, th_z, wrap), built by make_clock
+
+        every Tc tick:  C = 1 if ph >= th
+                        ph = ph + inc, minus wrap once it reaches wrap
+
+        float (int_phase false):  inc = Tc/T, th = 1 - W/T, wrap = 1.0
+                                  bit-identical to time_evolution (ph - floor(ph))
+        integer (int_phase true): D = 2**phase_bits
+                                  inc = round(Tc/T * D), th = D - round(W/T * D), wrap = D
+                                  int64 accumulators, as the phase counters of the RTL;
+                                  for them "minus wrap" is the mask & (D - 1)
+
+    The kernels are written once for both: numba compiles one version per type of clk,
+    the integer one runs without float arithmetic and its state repeats exactly.
+
+    cycle_detect (exact repeat of the full state, phases included) needs an integer clock
+    whose phases come back inside the observed window: the clocks repeat every
+    clock_period(clk) = lcm(2**phase_bits / gcd(inc, 2**phase_bits)) ticks, the state is
+    compared every decimation ticks, so no cycle shorter than lcm(clock_period, decimation)
+    can be found. With the default clocks (odd inc_x) clock_period is 2**phase_bits, so with
+    decimation 100 that is 25 * 2**phase_bits ticks: 1.1e11 for phase_bits 32, and
+    phase_bits <= 17 for eT - sT = 6000 at h = 1e-3 (6e6 ticks).
+    check_cycle_detect refuses a run where it does not fit in eT - sT.
+
+Usage:
+
+    clk = make_clock(Tc, Tx, Wx, Ty, Wy, Tz, Wz, params.get("int_phase", False), params.get("phase_bits", 32))
+    phX = initial_phase(params["init_phX"], clk)
+    ... T, phx, phy, phz, Cx, Cy, Cz = clock_step(T, Tc, phx, phy, phz, clk) ...
+
+    validate_clock(...) compares the firing ticks of the integer and the float clocks.
+    check_cycle_detect(clk, total_step - index_start, decimation) before a cycle_detect run.
+
+"""
+
+import math
+import numpy as np
+from numba import njit
+
+
+def make_clock(Tc, Tx, Wx, Ty, Wy, Tz, Wz, int_phase=False, phase_bits=32):
+
+    if not int_phase:
+        return (Tc/Tx, Tc/Ty, Tc/Tz, 1-Wx/Tx, 1-Wy/Ty, 1-Wz/Tz, 1.0)
+
+    phase_bits = int(phase_bits)
+    # the resumable kernels keep the phases in their float64 state, exact up to 2**53
+    if not 2 <= phase_bits <= 52:
+        raise ValueError(f"phase_bits {phase_bits}: 2 .. 52")
+
+    D = 1 << phase_bits
+
+    inc = [int(round(Tc/T * D)) for T in (Tx, Ty, Tz)]
+    th = [D - int(round(W/T * D)) for T, W in ((Tx, Wx), (Ty, Wy), (Tz, Wz))]
+
+    for name, value in zip(("Tc/Tx", "Tc/Ty", "Tc/Tz"), inc):
+        if not 0 < value < D:
+            raise ValueError(f"{name} rounds to {value}/2**{phase_bits}, increase phase_bits")
+
+    return tuple(np.int64(v) for v in (*inc, *th, D))
+
+
+def clock_is_int(clk):
+
+    return isinstance(clk[6], np.integer)
+
+
+def clock_period(clk):
+
+    """ ticks after which the three phases are all back, 0 for a float clock (never exactly) """
+
+    if not clock_is_int(clk):
+        return 0
+
+    D = int(clk[6])
+
+    return math.lcm(*(D // math.gcd(int(inc), D) for inc in clk[:3]))
+
+
+def check_cycle_detect(clk, window, decimation):
+
+    """
+    cycle_detect over window observed ticks (total_step - index_start), state compared every decimation
+
+        ValueError if no cycle can be found: float clock, or lcm(clock_period, decimation) >= window
+    """
+
+    if not clock_is_int(clk):
+        raise ValueError("cycle_detect: float phases never repeat exactly, set int_phase (and a small phase_bits)")
+
+    shortest = math.lcm(clock_period(clk), int(decimation))
+
+    if shortest >= window:
+        raise ValueError(f"cycle_detect: the clocks repeat every {clock_period(clk)} ticks, observed every {decimation}, "
+                         f"no cycle shorter than {shortest} ticks but only {window} are observed "
+                         f"(lower phase_bits, a power of two for decimation, or a longer eT - sT)")
+
+
+def initial_phase(ph, clk):
+
+    """ init_ph* (in [0, 1)) as a phase of clk """
+
+    if clock_is_int(clk):
+        return np.int64(round(float(ph) * int(clk[6]))) % clk[6]
+
+    return np.float32(ph)
+
+
+@njit(cache=True)
+def phase_step(ph, inc, th, wrap):
+
+    C = 1 if ph >= th else 0
+
+    ph = ph + inc
+    if ph >= wrap:
+        ph = ph - wrap
+
+    return C, ph
+
+
+@njit(cache=True)
+def clock_step(T, Tc, phx, phy, phz, clk):
+
+    """ time_evolution for either clock: T, phx, phy, phz, Cx, Cy, Cz """
+
+    T = T + Tc
+
+    Cx, phx = phase_step(phx, clk[0], clk[3], clk[6])
+    Cy, phy = phase_step(phy, clk[1], clk[4], clk[6])
+    Cz, phz = phase_step(phz, clk[2], clk[5], clk[6])
+
+    return T, phx, phy, phz, Cx, Cy, Cz
+
+
+@njit(cache=True)
+def _clock_mismatch(clk_f, clk_i, phx_f, phy_f, phz_f, phx_i, phy_i, phz_i, n_ticks):
+
+    """ per clock: firing ticks of the float clock, of the integer clock, ticks where they differ, first of them """
+
+    counts = np.zeros((3, 4), dtype=np.int64)
+    counts[:, 3] = -1
+
+    for i in range(n_ticks):
+
+        _, phx_f, phy_f, phz_f, Cx_f, Cy_f, Cz_f = clock_step(0.0, 0.0, phx_f, phy_f, phz_f, clk_f)
+        _, phx_i, phy_i, phz_i, Cx_i, Cy_i, Cz_i = clock_step(0.0, 0.0, phx_i, phy_i, phz_i, clk_i)
+
+        counts[0, 0] += Cx_f
+        counts[1, 0] += Cy_f
+        counts[2, 0] += Cz_f
+        counts[0, 1] += Cx_i
+        counts[1, 1] += Cy_i
+        counts[2, 1] += Cz_i
+        counts[0, 2] += Cx_f != Cx_i
+        counts[1, 2] += Cy_f != Cy_i
+        counts[2, 2] += Cz_f != Cz_i
+
+        if (counts[0, 3] < 0) and (Cx_f != Cx_i):
+            counts[0, 3] = i
+        if (counts[1, 3] < 0) and (Cy_f != Cy_i):
+            counts[1, 3] = i
+        if (counts[2, 3] < 0) and (Cz_f != Cz_i):
+            counts[2, 3] = i
+
+    return counts
+
+
+def validate_clock(Tc, Tx, Wx, Ty, Wy, Tz, Wz, phase_bits=32, n_ticks=10**7,
+                   init_phX=0.0, init_phY=0.0, init_phZ=0.0):
+
+    """
+    Integer clock against the float one over n_ticks
+
+    Return:
+        dict per clock ("x", "y", "z"):
+            period_error: relative error of the integer period D/inc against T/Tc
+            fires_float, fires_int: number of firing ticks
+            mismatch: ticks on which only one of them fires
+            first_mismatch: first of them (-1: none), the period error accumulates from there
+    """
+
+    clk_f = make_clock(Tc, Tx, Wx, Ty, Wy, Tz, Wz)
+    clk_i = make_clock(Tc, Tx, Wx, Ty, Wy, Tz, Wz, True, phase_bits)
+
+    ph_f = [np.float64(initial_phase(ph, clk_f)) for ph in (init_phX, init_phY, init_phZ)]
+    ph_i = [initial_phase(ph, clk_i) for ph in (init_phX, init_phY, init_phZ)]
+
+    counts = _clock_mismatch(clk_f, clk_i, *ph_f, *ph_i, int(n_ticks))
+
+    report = {}
+
+    for k, name in enumerate("xyz"):
+        report[name] = {"period_error": (int(clk_i[6]) / int(clk_i[k])) / (1 / clk_f[k]) - 1,
+                        "fires_float": int(counts[k, 0]),
+                        "fires_int": int(counts[k, 1]),
+                        "mismatch": int(counts[k, 2]),
+                        "first_mismatch": int(counts[k, 3])}
+
+    return report
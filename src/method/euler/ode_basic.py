@@ -6,6 +6,10 @@ Created on: 2026-02-25
 
 Contents:
 
+    - forward Euler, fixed h (calc_time_evolution_ode)
+    - Dormand-Prince 5(4), adaptive (calc_time_evolution_ode_dopri), ode_method = "dopri5"
+    - forward Euler in chunks (calc_time_evolution_ode_chunk), stream = true or auto_stop (monitored chunks)
+    - forward Euler reduced to observables, no history (calc_reduction_ode), reduce()
 
 Return:
 
@@ -17,11 +21,15 @@ Return:
 
 # import my library
 import numpy as np
+import math
 from numba import njit
-import matplotlib.pyplot as plt
 import os
 import datetime, time
 
+# import my library
+from src.utils.history_writer import HistoryWriter, history_path, chunk_ranges, chunk_rows
+from src.method.observables import new_observation, observe, summarize, new_monitor, monitor, stop_report, observe_block
+
 class TimeEvolOdeSingle:
 
     def __init__(self, params, filename):
@@ -30,6 +38,12 @@ class TimeEvolOdeSingle:
         self.params = params
         self.filename = filename
 
+        # None or progress(done, total), called between chunks (method_selects.run_method)
+        self.progress = None
+
+        # auto_stop: observables.stop_report() of the last run
+        self.stop = {}
+
         # Ensure output directory exists
         os.makedirs(os.path.dirname(self.filename), exist_ok=True)
 
@@ -53,7 +67,8 @@ class TimeEvolOdeSingle:
         # store step
         total_step = int(eT/h)+1
         index_start = int(sT/h)
-        store_step = (total_step - index_start) // 100 + 1 if total_step > index_start else 0
+        decimation = params.get("decimation", 100)
+        store_step = (total_step - index_start) // decimation + 1 if total_step > index_start else 0
 
         """ params """
 
@@ -75,9 +90,45 @@ class TimeEvolOdeSingle:
         print("\n start: ", bench_sT)
 
         # set calode
-        t_hist, I_hist, x_hist, y_hist, z_hist = calc_time_evolution_ode(init_x, init_y, init_z, h,
-                                                                         a, b, c, d, r, s, x_1, I_ext,
-                                                                         total_step, index_start, store_step)
+        method = params.get("ode_method", "euler")
+
+        # auto_stop: the stream monitors the chunks
+        if params.get("stream", False) or params.get("auto_stop", False):
+
+            if method != "euler":
+                raise ValueError(f"stream and auto_stop are only available with ode_method 'euler' (got {method!r})")
+
+            # chunk by chunk into <save_path>.npy, columns (t, x, y, z)
+            hist = self._run_stream(init_x, init_y, init_z, h,
+                                    a, b, c, d, r, s, x_1, I_ext,
+                                    total_step, index_start, decimation)[:max(store_step - 1, 0)]
+
+            t1 = time.perf_counter()
+            print("end: ", datetime.datetime.now())
+            print("bench mark: ", t1 - t0)
+
+            # memory-mapped columns
+            return hist[:, 0], np.broadcast_to(I_ext, hist.shape[:1]), hist[:, 1], hist[:, 2], hist[:, 3]
+
+        elif method == "euler":
+            t_hist, I_hist, x_hist, y_hist, z_hist = calc_time_evolution_ode(init_x, init_y, init_z, h,
+                                                                             a, b, c, d, r, s, x_1, I_ext,
+                                                                             total_step, index_start, store_step, decimation)
+
+        elif method == "dopri5":
+
+            # adaptive steps, sampled on the same t_hist grid as the Euler kernel
+            rtol, atol, max_step = params.get("rtol", 1e-6), params.get("atol", 1e-8), params.get("max_step", 0.5)
+
+            t_hist, I_hist, x_hist, y_hist, z_hist, n_accept, n_reject = calc_time_evolution_ode_dopri(init_x, init_y, init_z, h,
+                                                                                                       a, b, c, d, r, s, x_1, I_ext,
+                                                                                                       rtol, atol, max_step,
+                                                                                                       total_step, index_start, store_step, decimation)
+
+            print("steps: ", n_accept, " rejected: ", n_reject, " (Euler: ", total_step, ")")
+
+        else:
+            raise ValueError(f"ode_method {method!r} is not available for a single neuron (euler, dopri5)")
 
         bench_eT = datetime.datetime.now()
         t1 = time.perf_counter()
@@ -89,11 +140,101 @@ class TimeEvolOdeSingle:
         
         return t_hist[:-1], I_hist[:-1], x_hist[:-1], y_hist[:-1], z_hist[:-1]
 
+    def _run_stream(self, init_x, init_y, init_z, h,
+                    a, b, c, d, r, s, x_1, I_ext,
+                    total_step, index_start, decimation):
+
+        """ auto_stop: as TimeEvolEcaSingle._run_stream, the history ends where the monitor stops, self.stop """
+
+        params = self.params
+
+        # state carried between chunks: x, y, z, T
+        v = np.array([init_x, init_y, init_z, 0.0])
+
+        mon = new_monitor(params)
+        obs, hits = new_observation(params.get("max_hits", 256), burst_ratio=params.get("burst_ratio", 3.0))
+        spike_th, sec_var, sec_level = params.get("spike_th", 0.0), params.get("poincare_var", 0), params.get("poincare_level", 1.0)
+
+        writer = HistoryWriter(history_path(self.filename), 4)
+        print("stream: ", writer.path)
+
+        try:
+            for i_begin, i_end in chunk_ranges(total_step, params.get("chunk_step", 10**6)):
+
+                k_begin, rows = chunk_rows(i_begin, i_end, index_start, decimation)
+                block = np.zeros((rows, 4))
+
+                calc_time_evolution_ode_chunk(v, h, a, b, c, d, r, s, x_1, I_ext,
+                                              i_begin, i_end, index_start, k_begin, block, decimation)
+
+                stopped = False
+
+                if mon is not None:
+                    rows, stopped = observe_block(obs, hits, mon, block, index_start + k_begin * decimation, decimation,
+                                                  spike_th, sec_var, sec_level)
+                    block = block[:rows]
+
+                writer.append(block)
+
+                if self.progress is not None:
+                    self.progress(total_step if stopped else i_end, total_step)
+
+                if stopped:
+                    break
+        finally:
+            writer.close()
+
+        self.stop = stop_report(mon, h)
+
+        if mon is not None:
+            print("auto_stop: ", self.stop["stop_reason"], " conv_T: ", self.stop["conv_T"], " stop_T: ", self.stop["stop_T"])
+
+        return writer.load()
 
-@njit
+    def reduce(self):
+
+        """ Observables after sT (observables.summarize) without storing a history, forward Euler, auto_stop: stop_report() as well """
+
+        params = self.params
+
+        # time
+        sT, eT, h = params["sT"], params["eT"], np.float32(params["h"])
+
+        total_step = int(eT/h)+1
+        index_start = int(sT/h)
+        decimation = params.get("decimation", 100)
+
+        # parameters
+        a, b, c, d, r, s = np.float32(params['a']), np.float32(params['b']), np.float32(params['c']), np.float32(params['d']), np.float32(params['r']), np.float32(params['s'])
+        I_ext = np.float32(params["I_ext"])
+
+        # x_1
+        p = (d - b) / a
+        q = c / a
+
+        coef = [1, p, 0, -q]   # x^3 + p x^2 - q = 0
+        x_1 = np.roots(coef)[0]
+
+        # x, y, z, T
+        v = np.array([np.float32(params["init_x"]), np.float32(params["init_y"]), np.float32(params["init_z"]), 0.0])
+        obs, hits = new_observation(params.get("max_hits", 256), burst_ratio=params.get("burst_ratio", 3.0))
+        mon = new_monitor(params)
+
+        calc_reduction_ode(v, h, a, b, c, d, r, s, x_1, I_ext,
+                           0, total_step, index_start, decimation,
+                           params.get("spike_th", 0.0), params.get("poincare_var", 0), params.get("poincare_level", 1.0),
+                           obs, hits, mon)
+
+        summary = summarize(obs, hits)
+        summary.update(stop_report(mon, h))
+
+        return summary
+
+
+@njit(cache=True)
 def calc_time_evolution_ode(init_x, init_y, init_z, h,
                             a, b, c, d, r, s, x_1, I_ext,
-                            total_step, index_start, store_step):
+                            total_step, index_start, store_step, decimation=100):
 
     # variables
     x_next = x_previous = init_x
@@ -128,9 +269,9 @@ def calc_time_evolution_ode(init_x, init_y, init_z, h,
         # store registers
         if i >= index_start:
 
-            if (idx % 100) == 0:
+            if (idx % decimation) == 0:
 
-                idx_insert = int(idx/100)
+                idx_insert = idx//decimation
 
                 t_hist[idx_insert] = T
                 I_hist[idx_insert] = I_ext
@@ -143,10 +284,236 @@ def calc_time_evolution_ode(init_x, init_y, init_z, h,
     return t_hist, I_hist, x_hist, y_hist, z_hist
 
 
+@njit(cache=True)
+def calc_time_evolution_ode_chunk(v, h, a, b, c, d, r, s, x_1, I_ext,
+                                  i_begin, i_end, index_start, k_begin, block, decimation=100):
+
+    """
+    Ticks [i_begin, i_end) of calc_time_evolution_ode, resumable
+
+        v: float64 (4,) x, y, z, T  (read, then written back)
+        block: (rows, 4) t, x, y, z of the stored ticks, row = sample - k_begin
+    """
+
+    # variables
+    x_previous, y_previous, z_previous, T = v[0], v[1], v[2], v[3]
+
+    for i in range(i_begin, i_end):
+
+        # calculate
+        x_next = x_previous + h * (y_previous - a* x_previous**3 + b* x_previous**2 - z_previous + I_ext)
+        y_next = y_previous + h * (c - d*x_previous**2 - y_previous)
+        z_next = z_previous + h * r*(s*(x_previous - x_1) - z_previous)
+
+        # update variables and time
+        x_previous = x_next
+        y_previous = y_next
+        z_previous = z_next
+        T += h
+
+        # store registers
+        if (i >= index_start) and ((i - index_start) % decimation == 0):
+
+            row = (i - index_start)//decimation - k_begin
+
+            block[row, 0] = T
+            block[row, 1] = x_previous
+            block[row, 2] = y_previous
+            block[row, 3] = z_previous
+
+    v[0], v[1], v[2], v[3] = x_previous, y_previous, z_previous, T
+
+
+@njit(cache=True)
+def calc_reduction_ode(v, h, a, b, c, d, r, s, x_1, I_ext,
+                       i_begin, i_end, index_start, decimation,
+                       spike_th, sec_var, sec_level, obs, hits, mon=None):
+
+    """
+    calc_time_evolution_ode_chunk with observables.observe() instead of a history
+
+        v: x, y, z, T, read and written back (the final state after the call)
+        obs, hits: observables.new_observation()
+        mon: observables.new_monitor() (auto_stop): stops once the attractor is reached and recorded
+    """
+
+    # variables
+    x_previous, y_previous, z_previous, T = v[0], v[1], v[2], v[3]
+
+    for i in range(i_begin, i_end):
+
+        # calculate
+        x_next = x_previous + h * (y_previous - a* x_previous**3 + b* x_previous**2 - z_previous + I_ext)
+        y_next = y_previous + h * (c - d*x_previous**2 - y_previous)
+        z_next = z_previous + h * r*(s*(x_previous - x_1) - z_previous)
+
+        # update variables and time
+        x_previous = x_next
+        y_previous = y_next
+        z_previous = z_next
+        T += h
+
+        # observe
+        if (i >= index_start) and ((i - index_start) % decimation == 0):
+            observe(obs, hits, T, x_previous, y_previous, z_previous, spike_th, sec_var, sec_level)
+
+            if mon is not None:
+
+                if monitor(mon, obs, hits, i, T, x_previous, y_previous, z_previous):
+                    break
+
+    v[0], v[1], v[2], v[3] = x_previous, y_previous, z_previous, T
+
+
+""" Dormand-Prince 5(4) """
+
+# nodes, stages, error weights (b - b_hat)
+DP_C = np.array([0.0, 1/5, 3/10, 4/5, 8/9, 1.0])
+DP_A = np.array([[0.0, 0.0, 0.0, 0.0, 0.0, 0.0],
+                 [1/5, 0.0, 0.0, 0.0, 0.0, 0.0],
+                 [3/40, 9/40, 0.0, 0.0, 0.0, 0.0],
+                 [44/45, -56/15, 32/9, 0.0, 0.0, 0.0],
+                 [19372/6561, -25360/2187, 64448/6561, -212/729, 0.0, 0.0],
+                 [9017/3168, -355/33, 46732/5247, 49/176, -5103/18656, 0.0],
+                 [35/384, 0.0, 500/1113, 125/192, -2187/6784, 11/84]])
+DP_E = np.array([71/57600, 0.0, -71/16695, 71/1920, -17253/339200, 22/525, -1/40])
+
+# dense output: y(t + theta dt) = y + dt * sum_i K[i] * (P[i] . [theta, theta^2, theta^3, theta^4])
+DP_P = np.array([[1.0, -8048581381/2820520608, 8663915743/2820520608, -12715105075/11282082432],
+                 [0.0, 0.0, 0.0, 0.0],
+                 [0.0, 131558114200/32700410799, -68118460800/10900136933, 87487479700/32700410799],
+                 [0.0, -1754552775/470086768, 14199869525/1410260304, -10690763975/1880347072],
+                 [0.0, 127303824393/49829197408, -318862633887/49829197408, 701980252875/199316789632],
+                 [0.0, -282668133/205662961, 2019193451/616988883, -1453857185/822651844],
+                 [0.0, 40617522/29380423, -110615467/29380423, 69997945/29380423]])
+
+
+@njit(cache=True)
+def _hr_rhs(v, a, b, c, d, r, s, x_1, I_ext, dv):
+
+    x, y, z = v[0], v[1], v[2]
+
+    dv[0] = y - a* x**3 + b* x**2 - z + I_ext
+    dv[1] = c - d*x**2 - y
+    dv[2] = r*(s*(x - x_1) - z)
+
+
+@njit(cache=True)
+def calc_time_evolution_ode_dopri(init_x, init_y, init_z, h,
+                                  a, b, c, d, r, s, x_1, I_ext,
+                                  rtol, atol, max_step,
+                                  total_step, index_start, store_step, decimation=100):
+
+    """
+    Embedded RK45 (Dormand-Prince) with error control and dense output
+
+        The stored samples are interpolated at the times the Euler kernel stores,
+        T = (index_start + decimation*k + 1) * h, so t_hist matches calc_time_evolution_ode.
+
+    Return:
+        t_hist, I_hist, x_hist, y_hist, z_hist, accepted steps, rejected steps
+    """
+
+    # store return arrays
+    t_hist = np.zeros(store_step, dtype=np.float32)
+    I_hist = np.zeros(store_step, dtype=np.float32)
+    x_hist = np.zeros(store_step, dtype=np.float32)
+    y_hist = np.zeros(store_step, dtype=np.float32)
+    z_hist = np.zeros(store_step, dtype=np.float32)
+
+    # output grid
+    n_out = 0
+    for k in range(store_step):
+        if index_start + decimation*k < total_step:
+            n_out = k + 1
+    t_out = (index_start + decimation*np.arange(n_out) + 1) * np.float64(h)
+
+    # variables
+    v = np.array([init_x, init_y, init_z], dtype=np.float64)
+    v_new = np.zeros(3)
+    v_stage = np.zeros(3)
+    K = np.zeros((7, 3))
+
+    _hr_rhs(v, a, b, c, d, r, s, x_1, I_ext, K[0])
+
+    T = 0.0
+    dt = min(np.float64(h) * 10.0, max_step)
+    n_accept = 0
+    n_reject = 0
+    k_out = 0
+
+    while k_out < n_out:
+
+        # stages 2..6
+        for st in range(1, 6):
+            for m in range(3):
+                acc = 0.0
+                for q in range(st):
+                    acc += DP_A[st, q] * K[q, m]
+                v_stage[m] = v[m] + dt * acc
+            _hr_rhs(v_stage, a, b, c, d, r, s, x_1, I_ext, K[st])
+
+        # 5th order solution, stage 7 (FSAL)
+        for m in range(3):
+            acc = 0.0
+            for q in range(6):
+                acc += DP_A[6, q] * K[q, m]
+            v_new[m] = v[m] + dt * acc
+        _hr_rhs(v_new, a, b, c, d, r, s, x_1, I_ext, K[6])
+
+        # error norm
+        err = 0.0
+        for m in range(3):
+            e = 0.0
+            for q in range(7):
+                e += DP_E[q] * K[q, m]
+            sc = atol + rtol * max(abs(v[m]), abs(v_new[m]))
+            err += (dt * e / sc)**2
+        err = math.sqrt(err / 3)
+
+        if err <= 1.0:
+
+            # dense output on the grid points inside (T, T + dt]
+            while (k_out < n_out) and (t_out[k_out] <= T + dt):
+
+                theta = (t_out[k_out] - T) / dt
+
+                for m in range(3):
+                    acc = 0.0
+                    for q in range(7):
+                        acc += K[q, m] * theta * (DP_P[q, 0] + theta * (DP_P[q, 1] + theta * (DP_P[q, 2] + theta * DP_P[q, 3])))
+                    v_stage[m] = v[m] + dt * acc
+
+                t_hist[k_out] = t_out[k_out]
+                I_hist[k_out] = I_ext
+                x_hist[k_out] = v_stage[0]
+                y_hist[k_out] = v_stage[1]
+                z_hist[k_out] = v_stage[2]
+                k_out += 1
+
+            # accept
+            T += dt
+            v[:] = v_new
+            K[0] = K[6]
+            n_accept += 1
+
+            factor = 10.0 if err == 0.0 else min(10.0, 0.9 * err**(-0.2))
+
+        else:
+            n_reject += 1
+            factor = max(0.2, 0.9 * err**(-0.2))
+
+        dt = min(dt * factor, max_step)
+
+    return t_hist, I_hist, x_hist, y_hist, z_hist, n_accept, n_reject
+
+
 """ test """
 
 def plot_time_series(t_hist, I_hist, x_hist, y_hist, z_hist):
 
+    import matplotlib.pyplot as plt
+
     fig, ax = plt.subplots(4, 1, figsize=(10, 7), sharex=True)
 
     ax[0].plot(t_hist, I_hist, lw=0.8)
@@ -168,6 +535,8 @@ def plot_time_series(t_hist, I_hist, x_hist, y_hist, z_hist):
 
 def plot_phase(x_hist, y_hist, z_hist):
 
+    import matplotlib.pyplot as plt
+
     fig = plt.figure(figsize=(6,5))
     ax = fig.add_subplot(projection="3d")
 
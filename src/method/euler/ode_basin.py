@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+Created on: 2026-03-21
+
+@author: shirafujilab
+
+Contents: attraction basin of the HR neuron, forward Euler
+
+    BasinODE(params, filename).run():
+
+        initial conditions: x = linspace(basin_x_start, basin_x_end, basin_x_num)
+                            y = linspace(basin_y_start, basin_y_end, basin_y_num), z = init_z
+        per initial condition: observables after sT (calc_basin_ode, prange over the conditions),
+                               classified into an attractor class (observables.classify_batch)
+
+        basin_tile initial conditions are run at a time (memory of obs / hits, progress).
+        adaptive: only the initial conditions near the boundaries of the classes / of x min, max,
+                  the rest filled from them (adaptive_grid.refine, adaptive_coarse, adaptive_tol)
+        auto_stop: every trajectory stops once its attractor is recorded (observables.monitor)
+
+Return:
+
+    x_axis, y_axis, labels int8 (y, x), legend {label: name}
+
+    observables.save_basin(): labels .npy next to DataLibrarian.save_path,
+                              legend and count per class in the csv at DataLibrarian.save_path
+
+"""
+
+# import standard library
+import numpy as np
+import os
+
+from numba import njit, prange
+
+import datetime, time
+
+# import my library
+from src.method.euler.ode_basic import calc_reduction_ode
+from src.method.observables import new_observation, new_monitor, classify_batch, basin_legend, save_basin, OBS_MIN, OBS_MAX
+from src.method.adaptive_grid import refine
+from src.utils.history_writer import chunk_ranges
+
+
+class BasinODE:
+
+    def __init__(self, params, filename):
+
+        # get params
+        self.params = params
+
+        self.filename = filename
+        print(self.filename)
+
+        # None or progress(done, total), called between tiles (method_selects.run_method)
+        self.progress = None
+
+        # Ensure output directory exists
+        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+
+
+    def axes(self):
+
+        """ x, y values of the initial conditions """
+
+        return basin_axes(self.params)
+
+
+    def run(self):
+
+        """ Initialization """
+
+        # get params
+        params = self.params
+
+        if params.get("ode_method", "euler") != "euler":
+            raise ValueError(f"ode_method {params['ode_method']!r}: attraction basin is forward Euler only")
+
+        # variables
+        x_axis, y_axis = self.axes()
+        conds_size = x_axis.size * y_axis.size
+
+        print("initial conditions: ", conds_size)
+
+        # time
+        sT, eT, h = params["sT"], params["eT"], np.float32(params["h"])
+
+        total_step = int(eT/h)+1
+        index_start = int(sT/h)
+        decimation = params.get("decimation", 100)
+
+        # parameters
+        a, b, c, d, r, s = np.float32(params['a']), np.float32(params['b']), np.float32(params['c']), np.float32(params['d']), np.float32(params['r']), np.float32(params['s'])
+        I_ext = np.float32(params["I_ext"])
+
+        # x_1
+        p = (d - b) / a
+        q = c / a
+
+        coef = [1, p, 0, -q]   # x^3 + p x^2 - q = 0
+        x_1 = np.roots(coef)[0]
+
+        # observables, classes
+        spike_th, sec_var, sec_level = params.get("spike_th", 0.0), params.get("poincare_var", 0), params.get("poincare_level", 1.0)
+        max_period = int(params.get("basin_max_period", 8))
+        tol, burst_ratio = params.get("basin_tol", 0.01), params.get("burst_ratio", 3.0)
+        legend = basin_legend(max_period)
+
+        # trajectories run so far
+        done = [0]
+
+        def evaluate(ii, jj):
+
+            """ trajectories from x0 = x_axis[jj], y0 = y_axis[ii], basin_tile at a time -> classes, x min / max """
+
+            X0, Y0 = x_axis[jj], y_axis[ii]
+
+            labels = np.empty(ii.size, dtype=np.int8)
+            values = np.empty((ii.size, 2))
+
+            for c_begin, c_end in chunk_ranges(ii.size, params.get("basin_tile", 4096)):
+
+                n = c_end - c_begin
+
+                # x, y, z, T per initial condition
+                v = np.zeros((n, 4))
+                v[:, 0], v[:, 1], v[:, 2] = X0[c_begin:c_end], Y0[c_begin:c_end], np.float32(params["init_z"])
+
+                obs, hits = new_observation(params.get("max_hits", 256), n, burst_ratio)
+
+                calc_basin_ode(v, h, a, b, c, d, r, s, x_1, I_ext,
+                               total_step, index_start, decimation,
+                               spike_th, sec_var, sec_level, obs, hits, new_monitor(params, n))
+
+                classify_batch(obs, hits, labels[c_begin:c_end], max_period, tol, burst_ratio)
+                values[c_begin:c_end] = obs[:, [OBS_MIN, OBS_MAX]]
+
+                done[0] += n
+                print("proccess: -*-*-*-*- ", round((done[0] / conds_size*100),  2), "% -*-*-*-*- ")
+
+                if self.progress is not None:
+                    self.progress(done[0] * total_step, conds_size * total_step)
+
+            return labels, values
+
+
+        """ run simulation """
+        bench_sT = datetime.datetime.now()
+        t0 = time.perf_counter()
+        print("\n start: ", bench_sT)
+
+        # every initial condition, or the boundaries of the classes only (adaptive_grid)
+        if params.get("adaptive", False):
+            labels, _, source = refine((y_axis.size, x_axis.size), evaluate, params.get("adaptive_coarse", 8), params.get("adaptive_tol", 0.05))
+            print("run: ", np.unique(source).size, "of", conds_size)
+        else:
+            ii, jj = np.indices((y_axis.size, x_axis.size))
+            labels, _ = evaluate(ii.ravel(), jj.ravel())
+
+        bench_eT = datetime.datetime.now()
+        t1 = time.perf_counter()
+        print("end: ", bench_eT)
+        print("bench mark: ", t1 - t0)
+
+
+        """ Store results """
+
+        labels = labels.reshape(y_axis.size, x_axis.size).astype(np.int8)
+        save_basin(self.filename, labels, legend)
+
+        return x_axis, y_axis, labels, legend
+
+
+def basin_axes(params):
+
+    """ x, y values of the grid of initial conditions """
+
+    x_axis = np.linspace(params.get("basin_x_start", -2.0), params.get("basin_x_end", 2.0), int(params.get("basin_x_num", 201)))
+    y_axis = np.linspace(params.get("basin_y_start", -12.0), params.get("basin_y_end", 2.0), int(params.get("basin_y_num", 201)))
+
+    return x_axis, y_axis
+
+
+@njit(parallel=True, cache=True)
+def calc_basin_ode(v, h, a, b, c, d, r, s, x_1, I_ext,
+                   total_step, index_start, decimation,
+                   spike_th, sec_var, sec_level, obs, hits, mon=None):
+
+    """ calc_reduction_ode for every initial condition (row of v, obs, hits, mon) """
+
+    for cond in prange(v.shape[0]):
+
+        if mon is None:
+            calc_reduction_ode(v[cond], h, a, b, c, d, r, s, x_1, I_ext,
+                               0, total_step, index_start, decimation,
+                               spike_th, sec_var, sec_level, obs[cond], hits[cond])
+        else:
+            calc_reduction_ode(v[cond], h, a, b, c, d, r, s, x_1, I_ext,
+                               0, total_step, index_start, decimation,
+                               spike_th, sec_var, sec_level, obs[cond], hits[cond], mon[cond])
@@ -1,27 +1,42 @@
 # -*- coding: utf-8 -*-
 """
 Created on: 2024-10-22
-Updated on: 2024-11-12
+Updated on: 2026-03-24
 
 @author: shirafujilab
 
-Contents: bifurcation for S
+Contents: bifurcation of the HR neuron, forward Euler
+
+    BifODE (single):
+        bif_param: I_ext, bif_start .. bif_end (bif_num points)
+        initial conditions: every bif_ic_stride point of the basin grid (basin_x_*, basin_y_*), z = init_z
+        per point and initial condition: observables after sT (calc_basin_ode of ode_basin, prange),
+                                         attractor class (label, observables.classify_batch)
+        adaptive: only the initial conditions near the boundaries of the classes / of x min, max
+                  (adaptive_grid.refine, adaptive_coarse, adaptive_tol), the csv has the rows run
+        continuation: forward then backward, every point from the final states of the point before it,
+                      transient cont_sT (continuation.sweep), "branch" column in the csv.
+                      z settles slowly: the full sT is paid once, not per point
+        auto_stop: every trajectory stops once its attractor is recorded (observables.monitor),
+                   stop_reason, conv_T, stop_T, stop_tick columns in the csv
+
+Return:
+
+    csv at DataLibrarian.save_path
 
 """
 
 # import standard library
 import numpy as np
-import pandas as pd
 import os
 
-import numba
-numba.set_num_threads(15)
-from numba import njit, prange
-
 import datetime, time
 
 # import my library
-from src.method.euler.ode_basic import calc_time_evolution_ode
+from src.method.euler.ode_basin import basin_axes, calc_basin_ode
+from src.method.observables import new_observation, new_monitor, stop_report, summarize, classify_batch, OBS_MIN, OBS_MAX
+from src.method.adaptive_grid import refine
+from src.method.continuation import sweep
 
 
 class BifODE:
@@ -34,6 +49,9 @@ class BifODE:
         self.filename = filename
         print(self.filename)
 
+        # None or progress(done, total), called between points (method_selects.run_method)
+        self.progress = None
+
         # Ensure output directory exists
         os.makedirs(os.path.dirname(self.filename), exist_ok=True)
 
@@ -45,103 +63,147 @@ class BifODE:
         # get params
         params = self.params
 
-        # variables
-        x = np.arange(0, 0.80, 0.05)
-        y = np.arange(0, 0.80, 0.05)
+        # sweep points
+        bif_param = params.get("bif_param", "I_ext")
+        values = np.linspace(params["bif_start"], params["bif_end"], int(params["bif_num"])).astype(np.float32)
+
+        if bif_param != "I_ext":
+            raise ValueError(f"bif_param {bif_param!r}: a single neuron can only sweep I_ext "
+                             "(g_s couples neurons)")
+
+        if params.get("ode_method", "euler") != "euler":
+            raise ValueError(f"ode_method {params['ode_method']!r}: bifurcation is forward Euler only")
+
+        # initial conditions: grid of x0, y0
+        stride = params.get("bif_ic_stride", 16)
+        x_ic, y_ic = (axis[::stride] for axis in basin_axes(params))
+        conds_size = x_ic.size * y_ic.size
+
+        print("per a parameter: ", conds_size)
+
+        if params.get("continuation", False) and params.get("adaptive", False):
+            raise ValueError("continuation carries the state of every initial condition: adaptive off")
 
-        xx_mesh, yy_mesh = np.meshgrid(x, y)
-        xx, yy = xx_mesh.flatten(), yy_mesh.flatten()
-        conds_size = xx.size
+        # points: branch, index, steps, transient (continuation.sweep)
+        points = sweep(params, values.size)
+        total = sum(point[2] for point in points) * conds_size
+        done = 0
 
-        # parameter
-        sT, eT, h = 500, 700, params["h"]
-        tau1, b1, WE11, WE12, WI11, WI12 = params['tau1'], params['b1'], params['WE11'], params['WE12'], params['WI11'], params['WI12']
-        tau2, b2, WE21, WE22, WI21, WI22 = params['tau2'], params['b2'], params['WE21'], params['WE22'], params['WI21'], params['WI22']
+        h = np.float32(params["h"])
+        decimation = params.get("decimation", 100)
 
-        # store step
-        total_step = int(eT/h)+1
-        index_start = int(sT/h)
-        store_step = (total_step - index_start) // 100 + 1 if total_step > index_start else 0
+        # parameters
+        a, b, c, d, r, s = np.float32(params['a']), np.float32(params['b']), np.float32(params['c']), np.float32(params['d']), np.float32(params['r']), np.float32(params['s'])
 
-        """ bifurcation """
+        # x_1
+        p = (d - b) / a
+        q = c / a
 
-        # Conditions of S
-        bif_S = np.arange(0.20, 0.70, 0.005)
-        num_S = len(bif_S)
-        
-        Q = params["Q"]
+        coef = [1, p, 0, -q]   # x^3 + p x^2 - q = 0
+        x_1 = np.roots(coef)[0]
 
-        # store hist
-        Q_hist = np.zeros((num_S, conds_size))
-        S_hist = np.zeros((num_S, conds_size))
-        max_hist = np.zeros((num_S, conds_size))
-        min_hist = np.zeros((num_S, conds_size))
+        # observables, classes
+        spike_th, sec_var, sec_level = params.get("spike_th", 0.0), params.get("poincare_var", 0), params.get("poincare_level", 1.0)
+        max_period = int(params.get("basin_max_period", 8))
+        tol, burst_ratio = params.get("basin_tol", 0.01), params.get("burst_ratio", 3.0)
+
+        rows = []
+
+        # final states of the point before (continuation)
+        state = None
 
         """ run simulation """
         bench_sT = datetime.datetime.now()
+        t0 = time.perf_counter()
         print("\n start: ", bench_sT)
 
-        for idx in range(num_S):
+        for count, (branch, idx, total_step, index_start) in enumerate(points):
 
-            x_max, x_min = self.calc_bifurcation(xx, yy, h,
-                                                 tau1, b1, bif_S[idx], WE11, WE12, WI11, WI12,
-                                                 tau2, b2, WE21, WE22, WI21, WI22,
-                                                 total_step, index_start, store_step)
+            I_ext = values[idx]
 
-            Q_hist[idx, :] = Q
-            S_hist[idx, :] = bif_S[idx]
-            max_hist[idx, :] = x_max
-            min_hist[idx, :] = x_min
+            def evaluate(ii, jj):
 
-            print("proccess: -*-*-*-*- ", round((idx/ num_S*100),  2), "% -*-*-*-*- ")
+                """ trajectories from x0 = x_ic[jj], y0 = y_ic[ii] -> classes, x min / max; rows of the csv """
 
-        bench_eT = datetime.datetime.now()
+                nonlocal state
 
-        print("end: ", bench_eT)
-        print("bench mark: ", bench_eT - bench_sT)
+                n = ii.size
 
+                if state is None:
 
-        """ Store results as a DataFrame """
+                    # x, y, z, T per initial condition
+                    v = np.zeros((n, 4))
+                    v[:, 0], v[:, 1], v[:, 2] = x_ic[jj], y_ic[ii], np.float32(params["init_z"])
 
-        df = pd.DataFrame({
-            "Q": Q_hist.flatten(),
-            "S": S_hist.flatten(),
-            "max_val": max_hist.flatten(),
-            "min_val": min_hist.flatten()
-        })
+                else:
+                    v = state
 
-        """ Save to CSV """
+                obs, hits = new_observation(params.get("max_hits", 256), n, burst_ratio)
+                mon = new_monitor(params, n)
 
-        try:
-            df.to_csv(self.filename, index=False)
-            print(f"Results saved to {self.filename}")
-        except Exception as e:
-            print(f"Error saving results to {self.filename}: {e}")
+                calc_basin_ode(v, h, a, b, c, d, r, s, x_1, I_ext,
+                               total_step, index_start, decimation,
+                               spike_th, sec_var, sec_level, obs, hits, mon)
 
+                labels = np.empty(n, dtype=np.int8)
+                classify_batch(obs, hits, labels, max_period, tol, burst_ratio)
 
-    @staticmethod
-    @njit(parallel=True)
-    def calc_bifurcation(xx, yy, h,
-                         tau1, b1, S, WE11, WE12, WI11, WI12,
-                         tau2, b2, WE21, WE22, WI21, WI22,
-                         total_step, index_start, store_step):
+                for cond in range(n):
 
-        # conditions number (x, y)
-        total_conds = xx.size
+                    summary = summarize(obs[cond], hits[cond])
 
-        # return
-        x_max_hist = np.empty(total_conds, dtype=np.float32)
-        x_min_hist = np.empty(total_conds, dtype=np.float32)
+                    row = {bif_param: I_ext, "x0": x_ic[jj[cond]], "y0": y_ic[ii[cond]],
+                           "x_min": summary["min"][0], "x_max": summary["max"][0],
+                           "spikes": summary["spikes"],
+                           "isi_mean": summary["isi_mean"], "isi_std": summary["isi_std"],
+                           "hits": summary["hits"], "label": labels[cond]}
 
-        for idx in prange(total_conds):
+                    if branch is not None:
+                        row["branch"] = branch
 
-            _, x_hist, _ = calc_time_evolution_ode(xx[idx], yy[idx], h,
-                                                   tau1, b1, S, WE11, WE12, WI11, WI12,
-                                                   tau2, b2, WE21, WE22, WI21, WI22,
-                                                   total_step, index_start, store_step)
+                    # auto_stop: when and why it stopped
+                    row.update(stop_report(None if mon is None else mon[cond], h))
 
-            # store return hist
-            x_max_hist[idx] = np.max(x_hist)
-            x_min_hist[idx] = np.min(x_hist)
+                    rows.append(row)
+
+                # the next point goes on from here
+                if branch is not None:
+                    state = v
+
+                return labels, obs[:, [OBS_MIN, OBS_MAX]]
+
+            # every initial condition, or the boundaries of the classes only (adaptive_grid)
+            if params.get("adaptive", False):
+                refine((y_ic.size, x_ic.size), evaluate, params.get("adaptive_coarse", 8), params.get("adaptive_tol", 0.05))
+            else:
+                ii, jj = np.indices((y_ic.size, x_ic.size))
+                evaluate(ii.ravel(), jj.ravel())
+
+            print("proccess: -*-*-*-*- ", round(((count + 1)/ len(points)*100),  2), "% -*-*-*-*- ", branch or "")
+
+            # steps of all initial conditions
+            done += conds_size * total_step
+            if self.progress is not None:
+                self.progress(done, total)
+
+        bench_eT = datetime.datetime.now()
+        t1 = time.perf_counter()
+        print("end: ", bench_eT)
+        print("bench mark: ", t1 - t0)
+
+
+        """ Store results as a DataFrame """
+
+        import pandas as pd
+
+        self.df = pd.DataFrame(rows)
+
+        """ Save to CSV """
+
+        try:
+            self.df.to_csv(self.filename, index=False)
+            print(f"Results saved to {self.filename}")
+        except Exception as e:
+            print(f"Error saving results to {self.filename}: {e}")
 
-        return x_max_hist, x_min_hist
+        return self.df
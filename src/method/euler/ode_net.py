@@ -8,6 +8,10 @@ Contents:
 
     HR neuron network
 
+        - forward Euler (calc_time_evolution_ode)
+        - Heun / RK4 (calc_time_evolution_ode_rk), ode_method = "heun", "rk4"
+        - chunked into <save_path>.npy (_ode_network_steps), stream = true
+
 Return:
 
     t_hist
@@ -17,11 +21,14 @@ Return:
 
 # import my library
 import numpy as np
+import math
 from numba import njit
-import matplotlib.pyplot as plt
 import os
 import datetime, time
 
+# import my library
+from src.utils.history_writer import HistoryWriter, history_path, chunk_ranges, chunk_rows
+
 class TimeEvolOdeNetwork:
 
     def __init__(self, params, filename):
@@ -30,6 +37,9 @@ class TimeEvolOdeNetwork:
         self.params = params
         self.filename = filename
 
+        # None or progress(done, total), called between chunks (method_selects.run_method)
+        self.progress = None
+
         # Ensure output directory exists
         os.makedirs(os.path.dirname(self.filename), exist_ok=True)
 
@@ -53,7 +63,8 @@ class TimeEvolOdeNetwork:
         # store step
         total_step = int(eT/h)+1
         index_start = int(sT/h)
-        store_step = (total_step - index_start) // 100 + 1 if total_step > index_start else 0
+        decimation = params.get("decimation", 100)
+        store_step = (total_step - index_start) // decimation + 1 if total_step > index_start else 0
 
         """ params """
 
@@ -94,11 +105,37 @@ class TimeEvolOdeNetwork:
         print("\n start: ", bench_sT)
 
         # set calode
-        t_hist, x_hist = calc_time_evolution_ode(init_x, init_y, init_z, h,
-                                                 a, b, c, d, r, s, x_1, I_ext,
-                                                 V_s, Theta, g_s,  gamma, c_ij,
-                                                 n, k,
-                                                 total_step, index_start, store_step)
+        method = params.get("ode_method", "euler")
+
+        if params.get("stream", False):
+
+            if method not in ODE_METHODS:
+                raise ValueError(f"ode_method {method!r} is not available for a network (euler, heun, rk4)")
+
+            # chunk by chunk into <save_path>.npy, columns (t, x_0, ..., x_n-1)
+            hist = self._run_stream(init_x, init_y, init_z, h,
+                                    a, b, c, d, r, s, x_1, I_ext,
+                                    V_s, Theta, g_s, gamma, c_ij,
+                                    ODE_METHODS[method],
+                                    total_step, index_start, decimation)[:max(store_step - 1, 0)]
+
+            # memory-mapped views
+            t_hist, x_hist = hist[:, 0], hist[:, 1:].T
+
+        elif method == "euler":
+            t_hist, x_hist = calc_time_evolution_ode(init_x, init_y, init_z, h,
+                                                     a, b, c, d, r, s, x_1, I_ext,
+                                                     V_s, Theta, g_s,  gamma, c_ij,
+                                                     n, k,
+                                                     total_step, index_start, store_step, decimation)
+        elif method in ODE_METHODS:
+            t_hist, x_hist = calc_time_evolution_ode_rk(init_x, init_y, init_z, h,
+                                                        a, b, c, d, r, s, x_1, I_ext,
+                                                        V_s, Theta, g_s,  gamma, c_ij,
+                                                        ODE_METHODS[method],
+                                                        total_step, index_start, store_step, decimation)
+        else:
+            raise ValueError(f"ode_method {method!r} is not available for a network (euler, heun, rk4)")
 
         bench_eT = datetime.datetime.now()
         t1 = time.perf_counter()
@@ -110,15 +147,60 @@ class TimeEvolOdeNetwork:
         
         return t_hist, x_hist
 
+    def _run_stream(self, init_x, init_y, init_z, h,
+                    a, b, c, d, r, s, x_1, I_ext,
+                    V_s, Theta, g_s, gamma, c_ij,
+                    method,
+                    total_step, index_start, decimation):
+
+        """ _ode_network_steps chunk by chunk (Euler in float64 loops, not the float32 array kernel) """
+
+        n = init_x.shape[0]
+
+        # state carried between chunks
+        x = init_x.astype(np.float64)
+        y = init_y.astype(np.float64)
+        z = init_z.astype(np.float64)
+        T = 0.0
+
+        # work buffers
+        kx, ky, kz = np.zeros((4, n)), np.zeros((4, n)), np.zeros((4, n))
+        xs, ys, zs, Gamma = np.zeros(n), np.zeros(n), np.zeros(n), np.zeros(n)
+
+        writer = HistoryWriter(history_path(self.filename), n + 1)
+        print("stream: ", writer.path)
 
+        try:
+            for i_begin, i_end in chunk_ranges(total_step, self.params.get("chunk_step", 10**6)):
 
+                k_begin, rows = chunk_rows(i_begin, i_end, index_start, decimation)
+                t_block = np.zeros(rows)
+                x_block = np.zeros((n, rows))
 
-@njit
+                T = _ode_network_steps(x, y, z, kx, ky, kz, xs, ys, zs, Gamma, T, h,
+                                       a, b, c, d, r, s, x_1, I_ext,
+                                       V_s, Theta, g_s, gamma, c_ij,
+                                       method,
+                                       i_begin, i_end, index_start, k_begin, t_block, x_block, decimation)
+
+                writer.append(np.column_stack((t_block, x_block.T)))
+
+                if self.progress is not None:
+                    self.progress(i_end, total_step)
+        finally:
+            writer.close()
+
+        return writer.load()
+
+
+
+
+@njit(cache=True)
 def calc_time_evolution_ode(init_x, init_y, init_z, h,
                             a, b, c, d, r, s, x_1, I_ext,
                             V_s, Theta, g_s,  gamma, c_ij,
                             n, k,
-                            total_step, index_start, store_step):
+                            total_step, index_start, store_step, decimation=100):
 
     # variables
     x_next = x_previous = init_x
@@ -129,8 +211,8 @@ def calc_time_evolution_ode(init_x, init_y, init_z, h,
     T = 0
 
     # store return arrays
-    t_hist = np.zeros(store_step-1, dtype=np.float32)
-    x_hist = np.zeros((n, store_step-1), dtype=np.float32)
+    t_hist = np.zeros(store_step, dtype=np.float32)
+    x_hist = np.zeros((n, store_step), dtype=np.float32)
     I = np.zeros((n), dtype=np.float32)
 
     idx = 0
@@ -157,21 +239,177 @@ def calc_time_evolution_ode(init_x, init_y, init_z, h,
         # store registers
         if i >= index_start:
 
-            if (idx % 100) == 0:
+            if (idx % decimation) == 0:
 
-                idx_insert = int(idx/100)
+                idx_insert = idx//decimation
                 t_hist[idx_insert] = T
                 x_hist[:, idx_insert] = x_previous
 
             idx += 1
 
-    return t_hist, x_hist
+    return t_hist[:-1], x_hist[:, :-1]
+
+
+# ode_method -> kernel code
+ODE_METHODS = {"euler": 0, "heun": 1, "rk4": 2}
+
+
+@njit(cache=True)
+def _hr_network_rhs(x, y, z,
+                    a, b, c, d, r, s, x_1, I_ext,
+                    V_s, Theta, g_s, gamma, c_ij,
+                    Gamma, dx, dy, dz):
+
+    """ HR network vector field, written into dx, dy, dz (Gamma is a work buffer) """
+
+    n = x.shape[0]
+
+    # synapse output
+    for i in range(n):
+        Gamma[i] = 1.0 / (1.0 + math.exp(-gamma * (x[i] - Theta)))
+
+    for j in range(n):
+
+        # calculate synapse input
+        syn = 0.0
+        for i in range(n):
+            syn += c_ij[j, i] * Gamma[i]
+
+        I = - g_s * (x[j] - V_s) * syn
+
+        # calculate
+        dx[j] = y[j] - a* x[j]**3 + b* x[j]**2 - z[j] + I_ext + I
+        dy[j] = c - d*x[j]**2 - y[j]
+        dz[j] = r*(s*(x[j] - x_1) - z[j])
+
+
+@njit(cache=True)
+def _ode_network_steps(x, y, z, kx, ky, kz, xs, ys, zs, Gamma, T, h,
+                       a, b, c, d, r, s, x_1, I_ext,
+                       V_s, Theta, g_s, gamma, c_ij,
+                       method,
+                       i_begin, i_end, index_start, k_begin, t_hist, x_hist, decimation=100):
+
+    """
+    Ticks [i_begin, i_end) of Euler (method=0), Heun (1) or RK4 (2), resumable
+
+        x, y, z: float64 (n,) state, updated in place
+        kx, ky, kz (4, n), xs, ys, zs, Gamma (n,): work buffers
+
+    Return:
+        T for the next call; t_hist[k - k_begin], x_hist[:, k - k_begin] hold sample k
+    """
+
+    n = x.shape[0]
+
+    for i in range(i_begin, i_end):
+
+        # k1
+        _hr_network_rhs(x, y, z, a, b, c, d, r, s, x_1, I_ext, V_s, Theta, g_s, gamma, c_ij,
+                        Gamma, kx[0], ky[0], kz[0])
+
+        if method == 0:
+
+            for j in range(n):
+                x[j] += h * kx[0, j]
+                y[j] += h * ky[0, j]
+                z[j] += h * kz[0, j]
+
+        elif method == 1:
+
+            # k2 at x + h k1
+            for j in range(n):
+                xs[j] = x[j] + h * kx[0, j]
+                ys[j] = y[j] + h * ky[0, j]
+                zs[j] = z[j] + h * kz[0, j]
+
+            _hr_network_rhs(xs, ys, zs, a, b, c, d, r, s, x_1, I_ext, V_s, Theta, g_s, gamma, c_ij,
+                            Gamma, kx[1], ky[1], kz[1])
+
+            for j in range(n):
+                x[j] += 0.5 * h * (kx[0, j] + kx[1, j])
+                y[j] += 0.5 * h * (ky[0, j] + ky[1, j])
+                z[j] += 0.5 * h * (kz[0, j] + kz[1, j])
+
+        else:
+
+            # k2, k3 at the midpoint, k4 at the end
+            for stage in range(1, 4):
+
+                w = h if stage == 3 else 0.5 * h
+
+                for j in range(n):
+                    xs[j] = x[j] + w * kx[stage-1, j]
+                    ys[j] = y[j] + w * ky[stage-1, j]
+                    zs[j] = z[j] + w * kz[stage-1, j]
+
+                _hr_network_rhs(xs, ys, zs, a, b, c, d, r, s, x_1, I_ext, V_s, Theta, g_s, gamma, c_ij,
+                                Gamma, kx[stage], ky[stage], kz[stage])
+
+            for j in range(n):
+                x[j] += h / 6.0 * (kx[0, j] + 2.0*kx[1, j] + 2.0*kx[2, j] + kx[3, j])
+                y[j] += h / 6.0 * (ky[0, j] + 2.0*ky[1, j] + 2.0*ky[2, j] + ky[3, j])
+                z[j] += h / 6.0 * (kz[0, j] + 2.0*kz[1, j] + 2.0*kz[2, j] + kz[3, j])
+
+        # update time
+        T += h
+
+        # store registers
+        if (i >= index_start) and ((i - index_start) % decimation == 0):
+
+            idx_insert = (i - index_start)//decimation - k_begin
+
+            t_hist[idx_insert] = T
+            for j in range(n):
+                x_hist[j, idx_insert] = x[j]
+
+    return T
+
+
+@njit(cache=True)
+def calc_time_evolution_ode_rk(init_x, init_y, init_z, h,
+                               a, b, c, d, r, s, x_1, I_ext,
+                               V_s, Theta, g_s, gamma, c_ij,
+                               method,
+                               total_step, index_start, store_step, decimation=100):
+
+    """
+    Fixed-step Heun (method=1) or RK4 (method=2) for the HR network
+
+        All stages write into buffers allocated once, nothing is allocated per step.
+        State is carried in float64, the history is stored as float32 like the Euler kernel.
+    """
+
+    n = init_x.shape[0]
+
+    # variables
+    x = init_x.astype(np.float64)
+    y = init_y.astype(np.float64)
+    z = init_z.astype(np.float64)
+
+    # work buffers: stages k1..k4, stage state, synapse output
+    kx, ky, kz = np.zeros((4, n)), np.zeros((4, n)), np.zeros((4, n))
+    xs, ys, zs, Gamma = np.zeros(n), np.zeros(n), np.zeros(n), np.zeros(n)
+
+    # store return arrays
+    t_hist = np.zeros(store_step, dtype=np.float32)
+    x_hist = np.zeros((n, store_step), dtype=np.float32)
+
+    _ode_network_steps(x, y, z, kx, ky, kz, xs, ys, zs, Gamma, 0.0, h,
+                       a, b, c, d, r, s, x_1, I_ext,
+                       V_s, Theta, g_s, gamma, c_ij,
+                       method,
+                       0, total_step, index_start, 0, t_hist, x_hist, decimation)
+
+    return t_hist[:-1], x_hist[:, :-1]
 
 
 """ test """
 
 def plot_time_series(t_hist, x_hist):
 
+    import matplotlib.pyplot as plt
+
     n  = x_hist.shape[0]
 
     fig, ax = plt.subplots(figsize=(10, 7))
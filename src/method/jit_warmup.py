@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+"""
+Created on: 2026-03-16
+
+@author: shirafujilab
+
+Contents:
+
+    JIT warm-up of the simulation kernels
+
+        Every kernel is @njit(cache=True): the machine code is written next to the source
+        (__pycache__/*.nbi, *.nbc) and loaded by the next process instead of compiled.
+        warm_up() calls the kernels once on tiny inputs (a 4x4x4 LUT, a few ticks) with the
+        argument types the runners build from params, so that the first ▶ only runs them.
+
+        start_warm_up() does it in a daemon thread, WindowSetup starts it at startup.
+        A run started meanwhile waits on numba's compiler lock, nothing is compiled twice.
+
+    Note:
+
+        numba checks only the source file of a kernel. After editing a helper that lives in
+        another module (phase_clock, observables, ...), call clear_jit_cache() once.
+
+Usage:
+
+    thread = start_warm_up(params)
+
+"""
+
+# import standard library
+import os
+import glob
+import threading
+import time
+
+import numpy as np
+
+
+# tiny problem: LUT side, ticks
+WARM_N = 4
+WARM_STEP = 3
+
+
+def warm_up(params):
+
+    """ compile (or load from the cache) the kernels for the types of params """
+
+    t0 = time.perf_counter()
+
+    for name, warm in (("esl single", _warm_eca_single),
+                       ("ode single", _warm_ode_single),
+                       ("esl batch", _warm_eca_batch),
+                       ("esl network", _warm_eca_network),
+                       ("ode network", _warm_ode_network),
+                       ("esl bifurcation", _warm_eca_bif),
+                       ("attraction basin", _warm_basin),
+                       ("parameter map", _warm_map)):
+        try:
+            warm(params)
+        except Exception as e:
+            print(f"warm-up {name}: {e}")
+
+    print("warm-up: ", time.perf_counter() - t0)
+
+
+def start_warm_up(params):
+
+    thread = threading.Thread(target=warm_up, args=(dict(params),), name="jit-warm-up", daemon=True)
+    thread.start()
+
+    return thread
+
+
+def clear_jit_cache():
+
+    """ remove the on-disk numba cache of src/ """
+
+    src_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    for path in glob.glob(os.path.join(src_dir, "**", "__pycache__", "*.nb[ic]"), recursive=True):
+        os.remove(path)
+
+
+def _model_params(params):
+
+    """ HR parameters as the runners pass them: a .. s, I_ext (float32), x_1 """
+
+    a, b, c, d, r, s = (np.float32(params[k]) for k in ("a", "b", "c", "d", "r", "s"))
+    I_ext = np.float32(params["I_ext"])
+
+    # x_1
+    p = (d - b) / a
+    q = c / a
+
+    x_1 = np.roots([1, p, 0, -q])[0]
+
+    return a, b, c, d, r, s, x_1, I_ext
+
+
+def _tiny_lut(params, readonly=True):
+
+    """ Fin, Gin, Hin of side WARM_N, read-only as the ones of lut_cache.cached_lut """
+
+    from src.method.eca.eca_basic import _make_lut_numba
+
+    M, s1, s2, s3 = params["M"], params["s1"], params["s2"], params["s3"]
+    Tx, Wx, Ty, Wy, Tz, Wz = params["Tx"], params["Wx"], params["Ty"], params["Wy"], params["Tz"], params["Wz"]
+
+    luts = _make_lut_numba(WARM_N, WARM_N, WARM_N, M, s1, s2, s3, Tx, Wx, Ty, Wy, Tz, Wz,
+                           *_model_params(params))
+
+    for lut in luts:
+        lut.flags.writeable = not readonly
+
+    return luts
+
+
+def _warm_eca_single(params):
+
+    from src.method.eca.eca_basic import (_clock, _initial_state, calc_time_evolution_eca,
+                                          calc_time_evolution_eca_chunk, calc_reduction_eca)
+    from src.method.eca.phase_clock import initial_phase
+    from src.method.observables import new_observation, new_monitor
+
+    Fin, Gin, Hin = _tiny_lut(params)
+    M, N, s1, s2, s3, Tc = params["M"], WARM_N, params["s1"], params["s2"], params["s3"], params["Tc"]
+    I_ext = np.float32(params["I_ext"])
+    decimation = params.get("decimation", 100)
+
+    clk = _clock(params)
+    reg0 = np.int16(0)
+    ph0 = initial_phase(0.0, clk)
+
+    # run()
+    calc_time_evolution_eca(reg0, reg0, reg0, reg0, reg0, reg0, ph0, ph0, ph0,
+                            M, N, N, N, Fin, Gin, Hin, I_ext, Tc, clk,
+                            WARM_STEP, 0, WARM_STEP, decimation)
+
+    # stream, reduce()
+    reg, ph = _initial_state(dict(params, init_X=0, init_Y=0, init_Z=0), clk)
+
+    calc_time_evolution_eca_chunk(reg, ph, M, N, N, N, Fin, Gin, Hin, Tc, clk,
+                                  0, WARM_STEP, 0, 0, np.zeros((WARM_STEP, 4)), decimation)
+
+    obs, hits = new_observation(params.get("max_hits", 256), burst_ratio=params.get("burst_ratio", 3.0))
+
+    calc_reduction_eca(reg, ph, M, N, N, N, Fin, Gin, Hin, Tc, clk, s1, s2, s3,
+                       0, WARM_STEP, 0, decimation,
+                       params.get("spike_th", 0.0), params.get("poincare_var", 0), params.get("poincare_level", 1.0),
+                       obs, hits, params.get("cycle_detect", False), new_monitor(params))
+
+    _warm_observe_block(params, obs, hits)
+
+
+def _warm_eca_batch(params):
+
+    from src.method.eca.eca_basic import _clock, calc_time_evolution_eca_batch
+    from src.method.eca.phase_clock import initial_phase
+
+    # writable, as make_lut_stack builds them
+    Fin, Gin, Hin = _tiny_lut(params, readonly=False)
+    M, N, Tc = params["M"], WARM_N, params["Tc"]
+
+    clk = _clock(params)
+    reg0 = np.zeros(2, dtype=np.int16)
+    ph0 = np.full(2, initial_phase(0.0, clk))
+
+    calc_time_evolution_eca_batch(reg0, reg0, reg0, reg0, reg0, reg0, ph0, ph0, ph0,
+                                  M, N, N, N, Fin[np.newaxis], Gin, Hin, np.zeros(2, dtype=np.int64), Tc, clk,
+                                  WARM_STEP, 0, WARM_STEP, params.get("decimation", 100))
+
+
+def _warm_observe_block(params, obs, hits):
+
+    """ stream with auto_stop """
+
+    from src.method.observables import new_monitor, observe_block
+
+    mon = new_monitor(params)
+
+    if mon is not None:
+        observe_block(obs, hits, mon, np.zeros((WARM_STEP, 4)), 0, params.get("decimation", 100),
+                      params.get("spike_th", 0.0), params.get("poincare_var", 0), params.get("poincare_level", 1.0))
+
+
+def _warm_eca_network(params):
+
+    from src.method.eca.eca_net import calc_time_evolution_eca, coupling_to_csr, C_IJ, TH, M_I
+    from src.method.eca.phase_clock import make_clock, initial_phase
+
+    Fin, Gin, Hin = _tiny_lut(params)
+    M, N, s1, Tc = params["M"], WARM_N, params["s1"], params["Tc"]
+    Tx, Wx, Ty, Wy, Tz, Wz = params["Tx"], params["Wx"], params["Ty"], params["Wy"], params["Tz"], params["Wz"]
+
+    clk = make_clock(Tc, Tx, Wx, Ty, Wy, Tz, Wz, params.get("int_phase", False), params.get("phase_bits", 32))
+
+    n = C_IJ.shape[0]
+    reg0 = np.zeros(n, dtype=np.int16)
+    ph0 = np.full(n, initial_phase(0.0, clk))
+
+    out_indptr, out_indices, out_weights = coupling_to_csr(C_IJ)
+
+    # the 9-neuron default runs the serial twin
+    calc_time_evolution_eca(reg0, reg0, reg0, reg0, reg0, reg0, ph0, ph0.copy(), ph0.copy(),
+                            M, N, N, N, Fin, Gin, Hin, Tc, Tx, Wx, clk,
+                            M_I, s1, np.float32(params["g_s"]), np.float32(params["V_s"]), TH,
+                            out_indptr, out_indices, out_weights,
+                            WARM_STEP, 0, WARM_STEP, False, params.get("decimation", 100))
+
+
+def _warm_eca_bif(params):
+
+    from src.method.eca.eca_bif import calc_bifurcation
+    from src.method.eca.eca_basic import _clock
+    from src.method.observables import new_observation, new_monitor
+
+    # Fin refilled in place by the sweep
+    Fin, Gin, Hin = _tiny_lut(params, readonly=False)
+    M, N, s1, s2, s3, Tc = params["M"], WARM_N, params["s1"], params["s2"], params["s3"], params["Tc"]
+
+    reg = np.zeros((1, 6), dtype=np.int64)
+    ph = np.zeros((1, 4))
+    obs, hits = new_observation(params.get("max_hits", 256), 1, params.get("burst_ratio", 3.0))
+
+    calc_bifurcation(reg, ph, M, N, N, N, Fin, Gin, Hin, Tc, _clock(params), s1, s2, s3,
+                     WARM_STEP, 0, params.get("decimation", 100),
+                     params.get("spike_th", 0.0), params.get("poincare_var", 0), params.get("poincare_level", 1.0),
+                     obs, hits, params.get("cycle_detect", False), new_monitor(params, 1))
+
+
+def _warm_basin(params):
+
+    from src.method.euler.ode_basin import calc_basin_ode
+    from src.method.observables import new_observation, new_monitor, classify_batch
+
+    obs, hits = new_observation(params.get("max_hits", 256), 1, params.get("burst_ratio", 3.0))
+
+    calc_basin_ode(np.zeros((1, 4)), np.float32(params["h"]), *_model_params(params),
+                   WARM_STEP, 0, params.get("decimation", 100),
+                   params.get("spike_th", 0.0), params.get("poincare_var", 0), params.get("poincare_level", 1.0),
+                   obs, hits, new_monitor(params, 1))
+
+    # ESL and ODE: the classes of the observables
+    classify_batch(obs, hits, np.empty(1, dtype=np.int8), int(params.get("basin_max_period", 8)),
+                   params.get("basin_tol", 0.01), params.get("burst_ratio", 3.0))
+
+
+def _warm_map(params):
+
+    from src.method.param_map import calc_map_ode, _model_values
+    from src.method.observables import new_observation, new_monitor
+
+    obs, hits = new_observation(params.get("max_hits", 256), 1, params.get("burst_ratio", 3.0))
+    prm, x_1 = _model_values(params, ("I_ext",), (np.array([params["I_ext"]]),))
+
+    calc_map_ode(np.zeros((1, 4)), np.float32(params["h"]), prm, x_1,
+                 WARM_STEP, 0, params.get("decimation", 100),
+                 params.get("spike_th", 0.0), params.get("poincare_var", 0), params.get("poincare_level", 1.0),
+                 obs, hits, new_monitor(params, 1))
+
+
+def _warm_ode_single(params):
+
+    from src.method.euler.ode_basic import (calc_time_evolution_ode, calc_time_evolution_ode_chunk,
+                                            calc_reduction_ode, calc_time_evolution_ode_dopri)
+    from src.method.observables import new_observation, new_monitor
+
+    args = _model_params(params)
+    h = np.float32(params["h"])
+    v0 = np.float32(params["init_x"]), np.float32(params["init_y"]), np.float32(params["init_z"])
+    decimation = params.get("decimation", 100)
+
+    if params.get("ode_method", "euler") == "dopri5":
+        calc_time_evolution_ode_dopri(*v0, h, *args,
+                                      params.get("rtol", 1e-6), params.get("atol", 1e-8), params.get("max_step", 0.5),
+                                      WARM_STEP, 0, WARM_STEP, decimation)
+    else:
+        calc_time_evolution_ode(*v0, h, *args, WARM_STEP, 0, WARM_STEP, decimation)
+
+    # stream, reduce()
+    v = np.array([*v0, 0.0])
+
+    calc_time_evolution_ode_chunk(v, h, *args, 0, WARM_STEP, 0, 0, np.zeros((WARM_STEP, 4)), decimation)
+
+    obs, hits = new_observation(params.get("max_hits", 256), burst_ratio=params.get("burst_ratio", 3.0))
+
+    calc_reduction_ode(v, h, *args, 0, WARM_STEP, 0, decimation,
+                       params.get("spike_th", 0.0), params.get("poincare_var", 0), params.get("poincare_level", 1.0),
+                       obs, hits, new_monitor(params))
+
+    _warm_observe_block(params, obs, hits)
+
+
+def _warm_ode_network(params):
+
+    from src.method.euler.ode_net import calc_time_evolution_ode, calc_time_evolution_ode_rk, ODE_METHODS
+
+    a, b, c, d, r, s, x_1, I_ext = _model_params(params)
+    x_1 = np.float32(x_1)
+    h = np.float32(params["h"])
+    decimation = params.get("decimation", 100)
+
+    # 9 neurons, as TimeEvolOdeNetwork
+    n = 9
+    c_ij = np.ones((n, n), dtype=np.float32)
+    k = np.sum(c_ij[0])
+    v0 = np.zeros(n, dtype=np.float32)
+
+    coupling = (np.float32(params["V_s"]), np.float32(params["Theta"]), np.float32(params["g_s"]), np.float32(params["gamma"]), c_ij)
+
+    method = params.get("ode_method", "euler")
+
+    if method in ODE_METHODS and method != "euler":
+        calc_time_evolution_ode_rk(v0, v0, v0, h, a, b, c, d, r, s, x_1, I_ext, *coupling,
+                                   ODE_METHODS[method], WARM_STEP, 0, WARM_STEP, decimation)
+    else:
+        calc_time_evolution_ode(v0, v0, v0, h, a, b, c, d, r, s, x_1, I_ext, *coupling,
+                                n, k, WARM_STEP, 0, WARM_STEP, decimation)
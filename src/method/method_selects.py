@@ -38,6 +38,10 @@ Arguments:
             Poincare map (return map)
             stability
 
+    REGISTRY: (model, simulation) -> "module:Class" of the runner and how its result is
+    shown. The module is imported on first use (importlib), so starting the GUI or a
+    worker process does not import numba kernels, pandas or matplotlib up front.
+
 Note:
 
     Before Cal, parameter must be liseted up
@@ -45,93 +49,132 @@ Note:
 """
 
 # import standard library
-import numpy as np
+import importlib
 
-import matplotlib.pyplot as plt
 
-import datetime, time
+# (model, simulation) -> runner "module:Class", kind of result
+#   single:      run() -> t, I, x, y, z
+#   batch:       run() -> t, I, x, y, z with x, y, z (batch, samples), shown as one line per trajectory
+#   network:     run() -> t, x
+#   bifurcation: run() writes the csv, the runner is kept as master.results_bif (also parameter map)
+#   lut:         run() writes the .mem / .coe tables, returns the manifest (master.lut_manifest)
+#   basin:       run() -> x axis, y axis, int8 labels (y, x), legend (master.results_basin)
+REGISTRY = {
+    ("ode", "time evolution (single)"):  ("src.method.euler.ode_basic:TimeEvolOdeSingle", "single"),
+    ("ode", "time evolution (network)"): ("src.method.euler.ode_net:TimeEvolOdeNetwork", "network"),
+    ("ode", "bifurcation (single)"):     ("src.method.euler.ode_bif:BifODE", "bifurcation"),
+    ("ode", "attraction basin"):         ("src.method.euler.ode_basin:BasinODE", "basin"),
+    ("ode", "parameter map"):            ("src.method.param_map:ParamMap2D", "bifurcation"),
 
-# import ode library
-from src.method.euler.ode_basic import TimeEvolOdeSingle
-from src.method.euler.ode_net import TimeEvolOdeNetwork
-from src.method.euler.ode_bif import BifODE
+    ("esl", "time evolution (single)"):  ("src.method.eca.eca_basic:TimeEvolEcaSingle", "single"),
+    ("esl", "time evolution (network)"): ("src.method.eca.eca_net:TimeEvolEcaNetwork", "network"),
+    ("esl", "time evolution (batch)"):   ("src.method.eca.eca_basic:TimeEvolEcaBatch", "batch"),
+    ("esl", "bifurcation (single)"):     ("src.method.eca.eca_bif:BifECA", "bifurcation"),
+    ("esl", "bifurcation (network)"):    ("src.method.eca.eca_bif:BifEcaNetwork", "bifurcation"),
+    ("esl", "attraction basin"):         ("src.method.eca.eca_basin:BasinECA", "basin"),
+    ("esl", "parameter map"):            ("src.method.param_map:ParamMap2D", "bifurcation"),
 
-# import eca library
-from src.method.eca.eca_basic import TimeEvolEcaSingle, _make_lut_numba
-from src.method.eca.eca_net import TimeEvolEcaNetwork
-from src.method.eca.eca_bif import BifECA
+    ("esl", "Output LUT"):               ("src.method.eca.eca_lut:LutExport", "lut"),
+}
 
 
+def load_runner(spec):
 
-from src.method.eca.eca_lut import make_lut_for_verilog
+    """ "module:Class" -> Class """
 
+    module_name, class_name = spec.split(":")
 
+    return getattr(importlib.import_module(module_name), class_name)
 
-class MethodSelects:
 
-    def __init__(self, master):
+def set_threads(params):
 
-        # get master and filename
-        self.master = master
-        self.file_name = master.file_name
+    """ numba threads for the kernels of this process (num_threads, at most NUMBA_NUM_THREADS) """
 
-        # get information
-        model, sim_type = master.params["model"], master.params["simulation"]
+    import numba
 
-        if model in ["ode"]:
-            self.sim_ode(sim_type)
-        elif model in ["esl"]:
-            self.sim_esl(sim_type)
+    n = min(int(params.get("num_threads", 15)), numba.config.NUMBA_NUM_THREADS)
+    numba.set_num_threads(max(n, 1))
 
 
-    def sim_ode(self, sim_type):
-        
-        inst = self.master.results
+def run_method(params, file_name, progress=None):
 
-        if sim_type == "time evolution (single)":
-            time_evol = TimeEvolOdeSingle(self.master.params, self.file_name)
-            inst.t_hist, _, inst.x_hist, inst.y_hist, inst.z_hist = time_evol.run()
+    """
+    Run the registered simulation of params["model"], params["simulation"]
 
-        elif sim_type == "time evolution (network)":
-            time_evol = TimeEvolOdeNetwork(self.master.params, self.file_name)
-            inst.t_hist, inst.x_hist = time_evol.run()
+    progress: None or callable (done, total), called by the runner between chunks (sim_worker)
 
-        #elif sim_type == "bifurcation (single)":
-        #    self.master.results_bif = BifODE(self.master.params, self.file_name)
-        #    self.master.results_bif.run()
+    A result stored for the same parameters is loaded instead (result_memo, force_rerun).
 
-        #elif sim_type == "bifurcation (network)":
-        #    self.master.results_bif = BifODE(self.master.params, self.file_name)
-        #    self.master.results_bif.run()
+    Return:
+        kind, runner, result of runner.run()   (None if not registered)
+    """
 
-        else:
-            print("not implemented")
+    entry = REGISTRY.get((params["model"], params["simulation"]))
 
+    if entry is None:
+        return None
 
-    def sim_esl(self, sim_type):
+    spec, kind = entry
 
-        inst = self.master.results
+    from src.method.result_memo import load_result, remember
 
-        if sim_type == "time evolution (single)":
-            time_evol = TimeEvolEcaSingle(self.master.params, self.file_name)
-            inst.t_hist, _, inst.x_hist, inst.y_hist, inst.z_hist = time_evol.run()
+    # the stored result of the same parameters, unless force_rerun
+    if not params.get("force_rerun", False):
+        done = load_result(params)
+        if done is not None:
+            return done
 
-        elif sim_type == "time evolution (network)":
-            time_evol = TimeEvolEcaNetwork(self.master.params, self.file_name)
-            inst.t_hist, inst.x_hist = time_evol.run()
+    set_threads(params)
 
-        #elif sim_type == "bifurcation (single)":
-        #   self.master.results_bif = BifECA(self.master.params, self.file_name)
-        #    self.master.results_bif.run()
+    runner = load_runner(spec)(params, file_name)
+    runner.progress = progress
 
-        #elif sim_type == "bifurcation (network)":
-        #    self.master.results_bif = BifECA(self.master.params, self.file_name)
-        #    self.master.results_bif.run()
+    result = runner.run()
 
-        #elif sim_type == "Output LUT":
+    if params.get("memoize", True):
+        remember(params, file_name, kind, result)
 
-        #    make_lut_for_verilog(self.master.params, self.file_name, "normal")
+    return kind, runner, result
 
-        else:
+
+class MethodSelects:
+
+    def __init__(self, master, done=None):
+
+        """ done: None (run here) or (kind, runner, result) of a SimWorker, only stored """
+
+        # get master and filename (set by run_simulation; a stored or finished result has its own)
+        self.master = master
+        self.file_name = master.file_name if done is None else None
+
+        if done is None:
+            done = run_method(master.params, self.file_name)
+
+        if done is None:
             print("not implemented")
+        else:
+            self.store(*done)
+
+
+    def store(self, kind, runner, result):
+
+        """ results -> master.results (time evolution), master.results_bif (bifurcation), master.lut_manifest, master.results_basin """
+
+        inst = self.master.results
+
+        if kind in ("single", "batch"):
+            inst.t_hist, _, inst.x_hist, inst.y_hist, inst.z_hist = result
+
+        elif kind == "network":
+            inst.t_hist, inst.x_hist = result
+            inst.y_hist = inst.z_hist = None
+
+        elif kind == "bifurcation":
+            self.master.results_bif = runner
+
+        elif kind == "lut":
+            self.master.lut_manifest = result
 
+        elif kind == "basin":
+            self.master.results_basin = result
@@ -0,0 +1,569 @@
+# -*- coding: utf-8 -*-
+"""
+Created on: 2026-03-13
+
+@author: shirafujilab
+
+Contents:
+
+    In-kernel reductions of a trajectory, O(1) memory (no history array)
+
+        obs (N_OBS,) float64, updated by observe() at every observed tick:
+
+            running min / max of x, y, z
+            spikes: upward crossings of x through spike_th
+            inter-spike intervals: count, sum, sum of squares, min, max
+            bursts: intervals longer than burst_ratio * the shortest one so far (the test
+                    classify() makes), each starts a burst
+            Poincare section: upward crossings of (x, y, z)[sec_var] through sec_level,
+                              (x, y, z) at the last len(hits) crossings kept in a ring buffer,
+                              interpolated onto the section between the two observed ticks
+
+        Values are in model units (ECA registers are scaled with s1, s2, s3 first).
+
+    Attractor classes (attraction basins): classify() / classify_batch() -> int8 label
+
+        0       quiescent   fewer than 2 spikes
+        1       tonic       period 1 on the Poincare section, or no period and no bursts
+                            (spiking the ESL registers keep from repeating exactly)
+        2       bursting    no period up to max_period, isi_max > burst_ratio * isi_min
+        10 + k  period-k    period k (2 .. max_period) on the Poincare section
+
+        The period is that of the kept hits (the last len(hits) crossings after sT):
+        hit g equals hit g - k within tol * (max - min) of each variable.
+
+    Convergence monitor (auto_stop): monitor() after every observe(), mon of new_monitor()
+
+        transient: from sT on, until
+            periodic     the last conv_window Poincare hits each equal the hit of the same phase
+                         in the period before them (k <= basin_max_period, within
+                         conv_tol * (max - min) of each variable: a drift over the window counts)
+            fixed point  the state stays within conv_tol * (max - min) of where it settled for
+                         conv_window observed ticks, twice the longest ISI seen and as long
+                         as it took from sT to settle there
+        then obs, hits are reset (the transient is not in them) and
+            periodic     record_periods periods (record_periods * k + 1 hits)
+            fixed point  conv_window observed ticks
+        are recorded before the kernel stops. Without convergence it runs to eT (STOP_END).
+        mon keeps the reason and the ticks of the convergence and of the stop (stop_report()).
+
+Usage:
+
+    obs, hits = new_observation(max_hits, burst_ratio=burst_ratio)
+    ... kernel calls observe(obs, hits, T, x, y, z, spike_th, sec_var, sec_level) ...
+    summary = summarize(obs, hits)
+
+    mon = new_monitor(params)                  None unless auto_stop
+    ... kernel: if monitor(mon, obs, hits, i, T, x, y, z): break ...
+    summary.update(stop_report(mon, h))
+
+    skip_periods() accounts for whole periods of a detected cycle without running them.
+
+    stream (history in chunks): rows, stopped = observe_block(obs, hits, mon, block, ...) after
+    each chunk, only block[:rows] written, no chunk after stopped.
+
+    labels = np.empty(batch, dtype=np.int8)
+    classify_batch(obs, hits, labels, max_period, tol, burst_ratio)
+    legend = basin_legend(max_period)
+    save_basin(filename, labels, legend)       labels .npy, legend csv (label, name, count)
+
+"""
+
+import numpy as np
+import os
+from numba import njit, prange
+
+
+# slots of obs
+OBS_SAMPLES = 0
+OBS_MIN = 1             # 1, 2, 3: x, y, z
+OBS_MAX = 4             # 4, 5, 6: x, y, z
+OBS_SPIKES = 7
+OBS_LAST_SPIKE = 8
+OBS_ISI_N = 9
+OBS_ISI_SUM = 10
+OBS_ISI_SQ = 11
+OBS_ISI_MIN = 12
+OBS_ISI_MAX = 13
+OBS_HITS = 14
+OBS_PREV = 15           # 15, 16, 17: x, y, z at the previous observed tick
+OBS_BURSTS = 18
+OBS_BURST_RATIO = 19    # setting, kept by reset_observation()
+N_OBS = 20
+
+# slots of mon: settings, state, report
+MON_TOL = 0
+MON_WINDOW = 1
+MON_RECORD = 2
+MON_MAX_PERIOD = 3
+MON_RECORDING = 4
+MON_TARGET = 5          # hits (periodic) / observed ticks (fixed point) to record
+MON_ANCHOR = 6          # 6, 7, 8: x, y, z where the state settled
+MON_STILL = 9           # observed ticks within tol of the anchor
+MON_ANCHOR_T = 10       # T when it settled there
+MON_START_T = 11        # T of the first observed tick
+MON_SEEN_HITS = 12      # hits at the last periodic check
+MON_REASON = 13
+MON_CONV_TICK = 14
+MON_STOP_TICK = 15
+N_MON = 16
+
+# reasons of the stop
+STOP_END = 0            # eT reached without convergence
+STOP_PERIODIC = 1
+STOP_FIXED = 2
+STOP_NAMES = {STOP_END: "end", STOP_PERIODIC: "periodic", STOP_FIXED: "fixed point"}
+
+# attractor classes
+BASIN_QUIESCENT = 0
+BASIN_TONIC = 1
+BASIN_BURSTING = 2
+BASIN_PERIOD = 10       # 10 + k: period-k
+
+
+def new_observation(max_hits=256, batch=None, burst_ratio=3.0):
+
+    """ batch=None: obs (N_OBS,), hits (max_hits, 3); else one row per trajectory """
+
+    shape = () if batch is None else (batch,)
+
+    obs = np.zeros(shape + (N_OBS,))
+
+    obs[..., OBS_MIN:OBS_MIN+3] = np.inf
+    obs[..., OBS_MAX:OBS_MAX+3] = -np.inf
+    obs[..., OBS_ISI_MIN] = np.inf
+    obs[..., OBS_ISI_MAX] = -np.inf
+    obs[..., OBS_BURST_RATIO] = burst_ratio
+
+    hits = np.zeros(shape + (max(int(max_hits), 1), 3))
+
+    return obs, hits
+
+
+@njit(cache=True)
+def observe(obs, hits, T, x, y, z, spike_th, sec_var, sec_level):
+
+    first = obs[OBS_SAMPLES] == 0
+    obs[OBS_SAMPLES] += 1
+
+    # min / max
+    obs[OBS_MIN] = min(obs[OBS_MIN], x)
+    obs[OBS_MIN+1] = min(obs[OBS_MIN+1], y)
+    obs[OBS_MIN+2] = min(obs[OBS_MIN+2], z)
+    obs[OBS_MAX] = max(obs[OBS_MAX], x)
+    obs[OBS_MAX+1] = max(obs[OBS_MAX+1], y)
+    obs[OBS_MAX+2] = max(obs[OBS_MAX+2], z)
+
+    if not first:
+
+        # spike: x crosses spike_th upward
+        if (obs[OBS_PREV] < spike_th) and (x >= spike_th):
+
+            if obs[OBS_SPIKES] > 0:
+
+                isi = T - obs[OBS_LAST_SPIKE]
+
+                # a long interval (against the shortest before it) starts a burst
+                if isi > obs[OBS_BURST_RATIO] * obs[OBS_ISI_MIN]:
+                    obs[OBS_BURSTS] += 1
+
+                obs[OBS_ISI_N] += 1
+                obs[OBS_ISI_SUM] += isi
+                obs[OBS_ISI_SQ] += isi * isi
+                obs[OBS_ISI_MIN] = min(obs[OBS_ISI_MIN], isi)
+                obs[OBS_ISI_MAX] = max(obs[OBS_ISI_MAX], isi)
+
+            obs[OBS_SPIKES] += 1
+            obs[OBS_LAST_SPIKE] = T
+
+        # Poincare section: upward crossing of the chosen variable
+        v = x if sec_var == 0 else (y if sec_var == 1 else z)
+
+        if (obs[OBS_PREV + sec_var] < sec_level) and (v >= sec_level):
+
+            slot = int(obs[OBS_HITS]) % hits.shape[0]
+
+            # on the section: linear between the previous and this observed tick
+            w = (sec_level - obs[OBS_PREV + sec_var]) / (v - obs[OBS_PREV + sec_var])
+
+            hits[slot, 0] = obs[OBS_PREV] + w * (x - obs[OBS_PREV])
+            hits[slot, 1] = obs[OBS_PREV+1] + w * (y - obs[OBS_PREV+1])
+            hits[slot, 2] = obs[OBS_PREV+2] + w * (z - obs[OBS_PREV+2])
+
+            obs[OBS_HITS] += 1
+
+    obs[OBS_PREV] = x
+    obs[OBS_PREV+1] = y
+    obs[OBS_PREV+2] = z
+
+
+def new_monitor(params, batch=None):
+
+    """ None without auto_stop; else mon (N_MON,) of conv_tol, conv_window, record_periods, one row per trajectory for a batch """
+
+    if not params.get("auto_stop", False):
+        return None
+
+    shape = () if batch is None else (batch,)
+
+    mon = np.zeros(shape + (N_MON,))
+
+    mon[..., MON_TOL] = params.get("conv_tol", 0.01)
+    mon[..., MON_WINDOW] = max(int(params.get("conv_window", 8)), 1)
+    mon[..., MON_RECORD] = max(int(params.get("record_periods", 4)), 1)
+    mon[..., MON_MAX_PERIOD] = int(params.get("basin_max_period", 8))
+    mon[..., MON_STOP_TICK] = -1
+
+    return mon
+
+
+@njit(cache=True)
+def monitor(mon, obs, hits, i, T, x, y, z):
+
+    """ after observe() at tick i: convergence, recording; True once the recording is done (mon[MON_STOP_TICK] set) """
+
+    if mon[MON_RECORDING] == 1:
+
+        if mon[MON_REASON] == STOP_PERIODIC:
+            done = obs[OBS_HITS] >= mon[MON_TARGET]
+        else:
+            done = obs[OBS_SAMPLES] >= mon[MON_TARGET]
+
+        if done:
+            mon[MON_STOP_TICK] = i
+
+        return done
+
+    tol = mon[MON_TOL]
+    window = int(mon[MON_WINDOW])
+
+    # fixed point: the state stays near where it settled, longer than any silence seen
+    moved = ((abs(x - mon[MON_ANCHOR]) > tol * (obs[OBS_MAX] - obs[OBS_MIN]))
+             or (abs(y - mon[MON_ANCHOR+1]) > tol * (obs[OBS_MAX+1] - obs[OBS_MIN+1]))
+             or (abs(z - mon[MON_ANCHOR+2]) > tol * (obs[OBS_MAX+2] - obs[OBS_MIN+2])))
+
+    if obs[OBS_SAMPLES] == 1:
+        mon[MON_START_T] = T
+
+    if moved or obs[OBS_SAMPLES] == 1:
+        mon[MON_ANCHOR], mon[MON_ANCHOR+1], mon[MON_ANCHOR+2] = x, y, z
+        mon[MON_STILL] = 0
+        mon[MON_ANCHOR_T] = T
+    else:
+        mon[MON_STILL] += 1
+
+    reason = STOP_END
+    period = 0
+
+    # still for longer than a silence between bursts (twice the longest ISI so far)
+    # and than it took to settle there (a slow drift is not a fixed point)
+    silence = max(2 * obs[OBS_ISI_MAX] if obs[OBS_ISI_N] > 0 else 0.0, mon[MON_ANCHOR_T] - mon[MON_START_T])
+
+    if (mon[MON_STILL] >= window) and (T - mon[MON_ANCHOR_T] >= silence):
+        reason = STOP_FIXED
+
+    # periodic: the last window hits each equal the one k before, checked once per new hit
+    n_hits = int(obs[OBS_HITS])
+    cap = hits.shape[0]
+
+    if reason == STOP_END and n_hits > mon[MON_SEEN_HITS]:
+
+        mon[MON_SEEN_HITS] = n_hits
+
+        n = min(n_hits, cap)
+
+        for k in range(1, int(mon[MON_MAX_PERIOD]) + 1):
+
+            if n < window + k:
+                break
+
+            same = True
+
+            # against the same phase one period before the window: a slow drift adds up over it
+            g0 = n_hits - window - k
+
+            for g in range(n_hits - window, n_hits):
+
+                ref = g0 + (g - g0) % k
+
+                for v in range(3):
+                    if abs(hits[g % cap, v] - hits[ref % cap, v]) > tol * (obs[OBS_MAX + v] - obs[OBS_MIN + v]):
+                        same = False
+                        break
+
+                if not same:
+                    break
+
+            if same:
+                reason = STOP_PERIODIC
+                period = k
+                break
+
+    if reason == STOP_END:
+        return False
+
+    # converged: the transient is dropped, the attractor recorded from here
+    mon[MON_REASON] = reason
+    mon[MON_CONV_TICK] = i
+    mon[MON_RECORDING] = 1
+
+    reset_observation(obs, hits)
+
+    mon[MON_TARGET] = mon[MON_RECORD] * period + 1 if reason == STOP_PERIODIC else window
+
+    return False
+
+
+@njit(cache=True)
+def reset_observation(obs, hits):
+
+    """ obs, hits as new_observation() left them """
+
+    burst_ratio = obs[OBS_BURST_RATIO]
+
+    obs[:] = 0.0
+    obs[OBS_BURST_RATIO] = burst_ratio
+
+    for v in range(3):
+        obs[OBS_MIN + v] = np.inf
+        obs[OBS_MAX + v] = -np.inf
+
+    obs[OBS_ISI_MIN] = np.inf
+    obs[OBS_ISI_MAX] = -np.inf
+
+    hits[:] = 0.0
+
+
+@njit(cache=True)
+def observe_block(obs, hits, mon, block, i_first, decimation, spike_th, sec_var, sec_level):
+
+    """
+    observe() and monitor() over the rows of a history chunk
+
+        mon: None: observe() only
+        block: (rows, 4) t, x, y, z in model units, row k observed at tick i_first + k * decimation
+
+    Return:
+        rows up to the one monitor() stopped on (all of them if it did not), stopped
+    """
+
+    for row in range(block.shape[0]):
+
+        T, x, y, z = block[row, 0], block[row, 1], block[row, 2], block[row, 3]
+
+        observe(obs, hits, T, x, y, z, spike_th, sec_var, sec_level)
+
+        if mon is not None:
+
+            if monitor(mon, obs, hits, i_first + row * decimation, T, x, y, z):
+                return row + 1, True
+
+    return block.shape[0], False
+
+
+def stop_report(mon, h):
+
+    """
+    mon -> dict (empty for None)
+        stop_reason  STOP_NAMES, "... (eT)": converged, eT reached while recording
+        conv_T, stop_T  ticks * h from the start of the run (units of sT, eT), nan: not converged / ran to eT
+        stop_tick  -1: ran to eT
+    """
+
+    if mon is None:
+        return {}
+
+    reason = int(mon[MON_REASON])
+    converged = mon[MON_RECORDING] == 1
+    stopped = mon[MON_STOP_TICK] >= 0
+
+    return {"stop_reason": STOP_NAMES[reason] if stopped else (STOP_NAMES[reason] + " (eT)" if converged else STOP_NAMES[STOP_END]),
+            "conv_T": mon[MON_CONV_TICK] * h if converged else np.nan,
+            "stop_T": mon[MON_STOP_TICK] * h if stopped else np.nan,
+            "stop_tick": int(mon[MON_STOP_TICK])}
+
+
+@njit(cache=True)
+def skip_periods(obs, hits, obs_period, m, dT):
+
+    """
+    Account for m more periods identical to the last one, without observing them
+
+        obs_period: copy of obs taken one period earlier (the increments of one period are
+                    obs - obs_period), dT: time spanned by the skipped periods.
+        The ring buffer is rewritten as if the hits of the period had been recorded m more
+        times, so one period's hits must fit into it.
+    """
+
+    n_hits = int(obs[OBS_HITS])
+    hits_first = int(obs_period[OBS_HITS])
+    dh = n_hits - hits_first
+    cap = hits.shape[0]
+
+    # counters
+    for slot in (OBS_SAMPLES, OBS_SPIKES, OBS_ISI_N, OBS_ISI_SUM, OBS_ISI_SQ, OBS_HITS, OBS_BURSTS):
+        obs[slot] += m * (obs[slot] - obs_period[slot])
+
+    # the next interval starts from the last spike of the skipped periods
+    obs[OBS_LAST_SPIKE] += dT
+
+    # ring buffer: hit g repeats hit hits_first + (g - hits_first) % dh
+    if dh > 0:
+
+        ring = hits.copy()
+        n_new = int(obs[OBS_HITS])
+
+        for g in range(max(n_new - cap, n_hits), n_new):
+            src = hits_first + (g - hits_first) % dh
+            hits[g % cap] = ring[src % cap]
+
+
+def summarize(obs, hits):
+
+    """ obs, hits -> dict (hits in chronological order, at most len(hits) of them) """
+
+    n_isi = obs[OBS_ISI_N]
+    n_hits = int(obs[OBS_HITS])
+
+    if n_isi > 0:
+        isi_mean = obs[OBS_ISI_SUM] / n_isi
+        isi_std = np.sqrt(max(obs[OBS_ISI_SQ] / n_isi - isi_mean**2, 0.0))
+        isi_min, isi_max = obs[OBS_ISI_MIN], obs[OBS_ISI_MAX]
+    else:
+        isi_mean = isi_std = isi_min = isi_max = np.nan
+
+    # ring buffer -> oldest first
+    cap = hits.shape[0]
+    if n_hits <= cap:
+        section = hits[:n_hits].copy()
+    else:
+        section = np.roll(hits, -(n_hits % cap), axis=0)
+
+    return {"samples": int(obs[OBS_SAMPLES]),
+            "min": obs[OBS_MIN:OBS_MIN+3].copy(),
+            "max": obs[OBS_MAX:OBS_MAX+3].copy(),
+            "spikes": int(obs[OBS_SPIKES]),
+            "bursts": int(obs[OBS_BURSTS]),
+            "isi_mean": isi_mean,
+            "isi_std": isi_std,
+            "isi_min": isi_min,
+            "isi_max": isi_max,
+            "hits": n_hits,
+            "section": section}
+
+
+@njit(cache=True)
+def section_period(obs, hits, max_period, tol):
+
+    """ smallest period k <= max_period of the kept Poincare hits, 0 if none (fewer than 2k hits: none) """
+
+    n_hits = int(obs[OBS_HITS])
+    cap = hits.shape[0]
+    n = min(n_hits, cap)
+
+    # tolerance per variable, relative to the range of the trajectory
+    eps = np.empty(3)
+    for v in range(3):
+        eps[v] = tol * (obs[OBS_MAX + v] - obs[OBS_MIN + v])
+
+    for k in range(1, max_period + 1):
+
+        if n < 2 * k:
+            break
+
+        same = True
+
+        for g in range(n_hits - n + k, n_hits):
+
+            for v in range(3):
+                if abs(hits[g % cap, v] - hits[(g - k) % cap, v]) > eps[v]:
+                    same = False
+                    break
+
+            if not same:
+                break
+
+        if same:
+            return k
+
+    return 0
+
+
+@njit(cache=True)
+def classify(obs, hits, max_period, tol, burst_ratio):
+
+    """ attractor class of one trajectory (BASIN_*) """
+
+    if obs[OBS_SPIKES] < 2:
+        return BASIN_QUIESCENT
+
+    k = section_period(obs, hits, max_period, tol)
+
+    if k == 1:
+        return BASIN_TONIC
+
+    if k > 1:
+        return BASIN_PERIOD + k
+
+    if obs[OBS_ISI_MAX] > burst_ratio * obs[OBS_ISI_MIN]:
+        return BASIN_BURSTING
+
+    return BASIN_TONIC
+
+
+@njit(parallel=True, cache=True)
+def classify_batch(obs, hits, labels, max_period, tol, burst_ratio):
+
+    """ classify() of every row of obs, hits into labels (int8) """
+
+    for cond in prange(obs.shape[0]):
+        labels[cond] = classify(obs[cond], hits[cond], max_period, tol, burst_ratio)
+
+
+def basin_legend(max_period):
+
+    """ label -> name of the attractor classes """
+
+    if not 1 <= max_period <= 127 - BASIN_PERIOD:
+        raise ValueError(f"basin_max_period {max_period}: 1 .. {127 - BASIN_PERIOD} (int8 labels)")
+
+    legend = {BASIN_QUIESCENT: "quiescent",
+              BASIN_TONIC: "tonic",
+              BASIN_BURSTING: "bursting"}
+
+    for k in range(2, max_period + 1):
+        legend[BASIN_PERIOD + k] = f"period-{k}"
+
+    return legend
+
+
+def save_basin(filename, labels, legend):
+
+    """ labels -> .npy next to filename (DataLibrarian.save_path), legend and count per class -> filename (csv) """
+
+    import pandas as pd
+
+    np.save(os.path.splitext(filename)[0] + ".npy", labels)
+
+    counts = np.bincount(labels.ravel().astype(np.int64), minlength=max(legend) + 1)
+    df = pd.DataFrame({"label": list(legend),
+                       "name": list(legend.values()),
+                       "count": [int(counts[label]) for label in legend]})
+
+    try:
+        df.to_csv(filename, index=False)
+        print(f"Results saved to {filename}")
+    except Exception as e:
+        print(f"Error saving results to {filename}: {e}")
+
+
+def load_basin(filename):
+
+    """ labels (memory-mapped), legend of save_basin() """
+
+    import pandas as pd
+
+    labels = np.load(os.path.splitext(filename)[0] + ".npy", mmap_mode="r")
+    df = pd.read_csv(filename)
+
+    return labels, dict(zip(df["label"].tolist(), df["name"].tolist()))
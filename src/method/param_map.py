@@ -0,0 +1,511 @@
+# -*- coding: utf-8 -*-
+"""
+Created on: 2026-03-23
+
+@author: shirafujilab
+
+Contents: "parameter map", codimension-2 map of a single HR neuron (esl or ode)
+
+    ParamMap2D(params, filename).run():
+
+        axes: map_x (map_x_start .. map_x_end, map_x_num points) x map_y (same keys), two of
+              MAP_PARAMS; the other parameters and the initial state from params
+        per cell: one trajectory, observables after sT -> FIELDS (cell_fields)
+            esl: calc_reduction_eca of eca_basic, the LUT rebuilt per value of a .. s,
+                 Fin refilled per I_ext (as BifECA)
+            ode: calc_reduction_ode of ode_basic (forward Euler), prange over the cells of a tile
+
+        tiles: map_tile x map_tile cells, the work units of a process pool of map_workers
+               processes (0: num_threads), num_threads shared among them.
+               A finished tile is saved under data/results/checkpoints/<result_key>/: a map of
+               the same parameters (result_memo.result_key) starts from the tiles found there,
+               so an interrupted map resumes where it stopped. Removed once the map is assembled.
+
+        auto_stop: every cell stops once its attractor is recorded (observables.monitor)
+
+        adaptive: per tile, only the cells near the boundaries of the classes / of x min, max are
+                  run, the rest filled from them (adaptive_grid.refine, adaptive_coarse, adaptive_tol)
+
+        g_s (esl only): g_s couples neurons, a map with a g_s axis runs the 9-neuron network of
+             eca_net per cell (as BifEcaNetwork, y, z recorded too), the cell fields are those of
+             neuron map_neuron; chunks of chunk_step ticks, observed with observables.observe_block
+
+    FIELDS per cell:
+        label               attractor class (observables.classify)
+        period              period on the Poincare section (0: none up to basin_max_period)
+        spikes_per_burst    spikes / bursts over the observed window, a burst starting at every ISI
+                            longer than burst_ratio * the shortest one before it (observables.observe,
+                            the test of classify); 1 without such an ISI (tonic), nan below 2 spikes
+        spikes, isi_mean, isi_std, isi_cv, x_min, x_max
+
+Return:
+
+    DataFrame, csv at DataLibrarian.save_path: map_x value, map_y value, FIELDS per cell
+    fields (map_y_num, map_x_num, len(FIELDS)) .npy next to it
+
+"""
+
+# import standard library
+import numpy as np
+import os
+import shutil
+import multiprocessing as mp
+
+from numba import njit, prange
+
+import datetime, time
+
+# import my library
+from src.method.eca.eca_basic import _make_lut_compact, _update_fin, calc_reduction_eca, _clock, _cycle_detect, _initial_state
+from src.method.eca.phase_clock import initial_phase
+from src.method.eca.eca_net import (INIT_X, C_IJ, TH, M_I, coupling_to_csr,
+                                    _network_state, _network_steps_parallel, _network_steps_serial)
+from src.method.euler.ode_basic import calc_reduction_ode
+from src.method.observables import (new_observation, new_monitor, classify_batch, section_period, observe_block,
+                                    OBS_MIN, OBS_MAX, OBS_SPIKES, OBS_ISI_N, OBS_ISI_SUM, OBS_ISI_SQ, OBS_BURSTS)
+from src.method.adaptive_grid import refine
+from src.utils.history_writer import history_path, chunk_ranges, chunk_rows
+
+
+# parameters a map can sweep
+MAP_PARAMS = ("I_ext", "a", "b", "c", "d", "r", "s", "g_s")
+
+FIELDS = ("label", "period", "spikes_per_burst", "spikes", "isi_mean", "isi_std", "isi_cv", "x_min", "x_max")
+
+# s between two checks for cancel while the tiles run
+POLL_INTERVAL = 0.2
+
+
+class ParamMap2D:
+
+    def __init__(self, params, filename):
+
+        # get params
+        self.params = params
+
+        self.filename = filename
+        print(self.filename)
+
+        # None or progress(done, total), called while the tiles run (method_selects.run_method)
+        self.progress = None
+
+        # Ensure output directory exists
+        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+
+
+    def run(self):
+
+        """ Initialization """
+
+        # get params
+        params = self.params
+
+        if params["model"] not in ["esl", "ode"]:
+            raise ValueError(f"model {params['model']!r}: esl, ode")
+
+        if params["model"] == "ode" and params.get("ode_method", "euler") != "euler":
+            raise ValueError(f"ode_method {params['ode_method']!r}: parameter map is forward Euler only")
+
+        (x_name, x_values), (y_name, y_values) = map_axes(params)
+
+        if params["model"] == "ode" and "g_s" in (x_name, y_name):
+            raise ValueError("map g_s: the network (eca_net) is esl only")
+
+        # tiles: (row slice, column slice)
+        side = max(int(params.get("map_tile", 16)), 1)
+        tiles = [(slice(i, min(i + side, y_values.size)), slice(j, min(j + side, x_values.size)))
+                 for i in range(0, y_values.size, side) for j in range(0, x_values.size, side)]
+
+        # checkpoints of this parameter set
+        from src.method.result_memo import result_key
+        from src.utils.data_librarian import results_root
+
+        check_dir = os.path.join(results_root(), "checkpoints", result_key(params))
+        os.makedirs(check_dir, exist_ok=True)
+
+        def tile_path(rs, cs):
+            return os.path.join(check_dir, f"tile_{rs.start:05d}_{cs.start:05d}.npy")
+
+        tasks = [(params, (x_name, x_values[cs]), (y_name, y_values[rs]), tile_path(rs, cs))
+                 for rs, cs in tiles if not os.path.exists(tile_path(rs, cs))]
+
+        total = x_values.size * y_values.size
+        done = total - sum(task[1][1].size * task[2][1].size for task in tasks)
+
+        print("cells: ", total, " tiles: ", len(tiles), " resumed: ", len(tiles) - len(tasks))
+
+        # processes, numba threads per process
+        num_threads = int(params.get("num_threads", 15))
+        workers = max(min(int(params.get("map_workers", 0)) or num_threads, len(tasks)), 1)
+        threads = max(num_threads // workers, 1)
+
+
+        """ run simulation """
+        bench_sT = datetime.datetime.now()
+        t0 = time.perf_counter()
+        print("\n start: ", bench_sT)
+
+        if tasks:
+
+            # spawn: no fork of a process holding numba threads; leaving the block terminates the pool
+            with mp.get_context("spawn").Pool(workers, initializer=_init_worker, initargs=(threads,)) as pool:
+
+                results = pool.imap_unordered(_run_tile, tasks)
+
+                for _ in tasks:
+
+                    # cancel is checked while a tile runs, not only when one is done
+                    while True:
+                        try:
+                            n_cells, n_run = results.next(timeout=POLL_INTERVAL)
+                            break
+                        except mp.TimeoutError:
+                            if self.progress is not None:
+                                self.progress(done, total)
+
+                    done += n_cells
+
+                    print("proccess: -*-*-*-*- ", round((done / total*100),  2), "% -*-*-*-*- ", "(run", n_run, "of", n_cells, ")")
+
+                    if self.progress is not None:
+                        self.progress(done, total)
+
+        bench_eT = datetime.datetime.now()
+        t1 = time.perf_counter()
+        print("end: ", bench_eT)
+        print("bench mark: ", t1 - t0)
+
+
+        """ Store results """
+
+        fields = np.empty((y_values.size, x_values.size, len(FIELDS)))
+        for rs, cs in tiles:
+            fields[rs, cs] = np.load(tile_path(rs, cs))
+
+        np.save(history_path(self.filename), fields)
+
+        import pandas as pd
+
+        yy, xx = np.meshgrid(y_values, x_values, indexing="ij")
+        self.df = pd.DataFrame({x_name: xx.ravel(), y_name: yy.ravel()})
+
+        for idx, name in enumerate(FIELDS):
+            self.df[name] = fields[..., idx].ravel()
+
+        self.df["label"] = self.df["label"].astype(np.int8)
+        self.df["period"] = self.df["period"].astype(np.int64)
+        self.df["spikes"] = self.df["spikes"].astype(np.int64)
+
+        try:
+            self.df.to_csv(self.filename, index=False)
+            print(f"Results saved to {self.filename}")
+        except Exception as e:
+            print(f"Error saving results to {self.filename}: {e}")
+
+        # assembled: the checkpoints are not needed any more
+        shutil.rmtree(check_dir, ignore_errors=True)
+
+        return self.df
+
+
+def map_axes(params):
+
+    """ (name, values) of map_x and map_y """
+
+    axes = []
+
+    for axis, default in (("x", "I_ext"), ("y", "r")):
+
+        name = params.get(f"map_{axis}", default)
+
+        if name not in MAP_PARAMS:
+            raise ValueError(f"map_{axis} {name!r}: {', '.join(MAP_PARAMS)}")
+
+        values = np.linspace(params[f"map_{axis}_start"], params[f"map_{axis}_end"], int(params[f"map_{axis}_num"]))
+        axes.append((name, values))
+
+    if axes[0][0] == axes[1][0]:
+        raise ValueError(f"map_x and map_y are both {axes[0][0]!r}")
+
+    return axes
+
+
+def cell_fields(obs, hits, max_period, tol, burst_ratio):
+
+    """ observables of n trajectories -> (n, len(FIELDS)) """
+
+    n = obs.shape[0]
+
+    labels = np.empty(n, dtype=np.int8)
+    classify_batch(obs, hits, labels, max_period, tol, burst_ratio)
+
+    period = np.array([section_period(obs[cond], hits[cond], max_period, tol) for cond in range(n)], dtype=np.int64)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        isi_n = obs[:, OBS_ISI_N]
+        isi_mean = obs[:, OBS_ISI_SUM] / isi_n
+        isi_std = np.sqrt(np.maximum(obs[:, OBS_ISI_SQ] / isi_n - isi_mean**2, 0.0))
+        isi_cv = isi_std / isi_mean
+
+        # no long ISI: every spike on its own
+        spikes, bursts = obs[:, OBS_SPIKES], obs[:, OBS_BURSTS]
+        spikes_per_burst = np.where(spikes < 2, np.nan, np.where(bursts > 0, spikes / bursts, 1.0))
+
+    return np.column_stack((labels, period, spikes_per_burst,
+                            obs[:, OBS_SPIKES], isi_mean, isi_std, isi_cv,
+                            obs[:, OBS_MIN], obs[:, OBS_MAX]))
+
+
+def _model_values(params, names, columns):
+
+    """ a, b, c, d, r, s, I_ext (float32) and x_1 per cell: params, names[k] replaced by columns[k] (not g_s) """
+
+    n = columns[0].size
+
+    prm = np.empty((n, 7), dtype=np.float32)
+    for idx, key in enumerate(("a", "b", "c", "d", "r", "s", "I_ext")):
+        prm[:, idx] = params[key]
+
+    for name, column in zip(names, columns):
+
+        # g_s: a network parameter (_cells_network)
+        if name == "g_s":
+            continue
+
+        prm[:, ("a", "b", "c", "d", "r", "s", "I_ext").index(name)] = column
+
+    # x_1 per cell
+    x_1 = np.empty(n)
+    for cond in range(n):
+        a, b, c, d = prm[cond, :4]
+        x_1[cond] = np.roots([1, (d - b) / a, 0, -c / a])[0]    # x^3 + p x^2 - q = 0
+
+    return prm, x_1
+
+
+def _init_worker(threads):
+
+    """ pool process: numba threads of its share """
+
+    import numba
+
+    numba.set_num_threads(min(threads, numba.config.NUMBA_NUM_THREADS))
+
+
+def _run_tile(task):
+
+    """ one tile (pool process): FIELDS of its cells -> checkpoint .npy, returns (cells, cells run) """
+
+    params, (x_name, x_values), (y_name, y_values), path = task
+
+    ny, nx = y_values.size, x_values.size
+    fields = np.full((ny, nx, len(FIELDS)), np.nan)
+
+    max_period = int(params.get("basin_max_period", 8))
+    tol, burst_ratio = params.get("basin_tol", 0.01), params.get("burst_ratio", 3.0)
+
+    run_cells = _cells_eca if params["model"] == "esl" else _cells_ode
+
+    def evaluate(ii, jj):
+
+        names, columns = (x_name, y_name), (x_values[jj], y_values[ii])
+
+        prm, x_1 = _model_values(params, names, columns)
+
+        if "g_s" in names:
+            obs, hits = _cells_network(params, prm, x_1, columns[names.index("g_s")])
+        else:
+            obs, hits = run_cells(params, prm, x_1)
+
+        out = cell_fields(obs, hits, max_period, tol, burst_ratio)
+        fields[ii, jj] = out
+
+        return out[:, 0], out[:, [7, 8]]
+
+    if params.get("adaptive", False):
+        _, _, source = refine((ny, nx), evaluate, params.get("adaptive_coarse", 8), params.get("adaptive_tol", 0.05))
+        fields = fields.reshape(ny * nx, -1)[source.ravel()].reshape(ny, nx, -1)
+        n_run = np.unique(source).size
+    else:
+        ii, jj = np.indices((ny, nx))
+        evaluate(ii.ravel(), jj.ravel())
+        n_run = ny * nx
+
+    # write then rename: a tile on disk is complete
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, fields)
+    os.replace(tmp_path, path)
+
+    return ny * nx, n_run
+
+
+def _cells_eca(params, prm, x_1):
+
+    """ calc_reduction_eca per cell, the LUT components rebuilt when a .. s change """
+
+    N1, N2, N3, M, s1, s2, s3 = params["N1"], params["N2"], params["N3"], params["M"], params["s1"], params["s2"], params["s3"]
+    Tc, Tx, Wx, Ty, Wy, Tz, Wz = params["Tc"], params["Tx"], params["Wx"], params["Ty"], params["Wy"], params["Tz"], params["Wz"]
+
+    # time
+    total_step = int(params["eT"]/np.float32(params["h"]))+1
+    index_start = int(params["sT"]/np.float32(params["h"]))
+    decimation = params.get("decimation", 100)
+
+    clk = _clock(params)
+    cycle_detect = _cycle_detect(params, clk, total_step - index_start, decimation)
+
+    n = prm.shape[0]
+    obs, hits = new_observation(params.get("max_hits", 256), n, params.get("burst_ratio", 3.0))
+    mon = new_monitor(params, n)
+
+    Fin = np.empty((N1, N2, N3), dtype=np.int16)
+    key, parts = None, None
+
+    for cond in range(n):
+
+        a, b, c, d, r, s, I_ext = prm[cond]
+
+        if key != (a, b, c, d, r, s):
+            key = (a, b, c, d, r, s)
+            parts = _make_lut_compact(N1, N2, N3, M, s1, s2, s3, Tx, Wx, Ty, Wy, Tz, Wz,
+                                      a, b, c, d, r, s, x_1[cond])
+
+        ax3, bx2, yv, zv, Gin, Hin = parts
+        _update_fin(Fin, ax3, bx2, yv, zv, I_ext, M, Wx/Tx)
+
+        reg, ph = _initial_state(params, clk)
+
+        calc_reduction_eca(reg, ph, M, N1, N2, N3, Fin, Gin, Hin,
+                           Tc, clk, s1, s2, s3,
+                           0, total_step, index_start, decimation,
+                           params.get("spike_th", 0.0), params.get("poincare_var", 0), params.get("poincare_level", 1.0),
+                           obs[cond], hits[cond], cycle_detect,
+                           None if mon is None else mon[cond])
+
+    return obs, hits
+
+
+def _cells_network(params, prm, x_1, g_s):
+
+    """ the eca_net network per cell (g_s axis), observables of neuron map_neuron """
+
+    N1, N2, N3, M, s1, s2, s3 = params["N1"], params["N2"], params["N3"], params["M"], params["s1"], params["s2"], params["s3"]
+    Tc, Tx, Wx, Ty, Wy, Tz, Wz = params["Tc"], params["Tx"], params["Wx"], params["Ty"], params["Wy"], params["Tz"], params["Wz"]
+
+    # network (as BifEcaNetwork)
+    init_X = INIT_X
+    init_YZ = np.zeros_like(init_X)
+    n_net = init_X.size
+
+    neuron = int(params.get("map_neuron", 0))
+    if not 0 <= neuron < n_net:
+        raise ValueError(f"map_neuron {neuron}: 0 .. {n_net - 1}")
+
+    clk = _clock(params)
+    init_ph = np.full(init_X.shape, initial_phase(0.0, clk))
+
+    V_s = np.float32(params["V_s"])
+    out_indptr, out_indices, out_weights = coupling_to_csr(C_IJ)
+
+    kernel = _network_steps_parallel if n_net >= params.get("parallel_min_neurons", 2048) else _network_steps_serial
+
+    # time
+    total_step = int(params["eT"]/np.float32(params["h"]))+1
+    index_start = int(params["sT"]/np.float32(params["h"]))
+    decimation = params.get("decimation", 100)
+
+    spike_th, sec_var, sec_level = params.get("spike_th", 0.0), params.get("poincare_var", 0), params.get("poincare_level", 1.0)
+
+    n = prm.shape[0]
+    obs, hits = new_observation(params.get("max_hits", 256), n, params.get("burst_ratio", 3.0))
+    mon = new_monitor(params, n)
+
+    Fin = np.empty((N1, N2, N3), dtype=np.int16)
+    key, parts = None, None
+
+    for cond in range(n):
+
+        a, b, c, d, r, s, I_ext = prm[cond]
+
+        if key != (a, b, c, d, r, s):
+            key = (a, b, c, d, r, s)
+            parts = _make_lut_compact(N1, N2, N3, M, s1, s2, s3, Tx, Wx, Ty, Wy, Tz, Wz,
+                                      a, b, c, d, r, s, x_1[cond])
+
+        ax3, bx2, yv, zv, Gin, Hin = parts
+        _update_fin(Fin, ax3, bx2, yv, zv, I_ext, M, Wx/Tx)
+
+        state = _network_state(init_X, init_YZ, init_YZ, init_YZ, init_YZ, init_YZ,
+                               init_ph, init_ph, init_ph,
+                               TH, out_indptr, out_indices, out_weights)
+        cur, T = 0, 0.0
+
+        for i_begin, i_end in chunk_ranges(total_step, params.get("chunk_step", 10**6)):
+
+            k_begin, n_rows = chunk_rows(i_begin, i_end, index_start, decimation)
+            t_block = np.zeros(n_rows)
+            x_block, y_block, z_block = (np.zeros((n_net, n_rows), dtype=np.int16) for _ in range(3))
+
+            cur, T = kernel(*state, cur, T,
+                            M, N1, N2, N3, Fin, Gin, Hin,
+                            Tc, Tx, Wx, clk,
+                            M_I, s1, np.float32(g_s[cond]), V_s, TH, out_indptr, out_indices, out_weights,
+                            i_begin, i_end, index_start, k_begin, t_block, x_block, decimation, y_block, z_block)
+
+            # scaling to ode
+            block = np.column_stack((t_block, x_block[neuron]/s1 - 2, y_block[neuron]/s2 - 12, z_block[neuron]/s3))
+
+            _, stopped = observe_block(obs[cond], hits[cond], None if mon is None else mon[cond],
+                                       block, index_start + k_begin * decimation, decimation,
+                                       spike_th, sec_var, sec_level)
+
+            if stopped:
+                break
+
+    return obs, hits
+
+
+def _cells_ode(params, prm, x_1):
+
+    """ calc_reduction_ode per cell, prange over the cells """
+
+    h = np.float32(params["h"])
+
+    # time
+    total_step = int(params["eT"]/h)+1
+    index_start = int(params["sT"]/h)
+    decimation = params.get("decimation", 100)
+
+    n = prm.shape[0]
+    obs, hits = new_observation(params.get("max_hits", 256), n, params.get("burst_ratio", 3.0))
+
+    # x, y, z, T per cell
+    v = np.zeros((n, 4))
+    v[:, 0], v[:, 1], v[:, 2] = np.float32(params["init_x"]), np.float32(params["init_y"]), np.float32(params["init_z"])
+
+    calc_map_ode(v, h, prm, x_1, total_step, index_start, decimation,
+                 params.get("spike_th", 0.0), params.get("poincare_var", 0), params.get("poincare_level", 1.0),
+                 obs, hits, new_monitor(params, n))
+
+    return obs, hits
+
+
+@njit(parallel=True, cache=True)
+def calc_map_ode(v, h, prm, x_1, total_step, index_start, decimation,
+                 spike_th, sec_var, sec_level, obs, hits, mon=None):
+
+    """ calc_reduction_ode for every cell (row of v, prm: a, b, c, d, r, s, I_ext, x_1, obs, hits, mon) """
+
+    for cond in prange(v.shape[0]):
+
+        if mon is None:
+            calc_reduction_ode(v[cond], h, prm[cond, 0], prm[cond, 1], prm[cond, 2], prm[cond, 3], prm[cond, 4], prm[cond, 5],
+                               x_1[cond], prm[cond, 6],
+                               0, total_step, index_start, decimation,
+                               spike_th, sec_var, sec_level, obs[cond], hits[cond])
+        else:
+            calc_reduction_ode(v[cond], h, prm[cond, 0], prm[cond, 1], prm[cond, 2], prm[cond, 3], prm[cond, 4], prm[cond, 5],
+                               x_1[cond], prm[cond, 6],
+                               0, total_step, index_start, decimation,
+                               spike_th, sec_var, sec_level, obs[cond], hits[cond], mon[cond])
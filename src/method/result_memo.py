@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""
+Created on: 2026-03-19
+
+@author: shirafujilab
+
+Contents:
+
+    Memoized results: a run whose complete parameter set was already computed is loaded, not run
+
+        result_key(params): sha256 of model, simulation, every param except EXEC_KEYS and
+                            code_version() (digest of the sources of src/method)
+        remember():         after a run, the result file and its key into the run catalogue
+                            (single / network: .npy of DataLibrarian.save_path, columns t, x, ...;
+                             the stream history is that file already; batch: t, x..., y..., z...
+                             of every trajectory. bifurcation: the csv,
+                             basin: the labels .npy of observables.save_basin)
+        load_result():      the newest stored result of the key, memory-mapped
+        evict():            least recently used results removed above cache_quota_gb
+
+        force_rerun (params) runs again and stores the new result.
+
+Usage:
+
+    done = None if params.get("force_rerun", False) else load_result(params)
+    if done is None:
+        ... result = runner.run() ...
+        remember(params, file_name, kind, result)
+
+"""
+
+# import standard library
+import os
+import glob
+import json
+import hashlib
+
+import numpy as np
+
+# import my library
+from src.utils.data_librarian import results_root
+from src.utils.run_catalogue import RunCatalogue, db_path
+from src.utils.history_writer import history_path
+
+
+# params that change how a run is executed, not its result
+#   stream: same samples as the plain kernels (ODE: up to their float32 rounding)
+EXEC_KEYS = ["num_threads", "chunk_step", "parallel_min_neurons", "stream",
+             "force_rerun", "memoize", "cache_quota_gb", "basin_tile", "map_workers"]
+
+_code_version = None
+
+
+def code_version():
+
+    """ digest of src/method/**/*.py: a changed kernel does not reuse older results """
+
+    global _code_version
+
+    if _code_version is None:
+
+        method_dir = os.path.dirname(os.path.abspath(__file__))
+        digest = hashlib.sha256()
+
+        for path in sorted(glob.glob(os.path.join(method_dir, "**", "*.py"), recursive=True)):
+            digest.update(os.path.relpath(path, method_dir).encode())
+            with open(path, "rb") as f:
+                digest.update(f.read())
+
+        _code_version = digest.hexdigest()
+
+    return _code_version
+
+
+def _json_default(value):
+
+    # numpy scalars and arrays of params
+    if hasattr(value, "tolist"):
+        return value.tolist()
+
+    return str(value)
+
+
+def result_key(params):
+
+    payload = {"model": params["model"],
+               "simulation": params["simulation"],
+               "code": code_version(),
+               "params": {key: value for key, value in params.items() if key not in EXEC_KEYS}}
+
+    text = json.dumps(payload, sort_keys=True, default=_json_default)
+
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def remember(params, file_name, kind, result):
+
+    """ store the result of the run saved at file_name (registered by DataLibrarian) """
+
+    try:
+        if kind == "single":
+            result_path = history_path(file_name)
+            t_hist, _, x_hist, y_hist, z_hist = result
+
+            # stream: the arrays are views of that file
+            if not isinstance(t_hist, np.memmap):
+                np.save(result_path, np.column_stack((t_hist, x_hist, y_hist, z_hist)))
+
+        elif kind == "batch":
+            result_path = history_path(file_name)
+            t_hist, _, x_hist, y_hist, z_hist = result
+
+            # columns t, x of every trajectory, then y, then z
+            np.save(result_path, np.column_stack((t_hist, x_hist.T, y_hist.T, z_hist.T)))
+
+        elif kind == "network":
+            result_path = history_path(file_name)
+            t_hist, x_hist = result
+
+            if not isinstance(t_hist, np.memmap):
+                np.save(result_path, np.column_stack((t_hist, np.asarray(x_hist).T)))
+
+        elif kind == "bifurcation":
+            result_path = file_name
+
+        elif kind == "basin":
+            result_path = history_path(file_name)
+
+        else:
+            return
+
+        if kind == "bifurcation":
+            rows = len(result)
+        elif kind == "basin":
+            rows = len(result[2])
+        else:
+            rows = len(result[0])
+
+        with RunCatalogue(db_path(results_root())) as cat:
+            stored = cat.set_result(file_name, result_key(params), kind, result_path, rows, os.path.getsize(result_path))
+
+        if stored:
+            evict(params.get("cache_quota_gb", 20) * 2**30)
+
+    except Exception as e:
+        print(f"Error storing the result of {file_name}: {e}")
+
+
+def load_result(params):
+
+    """ (kind, runner, result) as method_selects.run_method (runner None for time evolution), None if not stored """
+
+    key = result_key(params)
+
+    with RunCatalogue(db_path(results_root())) as cat:
+
+        for row in cat.find_result(key):
+
+            # removed by hand
+            if not os.path.exists(row["result_path"]):
+                cat.clear_result(row["no"])
+                continue
+
+            cat.touch(row["no"])
+            print("stored result: no.", row["no"], row["result_path"])
+
+            return _load(params, row["kind"], row["result_path"], row["result_rows"])
+
+    return None
+
+
+def _load(params, kind, result_path, rows):
+
+    if kind == "bifurcation":
+
+        import pandas as pd
+        from src.method.method_selects import REGISTRY, load_runner
+
+        # a runner holding the stored DataFrame, as after run()
+        runner = load_runner(REGISTRY[(params["model"], params["simulation"])][0])(params, result_path)
+        runner.df = pd.read_csv(result_path)
+
+        return kind, runner, runner.df
+
+    if kind == "basin":
+
+        from src.method.method_selects import REGISTRY, load_runner
+        from src.method.observables import load_basin
+
+        # axes from the params, labels and legend from the files of save_basin
+        runner = load_runner(REGISTRY[(params["model"], params["simulation"])][0])(params, result_path)
+        labels, legend = load_basin(os.path.splitext(result_path)[0] + ".csv")
+
+        return kind, runner, (*runner.axes(), labels, legend)
+
+    hist = np.load(result_path, mmap_mode="r")[:rows]
+
+    if kind == "single":
+        return kind, None, (hist[:, 0], np.broadcast_to(np.float32(params["I_ext"]), hist.shape[:1]),
+                            hist[:, 1], hist[:, 2], hist[:, 3])
+
+    if kind == "batch":
+        x_hist, y_hist, z_hist = np.split(hist[:, 1:].T, 3)
+        return kind, None, (hist[:, 0], np.full(x_hist.shape[0], np.float32(params["I_ext"])), x_hist, y_hist, z_hist)
+
+    return kind, None, (hist[:, 0], hist[:, 1:].T)
+
+
+def evict(quota_bytes):
+
+    """ remove stored results, least recently used first, down to quota_bytes (the newest is kept) """
+
+    with RunCatalogue(db_path(results_root())) as cat:
+
+        rows = cat.stored_results()
+        total = sum(row["bytes"] or 0 for row in rows)
+
+        for row in rows[:-1]:
+
+            if total <= quota_bytes:
+                break
+
+            # parameter map: the fields .npy next to the csv
+            for path in {row["result_path"], row["path"], history_path(row["path"] or row["result_path"])}:
+                if path and os.path.exists(path):
+                    os.remove(path)
+
+            cat.clear_result(row["no"])
+            total -= row["bytes"] or 0
+
+            print("evicted: no.", row["no"], row["result_path"])
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+Created on: 2026-03-17
+
+@author: shirafujilab
+
+Contents:
+
+    Simulation in a background process, for the GUI
+
+        SimWorker.start() runs method_selects.run_method in a spawned process, the Tk thread
+        polls SimWorker.messages() with root.after() and stays responsive meanwhile.
+        (numba releases the GIL, but the runners also build LUTs, DataFrames and plots.)
+
+        messages (queue):
+            ("progress", done, total, rate)     steps so far, of total, steps/s
+            ("done", kind, runner, result)      as run_method
+            ("cancelled",)
+            ("error", traceback)
+
+        progress: the runners call runner.progress(done, total) between chunks
+        (time evolution) and between points (bifurcation). Where the chunked kernel gives the
+        history of the plain one, the worker turns stream on (chunked()): ESL identical,
+        ODE Euler up to the float32 rounding of the samples of the plain kernel.
+
+        cancel: an Event checked at every progress report, the runner stops at the next
+        chunk (RunCancelled), the .npy written so far stays valid. A kernel that does not
+        report (cycle_detect, dopri5, ...) is terminated after CANCEL_GRACE s.
+
+    The child starts with "spawn" (no fork of the Tk process) and loads the kernels from
+    the on-disk numba cache that jit_warmup fills at startup. It is not a daemon, so that
+    a runner can start a process pool of its own (param_map): close() stops it on exit.
+
+Usage:
+
+    worker = SimWorker()
+    worker.start(params, file_name)
+    ... for msg in worker.messages(): ...
+    worker.cancel()
+    worker.close()      window closed
+
+"""
+
+# import standard library
+import multiprocessing as mp
+import queue
+import time
+import traceback
+
+
+# s between the cancel request and terminate()
+CANCEL_GRACE = 5.0
+
+# s between two progress messages
+PROGRESS_INTERVAL = 0.1
+
+
+class RunCancelled(Exception):
+    pass
+
+
+class Progress:
+
+    """ runner.progress in the worker: posts (done, total, steps/s), raises RunCancelled on cancel """
+
+    def __init__(self, messages, cancel_event):
+
+        self.messages = messages
+        self.cancel_event = cancel_event
+
+        self.t0 = time.perf_counter()
+        self.t_last = 0.0
+
+    def __call__(self, done, total):
+
+        if self.cancel_event.is_set():
+            raise RunCancelled()
+
+        t = time.perf_counter() - self.t0
+
+        if (t - self.t_last >= PROGRESS_INTERVAL) or (done >= total):
+            self.t_last = t
+            self.messages.put(("progress", done, total, done / t if t > 0 else 0.0))
+
+
+def chunked(params):
+
+    """ params with stream on where the chunked kernel replaces the plain one """
+
+    key = (params["model"], params["simulation"])
+
+    plain = {("esl", "time evolution (single)"): not any(params.get(k, False) for k in ("cycle_detect", "compact_lut", "event_clock")),
+             ("esl", "time evolution (network)"): True,
+             ("ode", "time evolution (single)"): params.get("ode_method", "euler") == "euler"}
+
+    if plain.get(key, False):
+        return dict(params, stream=True)
+
+    return params
+
+
+def _work(params, file_name, messages, cancel_event):
+
+    """ target of the worker process """
+
+    # plt.show() of the runners must not open windows here
+    import matplotlib
+    matplotlib.use("Agg")
+
+    from src.method.method_selects import run_method
+
+    try:
+        done = run_method(chunked(params), file_name, Progress(messages, cancel_event))
+
+    except RunCancelled:
+        messages.put(("cancelled",))
+        return
+
+    except Exception:
+        messages.put(("error", traceback.format_exc()))
+        return
+
+    if done is None:
+        messages.put(("error", f"not implemented: {params['model']}, {params['simulation']}"))
+        return
+
+    kind, runner, result = done
+
+    # the queue and the event stay in this process (a stored time evolution has no runner)
+    if runner is not None:
+        runner.progress = None
+
+    messages.put(("done", kind, runner, result))
+
+
+class SimWorker:
+
+    def __init__(self):
+
+        self.ctx = mp.get_context("spawn")
+
+        self.process = None
+        self.queue = None
+        self.cancel_event = None
+        self.t_cancel = None
+
+    def start(self, params, file_name):
+
+        if self.running():
+            raise RuntimeError("a simulation is already running")
+
+        self.queue = self.ctx.Queue()
+        self.cancel_event = self.ctx.Event()
+        self.t_cancel = None
+
+        self.process = self.ctx.Process(target=_work, args=(dict(params), file_name, self.queue, self.cancel_event),
+                                        name="simulation", daemon=False)
+        self.process.start()
+
+    def running(self):
+
+        return self.process is not None and self.process.is_alive()
+
+    def cancel(self):
+
+        if self.running() and self.t_cancel is None:
+            self.cancel_event.set()
+            self.t_cancel = time.perf_counter()
+
+    def close(self):
+
+        """ cancel a running simulation and wait for it, terminate() after CANCEL_GRACE s """
+
+        if not self.running():
+            return
+
+        self.cancel()
+
+        # drained meanwhile: a process with queued messages does not exit
+        while self.process.is_alive() and time.perf_counter() - self.t_cancel < CANCEL_GRACE:
+            try:
+                self.queue.get(timeout=PROGRESS_INTERVAL)
+            except queue.Empty:
+                pass
+
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+
+        self.process = None
+
+    def messages(self):
+
+        """ messages posted so far; ("cancelled",) / ("error", ...) also when the process ended without one """
+
+        out = []
+
+        if self.process is None:
+            return out
+
+        # read before is_alive(): the last message is queued before the process exits
+        alive = self.process.is_alive()
+
+        while True:
+            try:
+                out.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+
+        final = any(msg[0] in ("done", "cancelled", "error") for msg in out)
+
+        # the kernel did not reach a progress report in time
+        if alive and not final and self.t_cancel is not None and time.perf_counter() - self.t_cancel > CANCEL_GRACE:
+            self.process.terminate()
+            self.process.join()
+            out.append(("cancelled",))
+            final, alive = True, False
+
+        elif not alive and not final:
+            out.append(("cancelled",) if self.t_cancel is not None else
+                       ("error", f"simulation process exited with code {self.process.exitcode}"))
+            final = True
+
+        if final:
+            self.process.join()
+            self.process = None
+
+        return out
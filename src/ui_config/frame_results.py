@@ -98,6 +98,9 @@ class ResultPanel:
         toolbar.update()
         toolbar.pack()
 
+        # artists kept between results, envelopes recomputed on zoom / pan
+        self.waveform = GraphicTW(self.ax1, self.ax2, self.ax3)
+
 
     def update_graphics(self):
 
@@ -107,13 +110,11 @@ class ResultPanel:
         params = self.master.params
 
         # graphic result
-        result = GraphicTW(params, model, self.ax1, self.ax2, self.ax3)
-        result.plot(self.t_hist, self.x_hist, self.y_hist, self.z_hist)
+        self.waveform.configure(params, model)
+        self.waveform.plot(self.t_hist, self.x_hist, self.y_hist, self.z_hist)
 
-        # Graphics
-        self.ax1.figure.canvas.draw()
-        self.ax2.figure.canvas.draw()
-        self.ax3.figure.canvas.draw()
+        # Graphics (one figure for the three axes)
+        self.ax1.figure.canvas.draw_idle()
 
 
     def event_bindings(self):
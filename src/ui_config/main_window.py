@@ -9,6 +9,13 @@ Updated on: 2026-02-26
 
 Contents:
 
+    WindowSetup: control panel (left), results (right)
+
+        run_simulation: the simulation runs in a SimWorker process, poll_simulation
+        (root.after, every POLL_MS) shows its progress and stores the results when done.
+        cancel_simulation: ■ button.
+        show_stored_result: parameters already computed are loaded instead (result_memo),
+        also at startup; "rerun" (force_rerun) runs them again.
 
 """
 
@@ -26,9 +33,17 @@ from src.ui_config.frame_settings import ControlPanel
 from src.ui_config.frame_results import ResultPanel
 
 from src.method.method_selects import MethodSelects
+from src.method.sim_worker import SimWorker
+from src.method.result_memo import load_result
 
 from src.utils.data_librarian import DataLibrarian
 
+from src.method.jit_warmup import start_warm_up
+
+
+# ms between two polls of the simulation process
+POLL_MS = 100
+
 
 class WindowSetup:
 
@@ -40,6 +55,7 @@ class WindowSetup:
         self.entries = {}
         self.combos = {}
         self.radio_buttons = {}
+        self.buttons = {}
         self.axes = {}
         self.tables = {}
 
@@ -50,8 +66,18 @@ class WindowSetup:
 
         self.results = None
 
+        # background simulation, stopped with the window
+        self.worker = SimWorker()
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+
         self.set_widget()
 
+        # result of the last session's parameters, if stored
+        self.show_stored_result()
+
+        # compile the kernels in the background while the values are edited
+        self.warm_up = start_warm_up(self.params)
+
 
     def set_widget(self):
 
@@ -66,19 +92,103 @@ class WindowSetup:
 
     def run_simulation(self):
 
+        if self.worker.running():
+            return
+
         # 1. Update values
         self.parameter_update()
 
+        # stored result of the same parameters: shown, not run
+        if self.show_stored_result():
+            return
+
         # 2. File directory
         data_lib = DataLibrarian(self.params)
         self.file_name = data_lib.save_path
 
-        # 3. Run simulation
-        MethodSelects(self)
+        # 3. Run simulation (background process)
+        self.worker.start(self.params, self.file_name)
+
+        self.buttons["run"].state(["disabled"])
+        self.buttons["cancel"].state(["!disabled"])
+        self.progress_bar["value"] = 0
+        self.status.set("starting ...")
+
+        # 4. Plot, when done
+        self.root.after(POLL_MS, self.poll_simulation)
+
+
+    def show_stored_result(self):
+
+        """ load and plot the stored result of self.params (result_memo), False if none """
+
+        if self.params.get("force_rerun", False):
+            return False
+
+        done = load_result(self.params)
+
+        if done is None:
+            return False
+
+        MethodSelects(self, done=done)
+        self.progress_bar["value"] = 100
+        self.status.set("stored result")
 
-        # 4. Plot
         self.results.update_graphics()
 
+        return True
+
+
+    def poll_simulation(self):
+
+        """ progress of the simulation process, results -> ResultPanel """
+
+        messages = self.worker.messages()
+
+        if self.worker.running():
+            self.root.after(POLL_MS, self.poll_simulation)
+        else:
+            self.buttons["run"].state(["!disabled"])
+            self.buttons["cancel"].state(["disabled"])
+
+        for msg in messages:
+
+            if msg[0] == "progress":
+                _, done, total, rate = msg
+                self.progress_bar["value"] = 100 * done / total if total > 0 else 100
+                self.status.set(f"{100 * done / max(total, 1):.1f} %   {rate:.3g} steps/s")
+
+            elif msg[0] == "done":
+                MethodSelects(self, done=msg[1:])
+                self.progress_bar["value"] = 100
+
+                # auto_stop of a time evolution: why and when it stopped
+                stop = getattr(msg[2], "stop", {})
+                self.status.set(f"done ({stop['stop_reason']}, stop_T {stop['stop_T']:.6g})" if stop else "done")
+
+                self.results.update_graphics()
+
+            elif msg[0] == "cancelled":
+                self.status.set("cancelled")
+
+            elif msg[0] == "error":
+                print(msg[1])
+                self.status.set("error: " + msg[1].strip().splitlines()[-1])
+
+
+    def cancel_simulation(self):
+
+        # the runner stops at its next chunk, see sim_worker
+        if self.worker.running():
+            self.worker.cancel()
+            self.status.set("cancelling ...")
+
+
+    def close(self):
+
+        self.worker.close()
+        self.root.destroy()
+
 
     def parameter_update(self):
 
@@ -86,6 +196,7 @@ class WindowSetup:
 
         self.params["model"] = self.combos["model"].get()
         self.params["simulation"] = self.combos["simulation"].get()
+        self.params["force_rerun"] = self.force_rerun.get()
 
         # update entries
         for param in self.entries:
@@ -98,7 +209,8 @@ class WindowSetup:
 
             widget = self.string_var[param]
 
-            self.params[param] = widget
+            # the value, not the StringVar: params are pickled to the worker process
+            self.params[param] = int(widget.get())
 
         # calculate Tx, Ty, Tz
         self.params["Tx"] = self.params["Tx_rat"] * self.params["Tx_sqrt"] ** (1/2)
@@ -14,7 +14,7 @@ Contents:
 
     - Simulation
 
-    - Execute
+    - Execute, cancel, progress, rerun
 
 Return:
 
@@ -89,8 +89,11 @@ class FrControl:
 
         combo1_value = ["time evolution (single)",
                         "time evolution (network)",
+                        "time evolution (batch)",
                         "bifurcation (single)",
                         "bifurcation (network)",
+                        "attraction basin",
+                        "parameter map",
                         "Output LUT"]
 
         combo1 = ttk.Combobox(fr, values=combo1_value, width=20)
@@ -99,8 +102,30 @@ class FrControl:
         self.master.combos["simulation"] = combo1
 
         # execute button
-        button1 = ttk.Button(fr, text="▶", command=self.master.run_simulation)
-        button1.grid(row=0, column=2, rowspan=2, padx=8, pady=2)
+        button1 = ttk.Button(fr, text="▶", width=3, command=self.master.run_simulation)
+        button1.grid(row=0, column=2, padx=8, pady=2)
+        self.master.buttons["run"] = button1
+
+        # cancel button (enabled while a simulation runs)
+        button2 = ttk.Button(fr, text="■", width=3, command=self.master.cancel_simulation, state="disabled")
+        button2.grid(row=1, column=2, padx=8, pady=2)
+        self.master.buttons["cancel"] = button2
+
+        """ Progress """
+
+        # progress bar (percent) and status: steps/s, done, cancelled, error
+        bar = ttk.Progressbar(fr, maximum=100, mode="determinate")
+        bar.grid(row=2, column=0, columnspan=2, padx=2, pady=2, sticky="ew")
+        self.master.progress_bar = bar
+
+        # run again even if the result of these parameters is stored
+        self.master.force_rerun = tk.BooleanVar(value=bool(self.master.params.get("force_rerun", False)))
+        check1 = ttk.Checkbutton(fr, text="rerun", variable=self.master.force_rerun)
+        check1.grid(row=2, column=2, padx=8, pady=2)
+
+        self.master.status = tk.StringVar(value="ready")
+        text2 = ttk.Label(fr, textvariable=self.master.status, style="Custom1.TLabel")
+        text2.grid(row=3, column=0, columnspan=3, padx=2, pady=2, sticky=tk.W)
 
 
     def toggle_widgets(self, show):
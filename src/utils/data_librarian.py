@@ -1,21 +1,28 @@
 # -*- coding: utf-8 -*-
 """
 Created on: 2024-11-25
-Updated on: 2026-02-26
+Updated on: 2026-03-18
 
 @author: shirafujilab
 
 Called from:
     - main window
 
+Contents:
+
+    data/results/<model>/<condition>/<simulation>/<yyyymmddHHMMSS>.csv per run
+
+        conditions and runs are recorded in data/results/data_lib.sqlite (RunCatalogue),
+        export_legacy() writes data_lib.csv / data_lib.json from it
+
 
 """
 
 import os
-import pandas as pd
 import json
 import datetime
 
+from src.utils.run_catalogue import RunCatalogue, db_path, ESL_KEYS
 
 
 class DataLibrarian:
@@ -44,12 +51,8 @@ class DataLibrarian:
 
     def get_root_dir(self):
 
-        # get root dir
-        cur_dir = os.path.dirname(os.path.abspath(__file__))
-        root_dir = os.path.abspath(os.path.join(cur_dir, "..", ".."))
-
         # return dir (set root directory for results)
-        self.result_dir = os.path.join(root_dir, "data", "results")
+        self.result_dir = results_root()
         os.makedirs(self.result_dir, exist_ok=True)
 
 
@@ -73,47 +76,15 @@ class DataLibrarian:
         if self.model_jname in ["esl"]:
 
             # classify by identical parameters
-            ca_params_key = ['M', 'N1', 'N2', 'N3', 's1', 's2', 's3',
-                             'Tc', 'Tx_rat', 'Tx_sqrt', 'Ty_rat', 'Ty_sqrt', 'Tz_rat', 'Tz_sqrt']
-
-            ca_params = {key: self.params[key] for key in ca_params_key}
-
-            # self.results_dir 内の data_lib.json の中身を確認
-            data_lib_json_path = os.path.join(self.result_dir, 'data_lib.json')
-            data_lib = safe_load_json(data_lib_json_path)
-
-            # get data
-            model_data = data_lib.get(self.model_jname, {})
-
-            # If match
-            condition_found = False
-            for condition_name, condition_info in model_data.items():
-                if condition_info.get('esl_params') == ca_params:
+            ca_params = {key: self.params[key] for key in ESL_KEYS}
 
-                    self.condition_dir = os.path.join(self.model_dir, condition_name)
-                    self.condition_jname = condition_name
-                    condition_found = True
-                    break
+            # condition_k of these parameters (a new one if none matches)
+            with RunCatalogue(db_path(self.result_dir)) as cat:
+                condition_name = cat.condition(self.model_jname, ca_params)
 
-            # Not match
-            if not condition_found:
-
-                existing_conditions = [name for name in model_data.keys() if name.startswith('condition_')]
-                existing_numbers = [int(name.replace('condition_', '')) for name in existing_conditions]
-                next_number = max(existing_numbers) + 1 if existing_numbers else 1
-                condition_i = f'condition_{next_number}'
-                self.condition_dir = os.path.join(self.model_dir, condition_i)
-                os.makedirs(self.condition_dir, exist_ok=True)
-                self.condition_jname = condition_i
-
-                # data_lib.json を更新
-                if self.model_jname not in data_lib:
-                    data_lib[self.model_jname] = {}
-                data_lib[self.model_jname][condition_i] = {'ca_params': ca_params}
-
-                # 更新内容を保存
-                with open(data_lib_json_path, 'w') as f:
-                    json.dump(data_lib, f, indent=4)
+            self.condition_dir = os.path.join(self.model_dir, condition_name)
+            os.makedirs(self.condition_dir, exist_ok=True)
+            self.condition_jname = condition_name
 
         else:
 
@@ -149,73 +120,44 @@ class DataLibrarian:
         elif self.sim_jname == "bifurcation":
             csv_filename = f'bifurcation_time_{now_str}.csv'
 
-        csv_filepath = os.path.join(self.sim_dir, csv_filename)
+        # make blank csv ("x": a run of the same second gets _1, _2, ... instead of truncating it)
+        stem, k = os.path.splitext(csv_filename)[0], 0
 
-        # make blank csv
-        with open(csv_filepath, 'w') as f:
-            pass
+        while True:
+            csv_filepath = os.path.join(self.sim_dir, csv_filename)
+            try:
+                with open(csv_filepath, 'x') as f:
+                    pass
+                break
+            except FileExistsError:
+                k += 1
+                csv_filename = f'{stem}_{k}.csv'
 
         self.result_path = csv_filepath
+        self.save_path = csv_filepath
 
-        # data_lib.json にディレクトリ構造と CSV ファイル名を保存
-        data_lib_json_path = os.path.join(self.result_dir, 'data_lib.json')
+        # record the run: one INSERT (data_lib.csv / .json: export_legacy)
+        with RunCatalogue(db_path(self.result_dir)) as cat:
+            self.no = cat.add_run(csv_filename, self.model_jname, self.condition_jname, self.sim_jname,
+                                  self.params, csv_filepath)
 
-        data_lib = safe_load_json(data_lib_json_path)
 
-        # update construction of directory
-        model_jname = self.model_jname
-        condition_jname = self.condition_jname
-        sim_jname = self.sim_jname
+    def export_legacy(self):
 
-        data_lib.setdefault(model_jname, {}).setdefault(condition_jname, {}).setdefault(sim_jname, []).append(csv_filename)
+        """ data_lib.csv and data_lib.json of the former catalogue """
 
-        # Store results
-        with open(data_lib_json_path, 'w') as f:
-            json.dump(data_lib, f, indent=4)
+        with RunCatalogue(db_path(self.result_dir)) as cat:
+            cat.export_legacy(self.result_dir)
 
-        # data_lib.csv に操作を記録
-        data_lib_csv_path = os.path.join(self.result_dir, 'data_lib.csv')
 
-        # define columns
-        columns = ['no.', 'filename', 'model', 'condition_dir',
-                   'M', 'N1', 'N2', 'N3', 's1', 's2', 's3',
-                   'Tc', 'Tx_rat', 'Tx_sqrt', 'Ty_rat', 'Ty_sqrt', 'Tz_rat', 'Tz_sqrt',
-                   'simulation']
+def results_root():
 
-        # 既存のデータを読み込み
-        if os.path.exists(data_lib_csv_path):
-            df = pd.read_csv(data_lib_csv_path)
-            no = int(df['no.'].max()) + 1 if not df.empty else 1
-        else:
-            df = pd.DataFrame(columns=columns)
-            no = 1
-
-        # 新しい行を作成
-        row = {
-            'no.': no,
-            'filename': csv_filename,
-            'model': model_jname,
-            'condition_dir': condition_jname,
-            'M': '',
-            'N1': '', 'N2': '', 'N3': '',
-            's1': '', 's2': '', 's3': '',
-            'Tc': '', 'Tx_rat': '', 'Tx_sqrt': '', 'Ty_rat': '', 'Ty_sqrt': '', 'Tz_rat': '', 'Tz_sqrt': '',
-            'simulation': self.params["simulation"]
-        }
-
-        # only ErCA, SynCA の場合はパラメータを埋める
-        if model_jname in ["esl"]:
-            ca_params_key = ['M',
-                             'N1', 'N2', 'N3',
-                             's1', 's2', 's3',
-                             'Tc', 'Tx_rat', 'Tx_sqrt', 'Ty_rat', 'Ty_sqrt', 'Tz_rat', 'Tz_sqrt']
-            for key in ca_params_key:
-                row[key] = self.params.get(key, '')
+    """ data/results of the repository """
 
-        self.save_path = csv_filepath
+    cur_dir = os.path.dirname(os.path.abspath(__file__))
+    root_dir = os.path.abspath(os.path.join(cur_dir, "..", ".."))
 
-        df = pd.concat([df, pd.DataFrame([row])], ignore_index=True)
-        df.to_csv(data_lib_csv_path, index=False)
+    return os.path.join(root_dir, "data", "results")
 
 
 def safe_load_json(file_path):
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Created on: 2026-03-12
+
+@author: shirafujilab
+
+Contents:
+
+    Append-only .npy for decimated histories (t, X, Y, Z) / (t, x_0, ..., x_n-1)
+
+        - rows are appended chunk by chunk, the header row count is rewritten after each chunk
+        - a crash leaves a valid file holding every chunk written so far
+        - np.load(path, mmap_mode="r") reads it without loading it into RAM
+
+    Chunk bookkeeping for the resumable kernels (*_chunk, *_steps)
+
+        chunk_ranges: ticks [i_begin, i_end) of each chunk
+        chunk_rows:   first stored sample and number of samples inside a chunk
+
+Usage:
+
+    writer = HistoryWriter(history_path(save_path), n_columns)
+    for i_begin, i_end in chunk_ranges(total_step, chunk_step):
+        k_begin, rows = chunk_rows(i_begin, i_end, index_start)
+        ...
+        writer.append(block)      # (rows, n_columns)
+    hist = writer.load()
+
+"""
+
+import os
+import numpy as np
+
+
+# fixed header size, so the row count can be rewritten in place (multiple of 64)
+HEADER_BYTES = 128
+
+
+def history_path(save_path):
+
+    """ DataLibrarian.save_path (.csv) -> .npy next to it """
+
+    return os.path.splitext(save_path)[0] + ".npy"
+
+
+def chunk_ranges(total_step, chunk_step):
+
+    chunk_step = max(int(chunk_step), 1)
+
+    for i_begin in range(0, total_step, chunk_step):
+        yield i_begin, min(i_begin + chunk_step, total_step)
+
+
+def chunk_rows(i_begin, i_end, index_start, decimation=100):
+
+    """
+    Stored ticks are i >= index_start with (i - index_start) % decimation == 0,
+    sample k lives at tick index_start + decimation*k.
+
+    Return:
+        k_begin: first sample inside [i_begin, i_end)
+        rows:    number of samples inside [i_begin, i_end)
+    """
+
+    if i_end <= index_start:
+        return 0, 0
+
+    k_begin = max(0, -(-(i_begin - index_start) // decimation))
+    k_end = (i_end - 1 - index_start) // decimation + 1
+
+    return k_begin, max(k_end - k_begin, 0)
+
+
+class HistoryWriter:
+
+    def __init__(self, path, n_columns, dtype=np.float64):
+
+        self.path = path
+        self.n_columns = n_columns
+        self.dtype = np.dtype(dtype)
+        self.rows = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self.f = open(path, "wb")
+        self._write_header()
+
+    def _write_header(self):
+
+        header = {"descr": np.lib.format.dtype_to_descr(self.dtype),
+                  "fortran_order": False,
+                  "shape": (self.rows, self.n_columns)}
+
+        # magic (6) + version (2) + header length (2) + dict padded with spaces + "\n"
+        text = repr(header).encode("latin1")
+        text = text + b" " * (HEADER_BYTES - 10 - len(text) - 1) + b"\n"
+
+        self.f.seek(0)
+        self.f.write(np.lib.format.magic(1, 0))
+        self.f.write(np.uint16(len(text)).tobytes())
+        self.f.write(text)
+
+    def append(self, block):
+
+        block = np.ascontiguousarray(block, dtype=self.dtype).reshape(-1, self.n_columns)
+
+        if block.shape[0] == 0:
+            return
+
+        # data first, then the row count: the header never points past the data
+        self.f.seek(0, os.SEEK_END)
+        self.f.write(block.tobytes())
+        self.f.flush()
+
+        self.rows += block.shape[0]
+        self._write_header()
+        self.f.flush()
+
+    def close(self):
+
+        if not self.f.closed:
+            self.f.close()
+
+    def load(self):
+
+        """ memory-mapped (rows, n_columns) """
+
+        self.close()
+
+        return np.load(self.path, mmap_mode="r")
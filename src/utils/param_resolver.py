@@ -19,7 +19,9 @@ def param_resolver(params):
 
         if isinstance(value, str):
             
-            if key not in ["b1_equ", "b2_equ", "WI12_equ"]:
+            if key not in ["b1_equ", "b2_equ", "WI12_equ",
+                           "ode_method", "bif_param", "lut_format",
+                           "map_x", "map_y"]:
 
                 params[key] = eval(value)
 
@@ -0,0 +1,384 @@
+# -*- coding: utf-8 -*-
+"""
+Created on: 2026-03-18
+
+@author: shirafujilab
+
+Called from:
+    - DataLibrarian
+
+Contents:
+
+    Catalogue of the runs in data/results/data_lib.sqlite (stdlib sqlite3)
+
+        conditions: one row per (model, esl_params), named condition_1, condition_2, ... per model
+        runs:       one row per run, appended (no. = rowid), indexed on model, condition, simulation
+                    columns of ESL_KEYS for the queries, the full params as json
+                    result_key, ... of the memoized result (src/method/result_memo.py)
+
+        Every run costs one indexed lookup and one INSERT, whatever the number of runs.
+        WAL journal and BEGIN IMMEDIATE: several processes may register runs at once.
+
+    data_lib.csv / data_lib.json (the former catalogue) are written by export_legacy() on
+    request only, and read once into an empty database (import_legacy).
+
+Usage:
+
+    with RunCatalogue(db_path(result_dir)) as cat:
+        condition = cat.condition("esl", esl_params)
+        no = cat.add_run(filename, "esl", condition, simulation, params, path)
+        rows = cat.query(model="esl", simulation="bifurcation (single)", N1=256)
+        cat.export_legacy(result_dir)
+
+"""
+
+import os
+import csv
+import json
+import sqlite3
+import datetime
+
+
+# parameters of an ESL condition (one directory per distinct set)
+ESL_KEYS = ['M', 'N1', 'N2', 'N3', 's1', 's2', 's3',
+            'Tc', 'Tx_rat', 'Tx_sqrt', 'Ty_rat', 'Ty_sqrt', 'Tz_rat', 'Tz_sqrt']
+
+# data_lib.csv
+LEGACY_COLUMNS = ['no.', 'filename', 'model', 'condition_dir'] + ESL_KEYS + ['simulation']
+
+# memoized result of a run (result_memo), added to the databases of before
+RESULT_COLUMNS = {"result_key": "TEXT", "kind": "TEXT", "result_path": "TEXT",
+                  "result_rows": "INTEGER", "bytes": "INTEGER", "last_used": "TEXT"}
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS conditions (
+    model      TEXT NOT NULL,
+    name       TEXT NOT NULL,
+    esl_params TEXT NOT NULL,
+    UNIQUE (model, esl_params),
+    UNIQUE (model, name)
+);
+
+CREATE TABLE IF NOT EXISTS runs (
+    no         INTEGER PRIMARY KEY AUTOINCREMENT,
+    filename   TEXT NOT NULL,
+    model      TEXT NOT NULL,
+    condition  TEXT NOT NULL,
+    simulation TEXT NOT NULL,
+    created    TEXT NOT NULL,
+    path       TEXT,
+    {", ".join(f"{key} REAL" for key in ESL_KEYS)},
+    params     TEXT,
+    {", ".join(f"{key} {sql_type}" for key, sql_type in RESULT_COLUMNS.items())}
+);
+
+CREATE INDEX IF NOT EXISTS runs_model ON runs (model, condition, simulation);
+CREATE INDEX IF NOT EXISTS runs_condition ON runs (condition);
+CREATE INDEX IF NOT EXISTS runs_simulation ON runs (simulation);
+CREATE INDEX IF NOT EXISTS runs_path ON runs (path);
+"""
+
+# after RESULT_COLUMNS exist
+RESULT_INDEX = "CREATE INDEX IF NOT EXISTS runs_result_key ON runs (result_key)"
+
+
+def db_path(result_dir):
+
+    return os.path.join(result_dir, "data_lib.sqlite")
+
+
+def _canonical(esl_params):
+
+    """ esl_params -> json key of the conditions table (sorted keys, numbers as float) """
+
+    return json.dumps({key: float(esl_params[key]) for key in sorted(esl_params)})
+
+
+def _created(filename):
+
+    """ <yyyymmddHHMMSS>.csv of DataLibrarian -> iso time ("" if the name is not one) """
+
+    try:
+        return datetime.datetime.strptime(os.path.splitext(filename)[0][-14:], "%Y%m%d%H%M%S").isoformat()
+    except ValueError:
+        return ""
+
+
+def _json_default(value):
+
+    # numpy scalars and arrays of params
+    if hasattr(value, "tolist"):
+        return value.tolist()
+
+    return str(value)
+
+
+class RunCatalogue:
+
+    def __init__(self, path):
+
+        self.path = path
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        new = not os.path.exists(path)
+
+        # autocommit, the transactions below are explicit
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self._add_result_columns()
+
+        if new:
+            self.import_legacy(os.path.dirname(os.path.abspath(path)))
+
+    def _add_result_columns(self):
+
+        columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(runs)")}
+
+        for key, sql_type in RESULT_COLUMNS.items():
+            if key not in columns:
+                self.conn.execute(f"ALTER TABLE runs ADD COLUMN {key} {sql_type}")
+
+        self.conn.execute(RESULT_INDEX)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+
+    """ write """
+
+    def condition(self, model, esl_params):
+
+        """ name of the condition of esl_params, a new condition_k if there is none """
+
+        key = _canonical(esl_params)
+
+        row = self.conn.execute("SELECT name FROM conditions WHERE model = ? AND esl_params = ?",
+                                (model, key)).fetchone()
+        if row is not None:
+            return row["name"]
+
+        # numbering and insert under one write lock
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.conn.execute("SELECT name FROM conditions WHERE model = ? AND esl_params = ?",
+                                    (model, key)).fetchone()
+
+            if row is None:
+                name = f"condition_{self._next_condition(model)}"
+                self.conn.execute("INSERT INTO conditions (model, name, esl_params) VALUES (?, ?, ?)",
+                                  (model, name, key))
+            else:
+                name = row["name"]
+
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+
+        return name
+
+    def _next_condition(self, model):
+
+        numbers = [int(row["name"].replace("condition_", ""))
+                   for row in self.conn.execute("SELECT name FROM conditions WHERE model = ? AND name LIKE 'condition_%'", (model,))]
+
+        return max(numbers) + 1 if numbers else 1
+
+    def add_run(self, filename, model, condition, simulation, params=None, path=None, created=None):
+
+        """ append a run, returns its no. """
+
+        params = params or {}
+        esl = [float(params[key]) if (model in ["esl"]) and (key in params) else None for key in ESL_KEYS]
+
+        cur = self.conn.execute(f"INSERT INTO runs (filename, model, condition, simulation, created, path, "
+                                f"{', '.join(ESL_KEYS)}, params) VALUES ({', '.join('?' * (len(ESL_KEYS) + 7))})",
+                                (filename, model, condition, simulation,
+                                 created or datetime.datetime.now().isoformat(timespec="seconds"), path,
+                                 *esl, json.dumps(params, default=_json_default)))
+
+        return cur.lastrowid
+
+
+    def set_result(self, path, result_key, kind, result_path, result_rows, nbytes):
+
+        """ memoized result of the last run saved at path (DataLibrarian.save_path), False if none """
+
+        cur = self.conn.execute("UPDATE runs SET result_key = ?, kind = ?, result_path = ?, result_rows = ?, bytes = ?, last_used = ? "
+                                "WHERE no = (SELECT MAX(no) FROM runs WHERE path = ?)",
+                                (result_key, kind, result_path, int(result_rows), int(nbytes),
+                                 datetime.datetime.now().isoformat(timespec="seconds"), path))
+
+        return cur.rowcount > 0
+
+    def clear_result(self, no):
+
+        self.conn.execute(f"UPDATE runs SET {' = NULL, '.join(RESULT_COLUMNS)} = NULL WHERE no = ?", (no,))
+
+    def touch(self, no):
+
+        self.conn.execute("UPDATE runs SET last_used = ? WHERE no = ?",
+                          (datetime.datetime.now().isoformat(timespec="seconds"), no))
+
+
+    """ read """
+
+    def query(self, model=None, condition=None, simulation=None, limit=None, **params):
+
+        """
+        runs matching every given value, oldest first
+
+        params: ESL_KEYS (indexed columns) or any key of the stored params (json_extract),
+                e.g. query(model="esl", simulation="time evolution (single)", N1=256, I_ext=3.0)
+
+        Return:
+            list of dict: no, filename, model, condition, simulation, created, path, ESL_KEYS, params (dict)
+        """
+
+        where, args = [], []
+
+        for column, value in (("model", model), ("condition", condition), ("simulation", simulation)):
+            if value is not None:
+                where.append(f"{column} = ?")
+                args.append(value)
+
+        for key, value in params.items():
+            if key in ESL_KEYS:
+                where.append(f"{key} = ?")
+            else:
+                where.append("json_extract(params, ?) = ?")
+                args.append(f"$.{key}")
+            args.append(value)
+
+        sql = "SELECT * FROM runs"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY no"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+
+        rows = []
+        for row in self.conn.execute(sql, args):
+            row = dict(row)
+            row["params"] = json.loads(row["params"]) if row["params"] else {}
+            rows.append(row)
+
+        return rows
+
+    def find_result(self, result_key):
+
+        """ runs holding the result of result_key, newest first """
+
+        return [dict(row) for row in self.conn.execute("SELECT * FROM runs WHERE result_key = ? ORDER BY no DESC", (result_key,))]
+
+    def stored_results(self):
+
+        """ runs holding a result, least recently used first """
+
+        return [dict(row) for row in self.conn.execute("SELECT no, path, result_path, bytes FROM runs WHERE result_key IS NOT NULL "
+                                                       "ORDER BY last_used, no")]
+
+    def conditions(self, model=None):
+
+        """ {model: {condition: esl_params}} """
+
+        sql, args = "SELECT * FROM conditions", ()
+        if model is not None:
+            sql, args = sql + " WHERE model = ?", (model,)
+
+        out = {}
+        for row in self.conn.execute(sql + " ORDER BY rowid", args):
+            out.setdefault(row["model"], {})[row["name"]] = json.loads(row["esl_params"])
+
+        return out
+
+
+    """ data_lib.csv / data_lib.json """
+
+    def export_legacy(self, result_dir):
+
+        """ write data_lib.csv and data_lib.json of result_dir from the catalogue """
+
+        data_lib = {model: {name: {"esl_params": esl_params} for name, esl_params in conds.items()}
+                    for model, conds in self.conditions().items()}
+
+        with open(os.path.join(result_dir, "data_lib.csv"), "w", newline="") as f:
+
+            writer = csv.writer(f)
+            writer.writerow(LEGACY_COLUMNS)
+
+            for row in self.conn.execute("SELECT * FROM runs ORDER BY no"):
+
+                writer.writerow([row["no"], row["filename"], row["model"], row["condition"],
+                                 *["" if row[key] is None else row[key] for key in ESL_KEYS],
+                                 row["simulation"]])
+
+                data_lib.setdefault(row["model"], {}).setdefault(row["condition"], {}) \
+                        .setdefault(row["simulation"], []).append(row["filename"])
+
+        with open(os.path.join(result_dir, "data_lib.json"), "w") as f:
+            json.dump(data_lib, f, indent=4)
+
+    def import_legacy(self, result_dir):
+
+        """ conditions of data_lib.json and runs of data_lib.csv (both optional) """
+
+        json_path = os.path.join(result_dir, "data_lib.json")
+        csv_path = os.path.join(result_dir, "data_lib.csv")
+
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            # another process created the database first
+            if self.conn.execute("SELECT EXISTS (SELECT 1 FROM runs) OR EXISTS (SELECT 1 FROM conditions)").fetchone()[0]:
+                self.conn.execute("COMMIT")
+                return
+
+            if os.path.exists(json_path) and os.path.getsize(json_path) > 0:
+
+                with open(json_path, "r", encoding="utf-8") as f:
+                    data_lib = json.load(f)
+
+                for model, conds in data_lib.items():
+                    for name, info in conds.items():
+
+                        # written as "ca_params", looked up as "esl_params" by the former DataLibrarian
+                        esl_params = info.get("esl_params", info.get("ca_params"))
+
+                        if esl_params is not None:
+                            self.conn.execute("INSERT OR IGNORE INTO conditions (model, name, esl_params) VALUES (?, ?, ?)",
+                                              (model, name, _canonical(esl_params)))
+
+            if os.path.exists(csv_path) and os.path.getsize(csv_path) > 0:
+
+                with open(csv_path, "r", newline="", encoding="utf-8") as f:
+                    for row in csv.DictReader(f):
+
+                        params = {key: float(row[key]) for key in ESL_KEYS if row.get(key, "") != ""}
+
+                        # no. follows the order of the file
+                        self.add_run(row["filename"], row["model"], row["condition_dir"], row["simulation"],
+                                     params, created=_created(row["filename"]))
+
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+
+
+if __name__ == "__main__":
+
+    # data_lib.csv / data_lib.json of data/results
+    result_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "data", "results"))
+
+    with RunCatalogue(db_path(result_dir)) as cat:
+        cat.export_legacy(result_dir)
+
+    print("exported to ", result_dir)